@@ -0,0 +1,36 @@
+-- Content hash for quantifiable_goals so goal_extractor can insert a group's
+-- goals in one idempotent bulk INSERT ... ON CONFLICT (content_hash) DO NOTHING.
+-- The hash is sha256 of "<transcript_session_id>|<participant_name>|<goal text>"
+-- with the goal text trimmed, whitespace collapsed and lowercased, matching
+-- _goal_content_hash in goal_extractor.py.
+-- Run this in your Supabase SQL Editor
+
+ALTER TABLE peer_progress.quantifiable_goals
+ADD COLUMN IF NOT EXISTS content_hash TEXT;
+
+-- Backfill existing rows. When a session already holds duplicates of the same
+-- goal only the oldest one gets the hash; the rest keep NULL, which the unique
+-- index ignores.
+WITH hashed AS (
+    SELECT id,
+           encode(sha256(convert_to(
+               transcript_session_id::text || '|' || participant_name || '|' ||
+               lower(regexp_replace(regexp_replace(coalesce(goal_text, ''), '^\s+|\s+$', '', 'g'), '\s+', ' ', 'g')),
+               'UTF8')), 'hex') AS content_hash,
+           row_number() OVER (
+               PARTITION BY transcript_session_id, participant_name,
+                            lower(regexp_replace(regexp_replace(coalesce(goal_text, ''), '^\s+|\s+$', '', 'g'), '\s+', ' ', 'g'))
+               ORDER BY created_at, id) AS rn
+    FROM peer_progress.quantifiable_goals
+    WHERE content_hash IS NULL
+      AND transcript_session_id IS NOT NULL
+      AND participant_name IS NOT NULL
+)
+UPDATE peer_progress.quantifiable_goals g
+SET content_hash = h.content_hash
+FROM hashed h
+WHERE g.id = h.id AND h.rn = 1
+  AND NOT EXISTS (SELECT 1 FROM peer_progress.quantifiable_goals x WHERE x.content_hash = h.content_hash);
+
+CREATE UNIQUE INDEX IF NOT EXISTS quantifiable_goals_content_hash_key
+    ON peer_progress.quantifiable_goals (content_hash);
@@ -0,0 +1,14 @@
+-- Unique keys that let the identity map (identity_map.py) create groups and
+-- members with INSERT ... ON CONFLICT, so concurrent workers can't create
+-- duplicates.
+-- Run this in your Supabase SQL Editor
+--
+-- Existing duplicate members must be merged before the index can be built:
+--   SELECT full_name, group_code, count(*) FROM peer_progress.members
+--   GROUP BY full_name, group_code HAVING count(*) > 1;
+
+CREATE UNIQUE INDEX IF NOT EXISTS groups_group_code_key
+    ON peer_progress.groups (group_code);
+
+CREATE UNIQUE INDEX IF NOT EXISTS members_full_name_group_code_key
+    ON peer_progress.members (full_name, group_code);
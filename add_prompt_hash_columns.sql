@@ -0,0 +1,12 @@
+-- Record which prompt version produced each transcript_analysis payload
+-- Run this in your Supabase SQL Editor
+-- (quantifiable_goals keep theirs in source_details->>'prompt_hash')
+
+ALTER TABLE peer_progress.transcript_analysis
+ADD COLUMN IF NOT EXISTS marketing_prompt_hash TEXT;
+
+ALTER TABLE peer_progress.transcript_analysis
+ADD COLUMN IF NOT EXISTS stuck_prompt_hash TEXT;
+
+ALTER TABLE peer_progress.transcript_analysis
+ADD COLUMN IF NOT EXISTS challenges_prompt_hash TEXT;
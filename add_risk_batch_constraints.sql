@@ -0,0 +1,42 @@
+-- Org-wide batch risk assessment (assess_org_risk in main.py).
+-- Assessments and follow-up actions are written with bulk INSERT ... ON CONFLICT,
+-- so each needs a natural key: one assessment per member per day, and one
+-- action per member, type, trigger and due date. The range queries that load a
+-- whole org's recent attendance, goals and commitments get matching indexes.
+-- Run this in your Supabase SQL Editor
+
+-- 1. Keep the newest assessment per member per day
+DELETE FROM peer_progress.member_risk_assessment t
+USING (
+    SELECT id,
+           row_number() OVER (PARTITION BY member_id, assessment_date
+                              ORDER BY updated_at DESC NULLS LAST, created_at DESC NULLS LAST, id) AS rn
+    FROM peer_progress.member_risk_assessment
+) d
+WHERE t.id = d.id AND d.rn > 1;
+
+CREATE UNIQUE INDEX IF NOT EXISTS member_risk_assessment_member_day_key
+    ON peer_progress.member_risk_assessment (member_id, assessment_date);
+
+-- 2. Keep one action per trigger, preferring one a champion has already picked up
+DELETE FROM peer_progress.success_champion_actions t
+USING (
+    SELECT id,
+           row_number() OVER (PARTITION BY member_id, action_type, trigger_reason, due_date
+                              ORDER BY (action_status <> 'pending') DESC, created_at NULLS LAST, id) AS rn
+    FROM peer_progress.success_champion_actions
+) d
+WHERE t.id = d.id AND d.rn > 1;
+
+CREATE UNIQUE INDEX IF NOT EXISTS success_champion_actions_trigger_key
+    ON peer_progress.success_champion_actions (member_id, action_type, trigger_reason, due_date);
+
+-- 3. Org-wide range scans over the last two weeks
+CREATE INDEX IF NOT EXISTS idx_member_attendance_org_date
+    ON peer_progress.member_attendance (organization_id, call_date);
+
+CREATE INDEX IF NOT EXISTS idx_member_goals_summary_org_week
+    ON peer_progress.member_goals_summary (organization_id, week_start_date);
+
+CREATE INDEX IF NOT EXISTS idx_commitments_org_created
+    ON peer_progress.commitments (organization_id, created_at);
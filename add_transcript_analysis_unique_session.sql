@@ -0,0 +1,63 @@
+-- One transcript_analysis row per session, so extractors can write their
+-- columns with a single INSERT ... ON CONFLICT (analysis_writer.py) instead of
+-- select-then-update/insert, which raced and created duplicate rows.
+-- Run this in your Supabase SQL Editor
+
+-- 1. Fold duplicate rows into the newest row per session, keeping any column
+--    the newest row is missing from the most recent duplicate that has it.
+WITH ranked AS (
+    SELECT id, transcript_session_id,
+           row_number() OVER (PARTITION BY transcript_session_id
+                              ORDER BY updated_at DESC NULLS LAST, created_at DESC NULLS LAST, id) AS rn
+    FROM peer_progress.transcript_analysis
+    WHERE transcript_session_id IS NOT NULL
+),
+merged AS (
+    SELECT r.transcript_session_id,
+           (array_agg(a.extracted_commitments_json ORDER BY r.rn) FILTER (WHERE a.extracted_commitments_json IS NOT NULL))[1] AS extracted_commitments_json,
+           (array_agg(a.classification_results_json ORDER BY r.rn) FILTER (WHERE a.classification_results_json IS NOT NULL))[1] AS classification_results_json,
+           (array_agg(a.nudge_messages_json ORDER BY r.rn) FILTER (WHERE a.nudge_messages_json IS NOT NULL))[1] AS nudge_messages_json,
+           (array_agg(a.marketing_activities_json ORDER BY r.rn) FILTER (WHERE a.marketing_activities_json IS NOT NULL))[1] AS marketing_activities_json,
+           (array_agg(a.pipeline_outcomes_json ORDER BY r.rn) FILTER (WHERE a.pipeline_outcomes_json IS NOT NULL))[1] AS pipeline_outcomes_json,
+           (array_agg(a.stuck_signals_json ORDER BY r.rn) FILTER (WHERE a.stuck_signals_json IS NOT NULL))[1] AS stuck_signals_json,
+           (array_agg(a.challenges_strategies_json ORDER BY r.rn) FILTER (WHERE a.challenges_strategies_json IS NOT NULL))[1] AS challenges_strategies_json,
+           (array_agg(a.marketing_prompt_hash ORDER BY r.rn) FILTER (WHERE a.marketing_prompt_hash IS NOT NULL))[1] AS marketing_prompt_hash,
+           (array_agg(a.stuck_prompt_hash ORDER BY r.rn) FILTER (WHERE a.stuck_prompt_hash IS NOT NULL))[1] AS stuck_prompt_hash,
+           (array_agg(a.challenges_prompt_hash ORDER BY r.rn) FILTER (WHERE a.challenges_prompt_hash IS NOT NULL))[1] AS challenges_prompt_hash
+    FROM ranked r
+    JOIN peer_progress.transcript_analysis a ON a.id = r.id
+    GROUP BY r.transcript_session_id
+    HAVING count(*) > 1
+)
+UPDATE peer_progress.transcript_analysis t
+SET extracted_commitments_json = m.extracted_commitments_json,
+    classification_results_json = m.classification_results_json,
+    nudge_messages_json = m.nudge_messages_json,
+    marketing_activities_json = m.marketing_activities_json,
+    pipeline_outcomes_json = m.pipeline_outcomes_json,
+    stuck_signals_json = m.stuck_signals_json,
+    challenges_strategies_json = m.challenges_strategies_json,
+    marketing_prompt_hash = m.marketing_prompt_hash,
+    stuck_prompt_hash = m.stuck_prompt_hash,
+    challenges_prompt_hash = m.challenges_prompt_hash
+FROM merged m, ranked r
+WHERE r.transcript_session_id = m.transcript_session_id
+  AND r.rn = 1
+  AND t.id = r.id;
+
+-- 2. Drop the folded duplicates
+DELETE FROM peer_progress.transcript_analysis t
+USING (
+    SELECT id,
+           row_number() OVER (PARTITION BY transcript_session_id
+                              ORDER BY updated_at DESC NULLS LAST, created_at DESC NULLS LAST, id) AS rn
+    FROM peer_progress.transcript_analysis
+    WHERE transcript_session_id IS NOT NULL
+) d
+WHERE t.id = d.id AND d.rn > 1;
+
+-- 3. Conflict target for the upserts (replaces the plain lookup index)
+CREATE UNIQUE INDEX IF NOT EXISTS transcript_analysis_session_key
+    ON peer_progress.transcript_analysis (transcript_session_id);
+
+DROP INDEX IF EXISTS peer_progress.idx_transcript_analysis_session;
@@ -4,11 +4,39 @@ Usage: ai_generate_content(prompt_text, model_hint="default"). Returns string re
 """
 import os
 import logging
+import threading
+from contextlib import contextmanager
+
+_quota = threading.local()
+
+
+@contextmanager
+def llm_quota(semaphore):
+    """
+    Bound LLM calls made by this thread with the given semaphore (e.g. one per organization).
+    Calls made outside the context are not limited.
+    """
+    previous = getattr(_quota, "semaphore", None)
+    _quota.semaphore = semaphore
+    try:
+        yield
+    finally:
+        _quota.semaphore = previous
+
+
 def ai_generate_content(prompt, model_hint="default") -> str:
     """
     Attempt Gemini, else fallback to OpenAI (chatgpt).
     Returns LLM response text directly. Logs LLM used.
     """
+    semaphore = getattr(_quota, "semaphore", None)
+    if semaphore is None:
+        return _generate(prompt, model_hint)
+    with semaphore:
+        return _generate(prompt, model_hint)
+
+
+def _generate(prompt, model_hint="default") -> str:
     # Try Gemini
     gemini_key = os.getenv("GOOGLE_AI_API_KEY")
     openai_key = os.getenv("OPENAI_API_KEY")
@@ -0,0 +1,43 @@
+"""
+Single-statement writes to peer_progress.transcript_analysis.
+
+Rows are upserted on the unique transcript_session_id (see
+add_transcript_analysis_unique_session.sql). PostgREST's merge upsert only sets
+the columns present in the payload, so each extractor writes just its own JSON
+columns in one round trip and concurrent extractors on the same session
+cannot create duplicate rows or overwrite each other's columns.
+"""
+
+from typing import Dict
+
+from supabase import Client
+
+
+def _table(sb: Client):
+    return sb.schema('peer_progress').table('transcript_analysis')
+
+
+def upsert_analysis(sb: Client, session_id: str, org_id: str, columns: Dict,
+                    processing_status: str = 'completed') -> None:
+    """Write one session's columns, creating the row if needed."""
+    row = dict(columns)
+    row['transcript_session_id'] = session_id
+    row['organization_id'] = org_id
+    row['processing_status'] = processing_status
+    _table(sb).upsert(row, on_conflict='transcript_session_id').execute()
+
+
+def upsert_analysis_many(sb: Client, org_id: str, columns_by_session: Dict[str, Dict],
+                         processing_status: str = 'completed') -> int:
+    """Write many sessions' columns with one upsert per distinct column set. Returns rows written."""
+    # Bulk upsert needs uniform keys per request, so group sessions by column set
+    by_columns: Dict[tuple, list] = {}
+    for session_id, columns in columns_by_session.items():
+        row = dict(columns)
+        row['transcript_session_id'] = session_id
+        row['organization_id'] = org_id
+        row['processing_status'] = processing_status
+        by_columns.setdefault(tuple(sorted(row.keys())), []).append(row)
+    for rows in by_columns.values():
+        _table(sb).upsert(rows, on_conflict='transcript_session_id').execute()
+    return len(columns_by_session)
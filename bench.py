@@ -0,0 +1,682 @@
+"""Offline end-to-end benchmark for the extraction pipeline.
+
+Runs the real extractor and TranscriptProcessor code against stand-ins:
+- a fake Drive service serving a fixture folder of .txt transcripts (synthetic
+  ones are generated when no folder is given),
+- a replay LLM that returns canned, parseable responses after a configurable
+  latency,
+- an in-memory Supabase client that executes the PostgREST query builder
+  calls the code makes and counts every round trip.
+
+Each size runs in a fresh process so peak RSS is per run. Reported per run:
+transcripts/minute, LLM calls per transcript, DB round trips per transcript,
+Drive calls per transcript and peak RSS.
+
+Usage examples:
+  python bench.py                                   # extractors, 10/100/1000 synthetic transcripts
+  python bench.py --mode process_transcript --sizes 10 100
+  python bench.py --fixtures ./fixtures --llm_latency_ms 200 --concurrency 8
+  python bench.py --mode risk --sizes 100000        # risk aggregation over N synthetic events
+"""
+
+import gc
+import io
+import os
+import re
+import sys
+import time
+import uuid
+import random
+import argparse
+import resource
+import tempfile
+import threading
+import contextlib
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+from typing import Callable, Dict, List, Optional
+
+
+ORGANIZATION_ID = 'f58a2d22-4e96-4d4a-9348-b82c8e3f1f2e'
+BENCH_FOLDER_ID = 'bench-fixtures'
+BENCH_FOLDER_URL = f'https://drive.google.com/drive/folders/{BENCH_FOLDER_ID}'
+GOOGLE_DOC = 'application/vnd.google-apps.document'
+
+
+# ---------------------------------------------------------------------------
+# Fixtures
+# ---------------------------------------------------------------------------
+
+FIRST_NAMES = ['Alex', 'Blake', 'Casey', 'Dana', 'Eli', 'Frankie', 'Gray', 'Harper', 'Indy', 'Jordan',
+               'Kai', 'Logan', 'Morgan', 'Noor', 'Parker', 'Quinn', 'Riley', 'Sage', 'Taylor', 'Val']
+LAST_NAMES = ['Adams', 'Brooks', 'Chen', 'Diaz', 'Evans', 'Fischer', 'Garcia', 'Hughes']
+
+SENTENCES = [
+    "This week I will send {n} LinkedIn messages to past clients.",
+    "I reached out to my network and booked {n} discovery calls.",
+    "Honestly I've been stuck on pricing and keep putting off the proposal.",
+    "My plan is to publish {n} posts and follow up with every comment.",
+    "I sent {n} cold emails but nobody replied yet.",
+    "One thing that worked for me was asking for referrals after delivery.",
+]
+
+
+def _synthetic_transcript(rng: random.Random, participants: List[str], turns: int = 60) -> str:
+    lines = []
+    for t in range(turns):
+        speaker = participants[t % len(participants)] if t < len(participants) else rng.choice(participants)
+        sentence = rng.choice(SENTENCES).format(n=rng.randint(2, 20))
+        lines.append(f'[00:{t // 2:02d}:{(t * 30) % 60:02d}] {speaker}: {sentence}')
+    return '\n'.join(lines)
+
+
+def build_fixtures(n: int, fixtures_dir: Optional[str] = None, seed: int = 7) -> List[Dict]:
+    """Return n Drive-style file dicts, each with its transcript text under 'content'."""
+    rng = random.Random(seed)
+    now = datetime.now(timezone.utc)
+    texts: List[str] = []
+    if fixtures_dir:
+        for fname in sorted(os.listdir(fixtures_dir)):
+            if fname.endswith('.txt'):
+                with open(os.path.join(fixtures_dir, fname), 'r', encoding='utf-8') as f:
+                    texts.append(f.read())
+        if not texts:
+            raise SystemExit(f'No .txt fixtures found in {fixtures_dir}')
+
+    files = []
+    for i in range(n):
+        if texts:
+            content = texts[i % len(texts)]
+        else:
+            people = rng.sample([f'{a} {b}' for a in FIRST_NAMES for b in LAST_NAMES], rng.randint(6, 12))
+            content = _synthetic_transcript(rng, people)
+        modified = now - timedelta(days=i % 28, minutes=i)
+        files.append({
+            'id': f'bench-{i:05d}',
+            'name': f'Group {i // 10 % 9 + 1}.{i % 10 + 1} Transcript {i:05d}.txt',
+            'mimeType': GOOGLE_DOC,
+            'createdTime': modified.isoformat().replace('+00:00', 'Z'),
+            'modifiedTime': modified.isoformat().replace('+00:00', 'Z'),
+            'content': content,
+        })
+    return files
+
+
+# ---------------------------------------------------------------------------
+# Fake Drive
+# ---------------------------------------------------------------------------
+
+class _DriveRequest:
+    def __init__(self, fn: Callable):
+        self._fn = fn
+
+    def execute(self):
+        return self._fn()
+
+
+class FakeDrive:
+    """Just enough of the Drive v3 files() API for listing and exporting Google Docs."""
+
+    def __init__(self, files: List[Dict]):
+        self._files = files
+        self._by_id = {f['id']: f for f in files}
+        self._lock = threading.Lock()
+        self.calls = 0
+
+    def _count(self) -> None:
+        with self._lock:
+            self.calls += 1
+
+    def files(self):
+        return self
+
+    def list(self, q: str = '', **kwargs):
+        def run():
+            self._count()
+            parent = re.search(r"'([^']+)' in parents", q)
+            mime = re.search(r"mimeType='([^']+)'", q)
+            if not parent or parent.group(1) != BENCH_FOLDER_ID or (mime and mime.group(1) != GOOGLE_DOC):
+                return {'files': []}
+            listed = [{k: v for k, v in f.items() if k != 'content'} for f in self._files]
+            for cutoff in re.findall(r"modifiedTime > '([^']+)'", q):
+                listed = [f for f in listed if f['modifiedTime'] > cutoff]
+            return {'files': listed}
+        return _DriveRequest(run)
+
+    def export_media(self, fileId: str, mimeType: str = 'text/plain'):
+        def run():
+            self._count()
+            return self._by_id[fileId]['content'].encode('utf-8')
+        return _DriveRequest(run)
+
+
+# ---------------------------------------------------------------------------
+# Replay LLM
+# ---------------------------------------------------------------------------
+
+SPEAKER_RE = re.compile(r'^\[\d\d:\d\d:\d\d\] ([^:\n]+):', re.MULTILINE)
+
+
+def _goals_response(names: List[str]) -> str:
+    return '\n'.join(
+        f"### {n}\n\n**What They Discussed:**\nOutreach to past clients and pricing.\n\n"
+        f"**Their Commitment for Next Week:**\nSend 10 LinkedIn messages and book 3 calls\n\n"
+        f"**Classification:** Quantifiable\n\n**Exact Quote:**\n\"I will send 10 messages\"\n\n"
+        f"**Timestamp:**\n00:0{i % 10}:00\n\n---\n"
+        for i, n in enumerate(names))
+
+
+def _activity_response(names: List[str]) -> str:
+    return '\n'.join(
+        f"Name: {n}\n- Network Activation: Asked two past clients for referrals\n"
+        f"- LinkedIn: Sent 10 connection requests\n- Cold Outreach: Emailed 5 prospects\n"
+        for n in names)
+
+
+def _outcomes_response(names: List[str]) -> str:
+    return '\n'.join(f"Name: {n}\nMeetings: 2\nProposals: 1\nClients: {i % 2}\nNotes: Steady week\n"
+                     for i, n in enumerate(names))
+
+
+def _stuck_response(names: List[str]) -> str:
+    return '\n'.join(
+        f"[{n}]\nStuck Summary:\nKeeps postponing the pricing proposal.\nExact Quotes:\n"
+        f"\"I keep putting off the proposal\"\nTimestamp:\n00:12:30\nStuck Classification:\nProcrastination\n"
+        for n in names[::3])
+
+
+def _challenges_response(names: List[str]) -> str:
+    return '\n'.join(
+        f"Name: {n}\nChallenge: Not enough qualified leads\nCategory: Lead Generation\n"
+        f"Strategies/Tips:\n- Ask for referrals after delivery (Source: Peer)\n"
+        for n in names[::2])
+
+
+class ReplayLLM:
+    """Returns canned responses shaped like each prompt's expected output, after a fixed latency."""
+
+    def __init__(self, latency_s: float = 0.02):
+        self.latency_s = latency_s
+        self.calls = 0
+        self._lock = threading.Lock()
+        self._routes: List = []
+
+    def route(self, template: str, builder: Callable[[List[str]], str]) -> None:
+        prefix = (template or '').split('{', 1)[0].strip()[:200]
+        if prefix:
+            self._routes.append((prefix, builder))
+
+    def generate(self, prompt: str, model_hint: str = 'default') -> str:
+        with self._lock:
+            self.calls += 1
+        if self.latency_s:
+            time.sleep(self.latency_s)
+        names = list(dict.fromkeys(SPEAKER_RE.findall(prompt)))
+        stripped = prompt.lstrip()
+        for prefix, builder in self._routes:
+            if stripped.startswith(prefix):
+                return builder(names)
+        return '[]'
+
+    def generate_content(self, prompt: str):
+        """google.generativeai GenerativeModel interface."""
+        return SimpleNamespace(text=self.generate(prompt))
+
+
+# ---------------------------------------------------------------------------
+# In-memory Supabase
+# ---------------------------------------------------------------------------
+
+def _cmp_value(v):
+    return (v is None, str(v) if not isinstance(v, (int, float)) else v)
+
+
+def _loose_eq(a, b) -> bool:
+    return a == b or (a is not None and b is not None and str(a) == str(b))
+
+
+class _NotFilter:
+    def __init__(self, query: '_FakeQuery'):
+        self._query = query
+
+    def __getattr__(self, name):
+        method = getattr(self._query, name)
+
+        def negated(*args, **kwargs):
+            before = len(self._query._filters)
+            method(*args, **kwargs)
+            pred = self._query._filters.pop(before)
+            self._query._filters.append(lambda r, p=pred: not p(r))
+            return self._query
+        return negated
+
+
+class _FakeQuery:
+    def __init__(self, db: 'FakeSupabase', table: str):
+        self._db = db
+        self._table = table
+        self._op = 'select'
+        self._payload = None
+        self._on_conflict = None
+        self._ignore_duplicates = False
+        self._filters: List[Callable[[Dict], bool]] = []
+        self._order: List = []
+        self._limit: Optional[int] = None
+        self._offset = 0
+        self._single = None
+        self._count = None
+
+    # Operations
+    def select(self, columns: str = '*', count: Optional[str] = None, **kwargs):
+        self._count = count
+        return self
+
+    def insert(self, rows, **kwargs):
+        self._op, self._payload = 'insert', rows
+        return self
+
+    def upsert(self, rows, on_conflict: Optional[str] = None, ignore_duplicates: bool = False, **kwargs):
+        self._op, self._payload = 'upsert', rows
+        self._on_conflict, self._ignore_duplicates = on_conflict, ignore_duplicates
+        return self
+
+    def update(self, values: Dict, **kwargs):
+        self._op, self._payload = 'update', values
+        return self
+
+    def delete(self, **kwargs):
+        self._op = 'delete'
+        return self
+
+    # Filters
+    def eq(self, col, val):
+        self._filters.append(lambda r: _loose_eq(r.get(col), val))
+        return self
+
+    def neq(self, col, val):
+        self._filters.append(lambda r: not _loose_eq(r.get(col), val))
+        return self
+
+    def in_(self, col, vals):
+        wanted = {str(v) for v in vals}
+        self._filters.append(lambda r: r.get(col) is not None and str(r.get(col)) in wanted)
+        return self
+
+    def _compare(self, col, val, op):
+        def pred(r):
+            v = r.get(col)
+            if v is None:
+                return False
+            try:
+                return op(_cmp_value(v), _cmp_value(val))
+            except TypeError:
+                return op(str(v), str(val))
+        self._filters.append(pred)
+        return self
+
+    def gte(self, col, val):
+        return self._compare(col, val, lambda a, b: a >= b)
+
+    def gt(self, col, val):
+        return self._compare(col, val, lambda a, b: a > b)
+
+    def lte(self, col, val):
+        return self._compare(col, val, lambda a, b: a <= b)
+
+    def lt(self, col, val):
+        return self._compare(col, val, lambda a, b: a < b)
+
+    def is_(self, col, val):
+        self._filters.append(lambda r: (r.get(col) is None) if str(val).lower() == 'null' else r.get(col) == val)
+        return self
+
+    def ilike(self, col, pattern):
+        rx = re.compile('^' + re.escape(str(pattern)).replace('%', '.*') + '$', re.IGNORECASE | re.DOTALL)
+        self._filters.append(lambda r: r.get(col) is not None and bool(rx.match(str(r.get(col)))))
+        return self
+
+    def match(self, values: Dict):
+        for col, val in values.items():
+            self.eq(col, val)
+        return self
+
+    @property
+    def not_(self):
+        return _NotFilter(self)
+
+    # Modifiers
+    def order(self, col, desc: bool = False, **kwargs):
+        self._order.append((col, desc))
+        return self
+
+    def limit(self, n: int, **kwargs):
+        self._limit = n
+        return self
+
+    def range(self, start: int, end: int, **kwargs):
+        self._offset, self._limit = start, end - start + 1
+        return self
+
+    def single(self):
+        self._single = 'single'
+        return self
+
+    def maybe_single(self):
+        self._single = 'maybe'
+        return self
+
+    def execute(self):
+        return self._db._execute(self)
+
+
+class _FakeSchema:
+    def __init__(self, db: 'FakeSupabase'):
+        self._db = db
+
+    def table(self, name: str) -> _FakeQuery:
+        return _FakeQuery(self._db, name)
+
+    def from_(self, name: str) -> _FakeQuery:
+        return self.table(name)
+
+    def rpc(self, fn: str, params: Optional[Dict] = None) -> _FakeQuery:
+        return self._db.rpc(fn, params)
+
+
+class FakeSupabase:
+    """Thread-safe in-memory tables behind the supabase-py query builder; counts round trips."""
+
+    def __init__(self):
+        self.tables: Dict[str, List[Dict]] = {}
+        self.round_trips = 0
+        self.by_table: Counter = Counter()
+        self._lock = threading.Lock()
+
+    def schema(self, name: str) -> _FakeSchema:
+        return _FakeSchema(self)
+
+    def table(self, name: str) -> _FakeQuery:
+        return _FakeQuery(self, name)
+
+    def rpc(self, fn: str, params: Optional[Dict] = None) -> _FakeQuery:
+        q = _FakeQuery(self, f'rpc:{fn}')
+        q._op = 'rpc'
+        return q
+
+    def _execute(self, q: _FakeQuery):
+        with self._lock:
+            self.round_trips += 1
+            self.by_table[(q._table, q._op)] += 1
+            if q._op == 'rpc':
+                return SimpleNamespace(data=None, count=None)
+            rows = self.tables.setdefault(q._table, [])
+            data = getattr(self, f'_do_{q._op}')(q, rows)
+        count = len(data) if q._count else None
+        if q._single == 'single':
+            if len(data) != 1:
+                raise Exception(f'JSON object requested, multiple (or no) rows returned ({len(data)})')
+            data = data[0]
+        elif q._single == 'maybe':
+            data = data[0] if data else None
+        return SimpleNamespace(data=data, count=count)
+
+    @staticmethod
+    def _as_list(payload) -> List[Dict]:
+        return [dict(r) for r in (payload if isinstance(payload, list) else [payload])]
+
+    @staticmethod
+    def _new_row(row: Dict) -> Dict:
+        row.setdefault('id', str(uuid.uuid4()))
+        row.setdefault('created_at', datetime.now(timezone.utc).isoformat())
+        return row
+
+    def _do_select(self, q: _FakeQuery, rows: List[Dict]) -> List[Dict]:
+        out = [r for r in rows if all(f(r) for f in q._filters)]
+        for col, desc in reversed(q._order):
+            out.sort(key=lambda r: _cmp_value(r.get(col)), reverse=desc)
+        end = None if q._limit is None else q._offset + q._limit
+        return [dict(r) for r in out[q._offset:end]]
+
+    def _do_insert(self, q: _FakeQuery, rows: List[Dict]) -> List[Dict]:
+        new = [self._new_row(r) for r in self._as_list(q._payload)]
+        rows.extend(new)
+        return [dict(r) for r in new]
+
+    def _do_upsert(self, q: _FakeQuery, rows: List[Dict]) -> List[Dict]:
+        keys = [c.strip() for c in (q._on_conflict or 'id').split(',')]
+        out = []
+        for r in self._as_list(q._payload):
+            existing = next((e for e in rows if all(k in r and _loose_eq(e.get(k), r[k]) for k in keys)), None)
+            if existing is None:
+                existing = self._new_row(r)
+                rows.append(existing)
+            elif not q._ignore_duplicates:
+                existing.update(r)
+            out.append(dict(existing))
+        return out
+
+    def _do_update(self, q: _FakeQuery, rows: List[Dict]) -> List[Dict]:
+        out = []
+        for r in rows:
+            if all(f(r) for f in q._filters):
+                r.update(q._payload)
+                out.append(dict(r))
+        return out
+
+    def _do_delete(self, q: _FakeQuery, rows: List[Dict]) -> List[Dict]:
+        gone = [r for r in rows if all(f(r) for f in q._filters)]
+        rows[:] = [r for r in rows if r not in gone]
+        return gone
+
+
+# ---------------------------------------------------------------------------
+# Runs
+# ---------------------------------------------------------------------------
+
+def _peak_rss_mb() -> float:
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports KiB, macOS bytes
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+
+def _wire(files: List[Dict], llm: ReplayLLM, sb: FakeSupabase):
+    """Point the pipeline's clients at the stand-ins and return a ready TranscriptProcessor."""
+    import main
+    import llm_archive
+    import ai_llm_fallback
+    import goal_extractor
+    import marketing_extractor
+    import stuck_extractor
+    import challenges_extractor
+
+    main.create_client = lambda *args, **kwargs: sb
+    ai_llm_fallback._generate = llm.generate
+    llm_archive.ARCHIVE_DIR = tempfile.mkdtemp(prefix='bench_llm_archive_')
+
+    processor = main.TranscriptProcessor(organization_id=ORGANIZATION_ID)
+    processor.drive_service = FakeDrive(files)
+    processor.model = llm
+    processor.community_config['enabled'] = False
+
+    llm.route(goal_extractor.PROMPT, _goals_response)
+    llm.route(marketing_extractor.PROMPT_ACTIVITY, _activity_response)
+    llm.route(marketing_extractor.PROMPT_OUTCOMES, _outcomes_response)
+    llm.route(stuck_extractor.PROMPT_STUCK, _stuck_response)
+    llm.route(challenges_extractor.PROMPT, _challenges_response)
+    for template, builder in [(processor.EXTRACT_COMMITMENTS, _goals_response),
+                              (processor.GOAL_EXTRACTION, _goals_response),
+                              (processor.CLASSIFY_COMMITMENTS, _goals_response),
+                              (processor.MARKETING_ACTIVITY_EXTRACTION, _activity_response),
+                              (processor.PIPELINE_OUTCOME_EXTRACTION, _outcomes_response),
+                              (processor.STUCK_SIGNAL_EXTRACTION, _stuck_response),
+                              (processor.CHALLENGE_STRATEGY_EXTRACTION, _challenges_response)]:
+        llm.route(template, builder)
+    return processor
+
+
+def _run_extractors(processor, sb: FakeSupabase, concurrency: int, tasks: List[str]) -> int:
+    """Same flow as run_all_extractors.py: one crawl, then every task per file."""
+    from goal_extractor import _collect_transcript_files
+    from extractor_registry import run_task
+    from processing_ledger import ProcessingLedger
+
+    files = _collect_transcript_files(processor, [BENCH_FOLDER_URL], None, True)
+    ledger = ProcessingLedger(sb, ORGANIZATION_ID).load(tasks)
+
+    def one(f: Dict) -> None:
+        for task in tasks:
+            try:
+                run_task(task, processor, sb, f, ORGANIZATION_ID, ledger)
+            except Exception as e:
+                print(f'  ⚠️ {task} error: {e}')
+
+    with ThreadPoolExecutor(max_workers=max(1, concurrency)) as executor:
+        list(executor.map(one, files))
+    return len(files)
+
+
+def _run_process_transcript(processor, concurrency: int) -> int:
+    results = processor.process_recent_transcripts(folder_url=BENCH_FOLDER_URL, days_back=30, max_workers=concurrency)
+    return results['processed'] + results['failed']
+
+
+def bench_one(mode: str, n: int, llm_latency_ms: float, concurrency: int, tasks: List[str],
+              fixtures_dir: Optional[str] = None, verbose: bool = False) -> Dict:
+    """Run one benchmark in the current process and return its metrics."""
+    files = build_fixtures(n, fixtures_dir)
+    llm = ReplayLLM(latency_s=llm_latency_ms / 1000.0)
+    sb = FakeSupabase()
+
+    out = io.StringIO()
+    with (contextlib.nullcontext() if verbose else contextlib.redirect_stdout(out)):
+        processor = _wire(files, llm, sb)
+        setup_trips = sb.round_trips
+        started = time.perf_counter()
+        if mode == 'extractors':
+            handled = _run_extractors(processor, sb, concurrency, tasks)
+        else:
+            handled = _run_process_transcript(processor, concurrency)
+        from write_buffer import flush_all
+        flush_all()
+        elapsed = time.perf_counter() - started
+
+    handled = handled or 1
+    return {
+        'mode': mode,
+        'transcripts': n,
+        'seconds': elapsed,
+        'per_minute': handled / elapsed * 60 if elapsed else 0.0,
+        'llm_per_transcript': llm.calls / handled,
+        'db_per_transcript': (sb.round_trips - setup_trips) / handled,
+        'drive_per_transcript': processor.drive_service.calls / handled,
+        'peak_rss_mb': _peak_rss_mb(),
+        'top_tables': sb.by_table.most_common(5),
+    }
+
+
+def build_risk_events(n: int, members: int = 2000, seed: int = 7) -> Dict[str, List[Dict]]:
+    """n synthetic rows for risk_analysis: 60% activity, 20% goal events, 20% attendance."""
+    rng = random.Random(seed)
+    member_rows = [{'id': str(uuid.uuid4()), 'full_name': f'{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}',
+                    'group_id': f'g{i % 12}', 'status': 'active'} for i in range(members)]
+    ids = [m['id'] for m in member_rows]
+    day0 = datetime(2025, 1, 1)
+    n_activity, n_goals = int(n * 0.6), int(n * 0.2)
+    activity = [{'member_id': rng.choice(ids), 'count': rng.randint(0, 5),
+                 rng.choice(['subtype', 'type']): rng.choice(['meeting_booked', 'proposal_sent', 'client_closed', 'post'])}
+                for _ in range(n_activity)]
+    goal_events = [{'member_id': rng.choice(ids), 'event_type': rng.choice(['goal_set', 'goal_update', 'goal_completed'])}
+                   for _ in range(n_goals)]
+    attendance = [{'member_id': rng.choice(ids), 'date': (day0 + timedelta(days=7 * rng.randint(0, 52))).date().isoformat(),
+                   'status': rng.choice(['present', 'present', 'absent']), 'reason': rng.choice([None, None, None, 'sick'])}
+                  for _ in range(n - n_activity - n_goals)]
+    return {'members': member_rows, 'activity': activity, 'goal_events': goal_events, 'attendance': attendance,
+            'group_map': {f'g{i}': f'G{i}' for i in range(12)}}
+
+
+def _aggregate_member_metrics_rows(members: List[Dict], activity: List[Dict], goal_events: List[Dict],
+                                   attendance: List[Dict], group_map: Dict[str, str]) -> Dict:
+    """aggregate_member_metrics with attendance walked row at a time per member, as it was
+    before the vectorized pass; the reference bench_risk times and checks against."""
+    from risk_analysis import aggregate_member_metrics
+    agg = aggregate_member_metrics(members, activity, goal_events, [], group_map)
+    member_days: Dict[str, List[Dict]] = {}
+    for att in attendance:
+        mid = att.get('member_id') or att.get('member')
+        if mid:
+            member_days.setdefault(mid, []).append(att)
+    for mid, days in member_days.items():
+        if mid not in agg:
+            continue
+        consecutive = 0
+        for d in sorted(days, key=lambda d: d['date']):
+            if (d.get('status') or d.get('attendance_status')) == 'absent' and not d.get('reason'):
+                agg[mid].missed_calls_unexcused += 1
+                consecutive += 1
+            else:
+                consecutive = 0
+            agg[mid].consecutive_unexcused_misses = max(agg[mid].consecutive_unexcused_misses, consecutive)
+    return agg
+
+
+def bench_risk(n: int, repeat: int = 5) -> Dict:
+    """Time aggregate_member_metrics against the row-at-a-time version on n events (best of repeat)
+    and check they agree. Timings on a shared machine are noisy; compare several runs."""
+    from risk_analysis import aggregate_member_metrics
+    data = build_risk_events(n)
+    timings = {}
+    results = {}
+    for label, fn in (('rows', _aggregate_member_metrics_rows), ('vectorized', aggregate_member_metrics)):
+        for _ in range(repeat):
+            gc.collect()
+            started = time.perf_counter()
+            results[label] = fn(data['members'], data['activity'], data['goal_events'], data['attendance'], data['group_map'])
+            elapsed = time.perf_counter() - started
+            timings[label] = min(timings.get(label, elapsed), elapsed)
+    return {'events': n, 'members': len(data['members']), 'rows_s': timings['rows'],
+            'vectorized_s': timings['vectorized'], 'same': results['rows'] == results['vectorized'],
+            'peak_rss_mb': _peak_rss_mb()}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='Offline throughput benchmark for the extraction pipeline')
+    parser.add_argument('--mode', choices=['extractors', 'process_transcript', 'risk'], default='extractors',
+                        help='run_all_extractors flow, TranscriptProcessor.process_transcript, or risk aggregation')
+    parser.add_argument('--sizes', nargs='*', type=int, default=[10, 100, 1000], help='Transcript counts to run')
+    parser.add_argument('--llm_latency_ms', type=float, default=20.0, help='Simulated latency per LLM call')
+    parser.add_argument('--concurrency', type=int, default=1, help='Transcripts processed at once')
+    parser.add_argument('--tasks', nargs='*', default=None, help='Extractor tasks (extractors mode; default: all defaults)')
+    parser.add_argument('--fixtures', type=str, default=None, help='Folder of .txt transcripts (default: synthetic)')
+    parser.add_argument('--verbose', action='store_true', help='Show pipeline output')
+    args = parser.parse_args()
+
+    if args.mode == 'risk':
+        print('🏁 risk: aggregate_member_metrics, row-at-a-time vs vectorized attendance')
+        print(f"{'events':>9} {'members':>8} {'rows':>9} {'vector':>9} {'speedup':>8} {'same':>5}")
+        for n in args.sizes:
+            with ProcessPoolExecutor(max_workers=1) as executor:
+                r = executor.submit(bench_risk, n).result()
+            print(f"{r['events']:>9} {r['members']:>8} {r['rows_s']:>8.3f}s {r['vectorized_s']:>8.3f}s "
+                  f"{r['rows_s'] / r['vectorized_s']:>7.1f}x {str(r['same']):>5}")
+        return
+
+    from extractor_registry import DEFAULT_TASKS
+    tasks = args.tasks or DEFAULT_TASKS
+
+    print(f'🏁 {args.mode}: latency {args.llm_latency_ms:g} ms/LLM call, concurrency {args.concurrency}')
+    print(f"{'transcripts':>11} {'per min':>9} {'LLM/t':>7} {'DB/t':>7} {'Drive/t':>8} {'peak RSS':>10}")
+    for n in args.sizes:
+        # Fresh process per size so peak RSS isn't carried over from a larger run
+        with ProcessPoolExecutor(max_workers=1) as executor:
+            r = executor.submit(bench_one, args.mode, n, args.llm_latency_ms, args.concurrency, tasks,
+                                args.fixtures, args.verbose).result()
+        print(f"{r['transcripts']:>11} {r['per_minute']:>9.1f} {r['llm_per_transcript']:>7.1f} "
+              f"{r['db_per_transcript']:>7.1f} {r['drive_per_transcript']:>8.1f} {r['peak_rss_mb']:>8.1f}MB")
+        if args.verbose:
+            print(f"             busiest tables: {r['top_tables']}")
+
+
+if __name__ == '__main__':
+    main()
@@ -7,6 +7,9 @@ from datetime import datetime
 
 from dotenv import load_dotenv
 from ai_llm_fallback import ai_generate_content
+from llm_archive import archive_responses, register_prompt, PROMPT_HASHES
+from processing_ledger import ProcessingLedger, run_with_ledger, filter_since
+from analysis_writer import upsert_analysis
 from supabase import create_client, Client
 
 from main import TranscriptProcessor
@@ -19,10 +22,13 @@ load_dotenv()
 def _load_prompt(rel_path: str) -> str:
     p = os.path.join(os.path.dirname(__file__), rel_path)
     with open(p, 'r', encoding='utf-8') as f:
-        return f.read().replace('[Transcript goes here]', '{transcript}')
+        return register_prompt(rel_path, f.read().replace('[Transcript goes here]', '{transcript}'))
 
 
 PROMPT = _load_prompt('prompts/challenges_strategies.md')
+PROMPT_VERSION = PROMPT_HASHES['prompts/challenges_strategies.md']
+EXTRACTOR = 'challenges'
+ARCHIVE_VERSIONS = {'challenges': PROMPT_VERSION}
 
 
 def _parse_response(text: str) -> List[Dict]:
@@ -65,54 +71,72 @@ def _parse_response(text: str) -> List[Dict]:
     return items
 
 
-def _save(sb: Client, session_id: str, org_id: str, items: List[Dict]) -> None:
-    payload = {
+def _save(sb: Client, session_id: str, org_id: str, items: List[Dict], prompt_hash: str = PROMPT_VERSION) -> None:
+    upsert_analysis(sb, session_id, org_id, {
         'challenges_strategies_json': items,
-        'organization_id': org_id,
-        'processing_status': 'completed',
-    }
-    existing = sb.schema('peer_progress').table('transcript_analysis').select('id').eq('transcript_session_id', session_id).execute()
-    if existing.data:
-        sb.schema('peer_progress').table('transcript_analysis').update(payload).eq('id', existing.data[0]['id']).execute()
-    else:
-        payload['transcript_session_id'] = session_id
-        sb.schema('peer_progress').table('transcript_analysis').insert(payload).execute()
+        'challenges_prompt_hash': prompt_hash,
+    })
+
+
+def call_llm(content: str) -> Dict[str, str]:
+    """Raw LLM responses for one transcript, keyed by archive task."""
+    return {'challenges': ai_generate_content(PROMPT.format(transcript=content))}
+
+
+def parse(raw: Dict[str, str]) -> List[Dict]:
+    return _parse_response(raw['challenges'])
+
+
+def analysis_payload(items: List[Dict]) -> Dict:
+    """transcript_analysis columns written for this task."""
+    return {'challenges_strategies_json': items, 'challenges_prompt_hash': PROMPT_VERSION}
+
+
+def process_file(processor: TranscriptProcessor, sb: Client, f: Dict, organization_id: str, content: str) -> int:
+    """Run challenges/strategies extraction for one downloaded transcript. Returns items saved."""
+    fname = f['name']
+    # session derive
+    mod = f.get('modifiedTime') or ''
+    try:
+        session_date = datetime.fromisoformat(mod.replace('Z', '+00:00')).date().isoformat()
+    except Exception:
+        session_date = None
+    session_rec = processor.create_transcript_session(filename=fname, group_name=fname, session_date=session_date, raw_transcript=None)
+    if not session_rec:
+        raise Exception('could not create/find session')
+
+    raw = call_llm(content)
+    archive_responses(raw, ARCHIVE_VERSIONS, f['id'], {
+        'filename': fname, 'session_id': session_rec['id'], 'session_date': session_date, 'organization_id': organization_id,
+    })
+    items = parse(raw)
+    _save(sb, session_rec['id'], organization_id, items)
+    print(f'  ✓ Saved {len(items)} items')
+    return len(items)
 
 
 def extract_challenges(folder_url: str | None = None,
                        organization_id: str = 'f58a2d22-4e96-4d4a-9348-b82c8e3f1f2e',
                        days_back: int | None = None,
-                       recursive: bool = True) -> None:
+                       recursive: bool = True,
+                       force: bool = False,
+                       since: str | None = None) -> None:
     sb = create_client(os.getenv('SUPABASE_URL'), os.getenv('SUPABASE_SERVICE_KEY'))
     processor = TranscriptProcessor(organization_id=organization_id)
 
     files = _get_files_recursively(processor, folder_url, days_back) if recursive else processor.get_recent_transcripts(folder_url, days_back or 30)
+    files = filter_since(files, since)
     if not files:
         print('No files found')
         return
 
+    ledger = ProcessingLedger(sb, organization_id).load([EXTRACTOR])
     for f in files:
         fname = f['name']
         print(f'Processing: {fname}')
         try:
-            content = processor.download_and_read_file(f['id'], fname, f['mimeType'])
-            if not content.strip():
-                continue
-            # session derive
-            mod = f.get('modifiedTime') or ''
-            try:
-                session_date = datetime.fromisoformat(mod.replace('Z', '+00:00')).date().isoformat()
-            except Exception:
-                session_date = None
-            session_rec = processor.create_transcript_session(filename=fname, group_name=fname, session_date=session_date, raw_transcript=None)
-            if not session_rec:
-                print('  ✗ could not create/find session')
-                continue
-
-            resp = ai_generate_content(PROMPT.format(transcript=content))
-            items = _parse_response(resp)
-            _save(sb, session_rec['id'], organization_id, items)
-            print(f'  ✓ Saved {len(items)} items')
+            run_with_ledger(ledger, processor, f, EXTRACTOR, PROMPT_VERSION,
+                            lambda content: process_file(processor, sb, f, organization_id, content), force=force)
         except Exception as e:
             print(f'  ✗ Error: {e}')
 
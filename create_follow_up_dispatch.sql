@@ -0,0 +1,87 @@
+-- Claim-and-batch dispatch for participant_follow_ups (follow_up_dispatcher.py).
+-- Due follow-ups are claimed in pages with FOR UPDATE SKIP LOCKED, moving them
+-- scheduled -> sending under a lease, so overlapping dispatchers never pick the
+-- same row. Results are written back in one call per page, and only by the
+-- worker that still holds the claim.
+-- Run this in your Supabase SQL Editor
+
+ALTER TABLE peer_progress.participant_follow_ups
+ADD COLUMN IF NOT EXISTS claimed_by TEXT;
+
+ALTER TABLE peer_progress.participant_follow_ups
+ADD COLUMN IF NOT EXISTS lease_expires_at TIMESTAMPTZ;
+
+ALTER TABLE peer_progress.participant_follow_ups
+ADD COLUMN IF NOT EXISTS attempt_count INTEGER DEFAULT 0;
+
+ALTER TABLE peer_progress.participant_follow_ups
+ADD COLUMN IF NOT EXISTS last_error TEXT;
+
+CREATE INDEX IF NOT EXISTS idx_follow_ups_due
+    ON peer_progress.participant_follow_ups (follow_up_status, scheduled_date);
+
+-- Claim up to p_limit due follow-ups (or ones whose lease expired mid-send)
+CREATE OR REPLACE FUNCTION peer_progress.claim_follow_ups(
+    p_worker TEXT,
+    p_limit INTEGER DEFAULT 200,
+    p_lease_seconds INTEGER DEFAULT 300,
+    p_organization_id UUID DEFAULT NULL
+)
+RETURNS SETOF peer_progress.participant_follow_ups AS $$
+BEGIN
+    RETURN QUERY
+    WITH due AS (
+        SELECT f.id
+        FROM peer_progress.participant_follow_ups f
+        WHERE ((f.follow_up_status = 'scheduled' AND f.scheduled_date <= NOW())
+               OR (f.follow_up_status = 'sending' AND f.lease_expires_at < NOW()))
+          AND (p_organization_id IS NULL OR f.organization_id = p_organization_id)
+        ORDER BY f.scheduled_date
+        LIMIT p_limit
+        FOR UPDATE SKIP LOCKED
+    )
+    UPDATE peer_progress.participant_follow_ups t
+    SET follow_up_status = 'sending',
+        claimed_by = p_worker,
+        lease_expires_at = NOW() + make_interval(secs => p_lease_seconds),
+        attempt_count = COALESCE(t.attempt_count, 0) + 1,
+        updated_at = NOW()
+    FROM due
+    WHERE t.id = due.id
+    RETURNING t.*;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Write back a page of results: [{"id": ..., "status": "sent" | "failed" | "scheduled", "error": ...}].
+-- Rows this worker no longer holds (lease expired and reclaimed) are left alone.
+CREATE OR REPLACE FUNCTION peer_progress.complete_follow_ups(
+    p_worker TEXT,
+    p_results JSONB
+)
+RETURNS INTEGER AS $$
+DECLARE
+    v_updated INTEGER;
+BEGIN
+    UPDATE peer_progress.participant_follow_ups t
+    SET follow_up_status = r.status,
+        sent_date = CASE WHEN r.status = 'sent' THEN NOW() ELSE t.sent_date END,
+        -- Retries back off 5 minutes per attempt so one run doesn't hammer a failing channel
+        scheduled_date = CASE WHEN r.status = 'scheduled'
+                              THEN NOW() + make_interval(mins => 5 * COALESCE(t.attempt_count, 1))
+                              ELSE t.scheduled_date END,
+        last_error = r.error,
+        claimed_by = NULL,
+        lease_expires_at = NULL,
+        updated_at = NOW()
+    FROM jsonb_to_recordset(p_results) AS r(id UUID, status TEXT, error TEXT)
+    WHERE t.id = r.id
+      AND t.follow_up_status = 'sending'
+      AND t.claimed_by = p_worker
+      AND r.status IN ('sent', 'failed', 'scheduled');
+    GET DIAGNOSTICS v_updated = ROW_COUNT;
+    RETURN v_updated;
+END;
+$$ LANGUAGE plpgsql;
+
+GRANT EXECUTE ON FUNCTION peer_progress.claim_follow_ups(TEXT, INTEGER, INTEGER, UUID) TO service_role;
+GRANT EXECUTE ON FUNCTION peer_progress.complete_follow_ups(TEXT, JSONB) TO service_role;
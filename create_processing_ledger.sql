@@ -0,0 +1,28 @@
+-- Processing ledger: which Drive file versions each extractor has handled
+-- Run this in your Supabase SQL Editor
+
+CREATE TABLE IF NOT EXISTS peer_progress.processing_ledger (
+    id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
+    organization_id UUID REFERENCES peer_progress.organizations(id),
+    file_id TEXT NOT NULL,
+    file_name TEXT,
+    mime_type TEXT,
+    modified_time TIMESTAMPTZ,
+    extractor TEXT NOT NULL,
+    prompt_hash TEXT NOT NULL,
+    status TEXT CHECK (status IN ('completed', 'skipped', 'failed', 'processing')) NOT NULL,
+    started_at TIMESTAMPTZ,
+    finished_at TIMESTAMPTZ,
+    duration_ms INTEGER,
+    output_count INTEGER DEFAULT 0,
+    error_message TEXT,
+    created_at TIMESTAMPTZ DEFAULT NOW(),
+    updated_at TIMESTAMPTZ DEFAULT NOW()
+);
+
+-- One entry per file version, extractor and prompt; re-runs upsert onto it
+CREATE UNIQUE INDEX IF NOT EXISTS processing_ledger_key_idx
+    ON peer_progress.processing_ledger (file_id, modified_time, extractor, prompt_hash);
+
+CREATE INDEX IF NOT EXISTS processing_ledger_org_status_idx
+    ON peer_progress.processing_ledger (organization_id, status);
@@ -0,0 +1,15 @@
+-- Processing requests: dashboard views and explicit re-runs that jump the extraction queue
+-- Run this in your Supabase SQL Editor
+
+CREATE TABLE IF NOT EXISTS peer_progress.processing_requests (
+    id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
+    organization_id UUID REFERENCES peer_progress.organizations(id),
+    reason TEXT CHECK (reason IN ('dashboard_view', 'rerun')) NOT NULL,
+    -- session date (YYYY-MM-DD) for dashboard_view; Drive file id or filename for rerun
+    request_key TEXT NOT NULL,
+    requested_at TIMESTAMPTZ DEFAULT NOW(),
+    created_at TIMESTAMPTZ DEFAULT NOW()
+);
+
+CREATE UNIQUE INDEX IF NOT EXISTS processing_requests_key_idx
+    ON peer_progress.processing_requests (organization_id, reason, request_key);
@@ -0,0 +1,37 @@
+-- Compressed transcript bodies, stored once per content hash (transcript_store.py).
+-- transcript_sessions keeps only transcript_hash, so session lookups no longer
+-- carry the full transcript text.
+-- Run this in your Supabase SQL Editor
+--
+-- Then move existing bodies out of transcript_sessions:
+--   python transcript_store.py --migrate
+
+CREATE TABLE IF NOT EXISTS peer_progress.transcript_blobs (
+    content_hash TEXT PRIMARY KEY,           -- sha256 of the UTF-8 transcript text
+    body_gzip_b64 TEXT NOT NULL,             -- gzip'd text, base64-encoded
+    size_bytes INTEGER,
+    compressed_bytes INTEGER,
+    created_at TIMESTAMPTZ DEFAULT NOW()
+);
+
+ALTER TABLE peer_progress.transcript_sessions
+ADD COLUMN IF NOT EXISTS transcript_hash TEXT;
+
+CREATE INDEX IF NOT EXISTS idx_transcript_sessions_filename_group
+    ON peer_progress.transcript_sessions (filename, group_name);
+
+GRANT ALL ON peer_progress.transcript_blobs TO service_role;
+ALTER TABLE peer_progress.transcript_blobs ENABLE ROW LEVEL SECURITY;
+
+DO $$
+BEGIN
+  IF NOT EXISTS (
+    SELECT 1 FROM pg_policies
+    WHERE schemaname = 'peer_progress'
+      AND tablename = 'transcript_blobs'
+      AND policyname = 'Service role can do everything on transcript_blobs'
+  ) THEN
+    CREATE POLICY "Service role can do everything on transcript_blobs" ON peer_progress.transcript_blobs
+      FOR ALL TO service_role USING (true) WITH CHECK (true);
+  END IF;
+END$$;
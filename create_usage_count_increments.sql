@@ -0,0 +1,53 @@
+-- Atomic usage counters for challenge categories and strategy types.
+-- extract_challenges_and_strategies aggregates a transcript's increments in
+-- memory and applies them with one call, instead of a read-then-write per
+-- challenge/strategy that lost increments when runs overlapped. Each name
+-- resolves to exactly one row: the calling organization's own row when it has
+-- one, otherwise the shared default row (organization_id IS NULL).
+-- Run this in your Supabase SQL Editor
+--
+-- Example:
+--   SELECT peer_progress.increment_usage_counts(
+--       'f58a2d22-4e96-4d4a-9348-b82c8e3f1f2e'::uuid,
+--       '{"Lead Generation": 2, "Mindset": 1}'::jsonb,
+--       '{"Time Blocking": 1}'::jsonb);
+
+-- The first version had no organization parameter and updated every org's rows
+DROP FUNCTION IF EXISTS peer_progress.increment_usage_counts(JSONB, JSONB);
+
+CREATE OR REPLACE FUNCTION peer_progress.increment_usage_counts(
+    p_organization_id UUID,
+    p_category_deltas JSONB DEFAULT '{}'::jsonb,
+    p_strategy_type_deltas JSONB DEFAULT '{}'::jsonb
+)
+RETURNS VOID AS $$
+BEGIN
+    -- Each UPDATE adds to the current value under a row lock, so concurrent
+    -- callers never overwrite each other's increments
+    UPDATE peer_progress.challenge_categories c
+    SET usage_count = COALESCE(c.usage_count, 0) + t.delta
+    FROM (
+        SELECT DISTINCT ON (cc.category_name) cc.id, d.value::integer AS delta
+        FROM peer_progress.challenge_categories cc
+        JOIN jsonb_each_text(COALESCE(p_category_deltas, '{}'::jsonb)) d
+          ON cc.category_name = d.key
+        WHERE cc.organization_id = p_organization_id OR cc.organization_id IS NULL
+        ORDER BY cc.category_name, cc.organization_id NULLS LAST, cc.id
+    ) t
+    WHERE c.id = t.id;
+
+    UPDATE peer_progress.strategy_types s
+    SET usage_count = COALESCE(s.usage_count, 0) + t.delta
+    FROM (
+        SELECT DISTINCT ON (st.type_name) st.id, d.value::integer AS delta
+        FROM peer_progress.strategy_types st
+        JOIN jsonb_each_text(COALESCE(p_strategy_type_deltas, '{}'::jsonb)) d
+          ON st.type_name = d.key
+        WHERE st.organization_id = p_organization_id OR st.organization_id IS NULL
+        ORDER BY st.type_name, st.organization_id NULLS LAST, st.id
+    ) t
+    WHERE s.id = t.id;
+END;
+$$ LANGUAGE plpgsql;
+
+GRANT EXECUTE ON FUNCTION peer_progress.increment_usage_counts(UUID, JSONB, JSONB) TO service_role;
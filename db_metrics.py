@@ -0,0 +1,84 @@
+"""
+Round-trip counting for Supabase clients.
+
+CountingClient wraps a supabase-py client and counts every .execute() made
+through it, in total and per tracked block, so extractors can report how many
+DB round trips a transcript cost:
+
+    db = CountingClient(sb)
+    with db.track() as trips:
+        ...  # queries via db.schema(...).table(...)
+    print(trips.count)
+
+Tracking is per thread: a block only counts queries issued by its own thread.
+"""
+
+import threading
+from contextlib import contextmanager
+from typing import Any, Iterator, List
+
+
+_PLAIN = (str, bytes, int, float, bool, dict, list, tuple, set, type(None))
+
+
+class RoundTrips:
+    def __init__(self):
+        self.count = 0
+
+
+class _CountingProxy:
+    """Wraps a query builder (or anything it returns) and counts execute() calls."""
+
+    def __init__(self, target: Any, owner: 'CountingClient'):
+        self._target = target
+        self._owner = owner
+
+    def __getattr__(self, name: str) -> Any:
+        attr = getattr(self._target, name)
+        if name == 'execute':
+            def execute(*args, **kwargs):
+                self._owner._hit()
+                return attr(*args, **kwargs)
+            return execute
+        if callable(attr):
+            def call(*args, **kwargs):
+                return self._owner._wrap(attr(*args, **kwargs))
+            return call
+        return self._owner._wrap(attr)
+
+
+class CountingClient(_CountingProxy):
+    def __init__(self, client: Any):
+        super().__init__(client, self)
+        self.total = 0
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    @property
+    def client(self) -> Any:
+        return self._target
+
+    def _wrap(self, value: Any) -> Any:
+        return value if isinstance(value, _PLAIN) else _CountingProxy(value, self)
+
+    def _hit(self) -> None:
+        with self._lock:
+            self.total += 1
+        for tally in getattr(self._local, 'stack', []):
+            tally.count += 1
+
+    @contextmanager
+    def track(self) -> Iterator[RoundTrips]:
+        """Count the round trips made by this thread inside the block (nested blocks all count)."""
+        stack: List[RoundTrips] = self._local.__dict__.setdefault('stack', [])
+        tally = RoundTrips()
+        stack.append(tally)
+        try:
+            yield tally
+        finally:
+            stack.remove(tally)
+
+
+def counting(client: Any) -> CountingClient:
+    """Wrap a client unless it is already counted."""
+    return client if isinstance(client, CountingClient) else CountingClient(client)
@@ -0,0 +1,63 @@
+"""Registry of per-file extraction tasks.
+
+Each task wraps an extractor module's process_file(processor, sb, file, org_id, content)
+with its ledger name and prompt version, so runners, queue workers and the
+watcher can dispatch work by task name.
+
+Tasks also expose their phases separately (call_llm -> parse -> analysis_payload
+/ save_rows) so streaming_pipeline.py can run them on separate worker pools.
+"""
+
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional
+
+import goal_extractor
+import marketing_extractor
+import stuck_extractor
+import challenges_extractor
+import pipeline_extractor
+from processing_ledger import ProcessingLedger, run_with_ledger
+
+
+@dataclass(frozen=True)
+class ExtractorTask:
+    name: str
+    process_file: Callable[..., int]
+    prompt_version: str
+    call_llm: Callable[[str], Dict[str, str]]
+    parse: Callable[[Dict[str, str]], Any]
+    archive_versions: Dict[str, str]
+    # transcript_analysis columns for a parsed result, if the task writes any
+    analysis_payload: Optional[Callable[[Any], Dict]] = None
+    # Other writes: save_rows(processor, sb, f, org_id, session, parsed) -> output count
+    save_rows: Optional[Callable[..., int]] = None
+
+
+def _task(name: str, module, prompt_version: str) -> ExtractorTask:
+    return ExtractorTask(
+        name, module.process_file, prompt_version, module.call_llm, module.parse, module.ARCHIVE_VERSIONS,
+        getattr(module, 'analysis_payload', None), getattr(module, 'save_rows', None),
+    )
+
+
+TASKS: Dict[str, ExtractorTask] = {
+    'goals': _task('goals', goal_extractor, goal_extractor.PROMPT_VERSION),
+    'marketing': _task('marketing', marketing_extractor, marketing_extractor.PROMPT_VERSION),
+    'stuck': _task('stuck', stuck_extractor, stuck_extractor.PROMPT_STUCK_VERSION),
+    'challenges': _task('challenges', challenges_extractor, challenges_extractor.PROMPT_VERSION),
+    'pipeline': _task('pipeline', pipeline_extractor, pipeline_extractor.PROMPT_VERSION),
+}
+
+# Same set and order as run_all_extractors.py
+DEFAULT_TASKS: List[str] = ['goals', 'marketing', 'stuck', 'challenges']
+
+
+def run_task(task_name: str, processor, sb, f: Dict, organization_id: str,
+             ledger: Optional[ProcessingLedger] = None, force: bool = False) -> Optional[int]:
+    """Run one task for one Drive file, honouring the processing ledger."""
+    task = TASKS[task_name]
+    return run_with_ledger(
+        ledger, processor, f, task.name, task.prompt_version,
+        lambda content: task.process_file(processor, sb, f, organization_id, content),
+        force=force,
+    )
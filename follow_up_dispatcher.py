@@ -0,0 +1,156 @@
+"""
+Claim-and-batch dispatcher for scheduled participant follow-ups.
+
+Due follow-ups are claimed a page at a time by peer_progress.claim_follow_ups
+(see create_follow_up_dispatch.sql), which moves them scheduled -> sending
+under a lease with FOR UPDATE SKIP LOCKED, so overlapping runs never send the
+same follow-up twice. Each page is sent concurrently through its channel and
+the outcomes are written back with one complete_follow_ups call. A dispatcher
+that dies mid-page leaves its rows to be reclaimed when the lease expires.
+
+Channels are pluggable: anything with send(follow_up) that raises on failure.
+A follow-up uses source_details.channel if set, otherwise the default channel
+(FOLLOW_UP_CHANNEL, 'log' unless configured).
+
+Usage examples:
+  python follow_up_dispatcher.py
+  python follow_up_dispatcher.py --channel webhook --workers 32 --page_size 500
+"""
+
+import os
+import socket
+import uuid
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional
+
+import requests
+from dotenv import load_dotenv
+from supabase import create_client, Client
+
+
+class LogChannel:
+    """Prints the message (the original behaviour, ready for email/SMS integration)."""
+    name = 'log'
+
+    def send(self, follow_up: Dict) -> None:
+        print(f"\n📧 FOLLOW-UP MESSAGE FOR {follow_up['participant_name']}:\n"
+              f"📅 Scheduled: {follow_up['scheduled_date']}\n"
+              f"💬 Message: {follow_up['nudge_message']}\n" + "-" * 50)
+
+
+class WebhookChannel:
+    """POSTs the follow-up to FOLLOW_UP_WEBHOOK_URL."""
+    name = 'webhook'
+
+    def __init__(self, url: Optional[str] = None, timeout: float = 10.0):
+        self.url = url or os.getenv('FOLLOW_UP_WEBHOOK_URL')
+        if not self.url:
+            raise RuntimeError('FOLLOW_UP_WEBHOOK_URL is not set')
+        self.timeout = timeout
+        self.session = requests.Session()
+
+    def send(self, follow_up: Dict) -> None:
+        response = self.session.post(self.url, timeout=self.timeout, json={
+            'id': follow_up['id'],
+            'participant_name': follow_up['participant_name'],
+            'message': follow_up['nudge_message'],
+            'scheduled_date': follow_up['scheduled_date'],
+            'organization_id': follow_up.get('organization_id'),
+        })
+        if response.status_code not in (200, 201, 202, 204):
+            raise RuntimeError(f'webhook returned {response.status_code}')
+
+
+CHANNELS: Dict[str, Callable[[], object]] = {
+    'log': LogChannel,
+    'webhook': WebhookChannel,
+}
+
+
+class FollowUpDispatcher:
+    def __init__(self, sb: Client, channels: Optional[Dict[str, object]] = None, default_channel: Optional[str] = None,
+                 organization_id: Optional[str] = None, page_size: int = 200, workers: int = 16,
+                 lease_seconds: int = 300, max_attempts: int = 3, worker_id: Optional[str] = None):
+        self.sb = sb
+        self.default_channel = default_channel or os.getenv('FOLLOW_UP_CHANNEL', 'log')
+        self.channels = channels if channels is not None else {self.default_channel: CHANNELS[self.default_channel]()}
+        self.organization_id = organization_id
+        self.page_size = page_size
+        self.workers = workers
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self.worker_id = worker_id or f'{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}'
+
+    def _rpc(self, fn: str, params: Dict):
+        return self.sb.schema('peer_progress').rpc(fn, params).execute()
+
+    def claim(self) -> List[Dict]:
+        res = self._rpc('claim_follow_ups', {
+            'p_worker': self.worker_id,
+            'p_limit': self.page_size,
+            'p_lease_seconds': self.lease_seconds,
+            'p_organization_id': self.organization_id,
+        })
+        return res.data or []
+
+    def _channel_for(self, follow_up: Dict):
+        name = (follow_up.get('source_details') or {}).get('channel') or self.default_channel
+        channel = self.channels.get(name)
+        if channel is None:
+            raise RuntimeError(f'no channel configured for {name!r}')
+        return channel
+
+    def _send(self, follow_up: Dict) -> Dict:
+        try:
+            self._channel_for(follow_up).send(follow_up)
+            return {'id': follow_up['id'], 'status': 'sent', 'error': None}
+        except Exception as e:
+            # Retry on a later run until max_attempts, then give up
+            retry = (follow_up.get('attempt_count') or 1) < self.max_attempts
+            return {'id': follow_up['id'], 'status': 'scheduled' if retry else 'failed', 'error': str(e)[:500]}
+
+    def run(self, max_pages: Optional[int] = None) -> Dict[str, int]:
+        """Claim and send pages until nothing is due. Returns counts by outcome."""
+        counts = {'sent': 0, 'failed': 0, 'retry': 0, 'lost': 0}
+        pages = 0
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            while max_pages is None or pages < max_pages:
+                page = self.claim()
+                if not page:
+                    break
+                pages += 1
+                results = list(executor.map(self._send, page))
+                written = self._rpc('complete_follow_ups', {'p_worker': self.worker_id, 'p_results': results}).data
+                for r in results:
+                    counts['retry' if r['status'] == 'scheduled' else r['status']] += 1
+                # Rows whose lease expired and were reclaimed elsewhere are not written back by us
+                if isinstance(written, int) and written < len(results):
+                    counts['lost'] += len(results) - written
+                if len(page) < self.page_size:
+                    break
+        return counts
+
+
+def main() -> None:
+    load_dotenv()
+    parser = argparse.ArgumentParser(description='Send due participant follow-ups')
+    parser.add_argument('--organization_id', type=str, default=None, help='Only this organization (default: all)')
+    parser.add_argument('--channel', choices=list(CHANNELS.keys()), default=os.getenv('FOLLOW_UP_CHANNEL', 'log'))
+    parser.add_argument('--page_size', type=int, default=200, help='Follow-ups claimed per page')
+    parser.add_argument('--workers', type=int, default=16, help='Concurrent sends')
+    parser.add_argument('--lease_seconds', type=int, default=300, help='How long a claim lasts before others may retake it')
+    parser.add_argument('--max_attempts', type=int, default=3)
+    args = parser.parse_args()
+
+    sb = create_client(os.getenv('SUPABASE_URL'), os.getenv('SUPABASE_SERVICE_KEY'))
+    dispatcher = FollowUpDispatcher(sb, default_channel=args.channel, organization_id=args.organization_id,
+                                    page_size=args.page_size, workers=args.workers,
+                                    lease_seconds=args.lease_seconds, max_attempts=args.max_attempts)
+    counts = dispatcher.run()
+    print(f"✅ Follow-ups: {counts['sent']} sent, {counts['retry']} to retry, {counts['failed']} failed"
+          + (f", {counts['lost']} reclaimed by another dispatcher" if counts['lost'] else ''))
+
+
+if __name__ == '__main__':
+    main()
@@ -5,10 +5,15 @@ Reads transcripts (excluding Main Room), extracts quantifiable goals using Gemin
 
 import os
 import re
+import hashlib
 from dotenv import load_dotenv
 from datetime import datetime
-from typing import Dict, Optional
+from typing import Dict, Optional, Tuple
 from ai_llm_fallback import ai_generate_content
+from llm_archive import archive_responses, register_prompt, PROMPT_HASHES
+from processing_ledger import ProcessingLedger, run_with_ledger, filter_since
+from identity_map import identity_map_for
+from write_buffer import write_buffer_for, flush_all
 from main import TranscriptProcessor
 from supabase import create_client, Client
 
@@ -32,52 +37,45 @@ def _load_goal_extraction_prompt():
         with open(prompt_path, 'r', encoding='utf-8') as f:
             content = f.read()
             # Replace the placeholder with the transcript placeholder for formatting
-            return content.replace('[Transcript goes here]', '{transcript}')
+            return register_prompt('prompts/goal_extraction.md', content.replace('[Transcript goes here]', '{transcript}'))
     else:
         raise Exception(f"Prompt file not found at {prompt_path}")
 
 PROMPT = _load_goal_extraction_prompt()
+PROMPT_VERSION = PROMPT_HASHES['prompts/goal_extraction.md']
+EXTRACTOR = 'goals'
+ARCHIVE_VERSIONS = {'goals': PROMPT_VERSION}
 
 # --- Helpers to populate new tables ---
 def _ensure_group(sb: Client, group_code: str) -> str:
-    res = sb.schema('peer_progress').table('groups').select('id').eq('group_code', group_code).execute()
-    if res.data:
-        return res.data[0]['id']
-    ins = sb.schema('peer_progress').table('groups').insert({'group_code': group_code}).execute()
-    return ins.data[0]['id'] if ins.data else None
+    return identity_map_for(sb).group_id(group_code)
 
 def _ensure_member(sb: Client, full_name: str, group_code: str) -> str:
-    res = sb.schema('peer_progress').table('members').select('id').eq('full_name', full_name).eq('group_code', group_code).execute()
-    if res.data:
-        return res.data[0]['id']
-    ins = sb.schema('peer_progress').table('members').insert({'full_name': full_name, 'status': 'active', 'group_code': group_code}).execute()
-    return ins.data[0]['id'] if ins.data else None
+    return identity_map_for(sb).member_id(full_name, group_code)
+
+def _ensure_members(sb: Client, full_names: list, group_code: str) -> Dict[str, str]:
+    """Resolve many members of one group at once. Returns name -> id."""
+    return identity_map_for(sb).ensure_members(full_names, group_code)
 
 def _record_attendance(sb: Client, member_id: str, group_id: str, session_date: str) -> None:
-    try:
-        sb.schema('peer_progress').table('attendance').insert({
-            'member_id': member_id,
-            'group_id': group_id,
-            'date': session_date,
-            'status': 'present',
-            'reason': None,
-        }).execute()
-    except Exception:
-        pass
+    write_buffer_for(sb, 'attendance').add({
+        'member_id': member_id,
+        'group_id': group_id,
+        'date': session_date,
+        'status': 'present',
+        'reason': None,
+    })
 
 def _record_goal_event(sb: Client, member_id: str, group_id: str, goal_text: str, is_quantifiable: bool, ts_iso: str) -> None:
-    try:
-        sb.schema('peer_progress').table('goal_events').insert({
-            'member_id': member_id,
-            'group_id': group_id,
-            'event_type': 'goal_set',
-            'goal_text': goal_text,
-            'is_quantifiable': is_quantifiable,
-            'ts': ts_iso + 'T00:00:00Z' if len(ts_iso) == 10 else ts_iso,
-            'source': 'transcript',
-        }).execute()
-    except Exception:
-        pass
+    write_buffer_for(sb, 'goal_events').add({
+        'member_id': member_id,
+        'group_id': group_id,
+        'event_type': 'goal_set',
+        'goal_text': goal_text,
+        'is_quantifiable': is_quantifiable,
+        'ts': ts_iso + 'T00:00:00Z' if len(ts_iso) == 10 else ts_iso,
+        'source': 'transcript',
+    })
 
 def _parse_gemini_response(response_text: str, filename: str, session_date: str) -> Optional[Dict]:
     """Parse Gemini response to extract group and participant data"""
@@ -284,8 +282,53 @@ def _parse_participant_content(content: str, participant_name: str) -> Optional[
     
     return None
 
-def _save_group_to_supabase(supabase: Client, group_data: Dict, organization_id: str, filename: str, session_date: str) -> int:
-    """Save parsed group data to Supabase and return count of goals saved"""
+def _normalize_goal_text(text: Optional[str]) -> str:
+    """Collapse whitespace and lowercase for duplicate detection."""
+    if not text:
+        return ''
+    return re.sub(r"\s+", " ", text.strip()).lower()
+
+def _goal_content_hash(session_id: str, participant_name: str, goal_text: Optional[str]) -> str:
+    """Identity of a goal within a session; matches the backfill in add_goal_content_hash.sql."""
+    key = f"{session_id}|{participant_name}|{_normalize_goal_text(goal_text)}"
+    return hashlib.sha256(key.encode('utf-8')).hexdigest()
+
+# (organization_id, session filename) -> transcript_sessions.id, so each group's session is looked up once per run
+_session_ids: Dict[Tuple[str, str], str] = {}
+
+def _ensure_goal_session(supabase: Client, organization_id: str, session_filename: str, group_name: str, parsed_date) -> Optional[str]:
+    key = (organization_id, session_filename)
+    if key in _session_ids:
+        return _session_ids[key]
+    existing_session = supabase.schema('peer_progress').table('transcript_sessions').select('id').eq(
+        'filename', session_filename
+    ).eq('organization_id', organization_id).limit(1).execute()
+    
+    if existing_session.data:
+        session_id = existing_session.data[0]['id']
+    else:
+        session_data = {
+            'filename': session_filename,
+            'group_name': group_name,
+            'session_date': parsed_date.isoformat() if parsed_date else None,
+            'organization_id': organization_id,
+            'raw_transcript': None
+        }
+        
+        result = supabase.schema('peer_progress').table('transcript_sessions').insert(session_data).execute()
+        if not result.data:
+            print(f"  ✗ Failed to create session: {group_name}")
+            print(f"     Error response: {result}")
+            return None
+        session_id = result.data[0]['id']
+        print(f"  ✓ Created session: {group_name} (ID: {session_id})")
+    _session_ids[key] = session_id
+    return session_id
+
+def _save_group_to_supabase(supabase: Client, group_data: Dict, organization_id: str, filename: str, session_date: str, prompt_hash: str = PROMPT_VERSION) -> int:
+    """Save parsed group data to Supabase and return count of goals saved.
+    Existing goals for the session are fetched once and matched in memory, then new goals go out in one
+    bulk insert and matched ones in one bulk update."""
     group_name = group_data['name']
     session_date_str = group_data.get('session_date', session_date)
     
@@ -302,39 +345,12 @@ def _save_group_to_supabase(supabase: Client, group_data: Dict, organization_id:
     
     # Create or find transcript session
     session_filename = f"{group_name} - {session_date_str or 'Unknown'}"
+    session_id = _ensure_goal_session(supabase, organization_id, session_filename, group_name, parsed_date)
+    if not session_id:
+        return 0
     
-    existing_session = supabase.schema('peer_progress').table('transcript_sessions').select('*').eq(
-        'filename', session_filename
-    ).eq('organization_id', organization_id).execute()
-    
-    if existing_session.data:
-        session_id = existing_session.data[0]['id']
-    else:
-        session_data = {
-            'filename': session_filename,
-            'group_name': group_name,
-            'session_date': parsed_date.isoformat() if parsed_date else None,
-            'organization_id': organization_id,
-            'raw_transcript': None
-        }
-        
-        result = supabase.schema('peer_progress').table('transcript_sessions').insert(session_data).execute()
-        if result.data:
-            session_id = result.data[0]['id']
-            print(f"  ✓ Created session: {group_name} (ID: {session_id})")
-        else:
-            print(f"  ✗ Failed to create session: {group_name}")
-            print(f"     Error response: {result}")
-            return 0
-    
-    # Save each participant's goal
-    def _normalize(text: Optional[str]) -> str:
-        if not text:
-            return ''
-        # collapse whitespace and lowercase for duplicate detection
-        import re as _re
-        return _re.sub(r"\s+", " ", text.strip()).lower()
-    saved_count = 0
+    # Build every participant's goal row, keyed by content hash (drops repeats within the group)
+    goal_rows: Dict[str, Dict] = {}
     for participant in group_data['participants']:
         commitment_text = participant.get('commitment')
         classification = participant.get('classification')
@@ -363,6 +379,7 @@ def _save_group_to_supabase(supabase: Client, group_data: Dict, organization_id:
             'how_to_quantify': participant.get('how_to_quantify'),
             'nudge_message': participant.get('nudge_message'),
             'source': 'direct_extraction',
+            'prompt_hash': prompt_hash,
             'full_participant_data': {
                 'discussion': participant.get('discussion'),
                 'commitment': participant.get('commitment'),
@@ -375,7 +392,8 @@ def _save_group_to_supabase(supabase: Client, group_data: Dict, organization_id:
             }
         }
         
-        goal_data = {
+        content_hash = _goal_content_hash(session_id, participant['name'], goal_text_to_save)
+        goal_rows[content_hash] = {
             'transcript_session_id': session_id,
             'organization_id': organization_id,
             'participant_name': participant['name'],
@@ -386,47 +404,59 @@ def _save_group_to_supabase(supabase: Client, group_data: Dict, organization_id:
             'source_type': 'ai_extraction',
             'source_details': source_details,
             'member_id': None,
+            'content_hash': content_hash,
         }
-        
-        # Check if a duplicate goal already exists (normalized comparison)
-        existing = supabase.schema('peer_progress').table('quantifiable_goals').select('id, goal_text').eq(
-            'transcript_session_id', session_id
-        ).eq('participant_name', participant['name']).execute()
-
-        is_dup = False
-        norm_new = _normalize(goal_text_to_save)
-        if existing.data:
-            for row in existing.data:
-                if _normalize(row.get('goal_text')) == norm_new:
-                    is_dup = True
-                    goal_id = row['id']
-                    # Update existing instead of inserting duplicate
-                    update_result = supabase.schema('peer_progress').table('quantifiable_goals').update(goal_data).eq('id', goal_id).execute()
-                    if update_result.data:
-                        print(f"    ✓ Updated existing goal for {participant['name']}")
-                    break
-
-        if not is_dup:
-            result = supabase.schema('peer_progress').table('quantifiable_goals').insert(goal_data).execute()
-            if result.data:
-                saved_count += 1
-                print(f"    ✓ Inserted goal for {participant['name']}: {goal_text_to_save[:50]}...")
-            else:
-                print(f"    ✗ Failed to insert goal for {participant['name']}")
-                print(f"       Response: {result}")
+    if not goal_rows:
+        return 0
+    
+    # One fetch of the session's existing goals; match on normalized text so rows saved before
+    # content_hash existed are updated rather than duplicated
+    existing = supabase.schema('peer_progress').table('quantifiable_goals').select(
+        'id, participant_name, goal_text, content_hash'
+    ).eq('transcript_session_id', session_id).execute()
+    existing_rows = existing.data or []
+    existing_ids = {row['content_hash']: row['id'] for row in existing_rows if row.get('content_hash')}
+    for row in existing_rows:
+        if not row.get('content_hash'):
+            existing_ids.setdefault(_goal_content_hash(session_id, row.get('participant_name'), row.get('goal_text')), row['id'])
+    
+    updates = [dict(row, id=existing_ids[h]) for h, row in goal_rows.items() if h in existing_ids]
+    inserts = [row for h, row in goal_rows.items() if h not in existing_ids]
+    
+    if updates:
+        update_result = supabase.schema('peer_progress').table('quantifiable_goals').upsert(updates, on_conflict='id').execute()
+        if update_result.data:
+            print(f"    ✓ Updated {len(update_result.data)} existing goals")
+    
+    saved_count = 0
+    if inserts:
+        # The unique content_hash makes a retried or concurrent insert a no-op
+        result = supabase.schema('peer_progress').table('quantifiable_goals').upsert(
+            inserts, on_conflict='content_hash', ignore_duplicates=True
+        ).execute()
+        saved_count = len(result.data or [])
+        for row in result.data or []:
+            print(f"    ✓ Inserted goal for {row['participant_name']}: {row['goal_text'][:50]}...")
+        if saved_count < len(inserts):
+            print(f"    ⚠️  {len(inserts) - saved_count} goals already existed")
     
     return saved_count
 
-def _get_files_recursively(processor, folder_url, days_back=None):
-    """Get all transcript files recursively from a folder and its subfolders"""
+def _get_files_recursively(processor, folder_url, days_back=None, modified_after=None, folder_ids=None):
+    """Get all transcript files recursively from a folder and its subfolders.
+    modified_after (RFC 3339 timestamp) narrows the Drive query further than days_back.
+    Pass folder_ids (see _list_folder_tree) to search a known set of folders without re-crawling."""
     from datetime import datetime, timedelta
     
-    folder_id = processor._extract_folder_id(folder_url)
-    if not folder_id:
-        return []
+    if folder_ids is None:
+        folder_id = processor._extract_folder_id(folder_url)
+        if not folder_id:
+            return []
+        folders_to_search = [folder_id]
+    else:
+        folders_to_search = list(folder_ids)
     
     all_files = []
-    folders_to_search = [folder_id]
     searched_folders = set()
     
     file_types = [
@@ -440,6 +470,8 @@ def _get_files_recursively(processor, folder_url, days_back=None):
     if days_back is not None:
         cutoff_date = datetime.now() - timedelta(days=days_back)
         date_filter = f" and modifiedTime > '{cutoff_date.isoformat()}Z'"
+    if modified_after:
+        date_filter += f" and modifiedTime > '{modified_after}'"
     
     while folders_to_search:
         current_folder = folders_to_search.pop(0)
@@ -462,6 +494,8 @@ def _get_files_recursively(processor, folder_url, days_back=None):
                 print(f"  ⚠️  Error searching folder {current_folder}: {e}")
         
         # Find all subfolders
+        if folder_ids is not None:
+            continue
         try:
             query = f"'{current_folder}' in parents and mimeType='application/vnd.google-apps.folder'"
             results = processor.drive_service.files().list(
@@ -478,22 +512,31 @@ def _get_files_recursively(processor, folder_url, days_back=None):
     
     return all_files
 
-def extract_goals_for_all_transcripts(folder_url=None, folder_key=None, days_back=None, multiple_folders=None, recursive=True):
-    """
-    Extract quantifiable goals from all transcripts and save to file.
-    
-    Args:
-        folder_url: Direct folder URL to use
-        folder_key: Key from FOLDER_URLS dict (e.g., 'october_2025')
-        days_back: Number of days to look back for transcripts (None = no date filter)
-        multiple_folders: List of folder URLs or folder_keys to process (combines results)
-        recursive: If True, search subfolders recursively (default: True)
-    """
-    
-    # Use existing processor for Google Drive access
-    processor = TranscriptProcessor(organization_id='f58a2d22-4e96-4d4a-9348-b82c8e3f1f2e')
-    
-    # Determine which folders to process
+def _list_folder_tree(processor, folder_url):
+    """IDs of a folder and all of its subfolders, for callers that search the same tree repeatedly"""
+    folder_id = processor._extract_folder_id(folder_url)
+    if not folder_id:
+        return []
+    tree = [folder_id]
+    i = 0
+    while i < len(tree):
+        try:
+            query = f"'{tree[i]}' in parents and mimeType='application/vnd.google-apps.folder'"
+            results = processor.drive_service.files().list(
+                q=query,
+                fields="files(id, name)"
+            ).execute()
+            for subfolder in results.get('files', []):
+                if subfolder['id'] not in tree:
+                    tree.append(subfolder['id'])
+                    print(f"  📂 Found subfolder: {subfolder['name']}")
+        except Exception as e:
+            print(f"  ⚠️  Error finding subfolders: {e}")
+        i += 1
+    return tree
+
+def _resolve_folders(folder_url=None, folder_key=None, multiple_folders=None):
+    """Turn folder keys/URLs into the list of folder URLs to crawl"""
     folders_to_process = []
     
     if multiple_folders:
@@ -512,8 +555,10 @@ def extract_goals_for_all_transcripts(folder_url=None, folder_key=None, days_bac
     else:
         # Default to October 2025 folder
         folders_to_process = [FOLDER_URLS['october_2025']]
-    
-    # Get transcripts from all folders
+    return folders_to_process
+
+def _collect_transcript_files(processor, folders_to_process, days_back=None, recursive=True, since=None):
+    """Crawl folders, drop Main Room transcripts and de-duplicate by file ID"""
     print(f"Getting transcripts from {len(folders_to_process)} folder(s)...")
     all_files = []
     
@@ -538,7 +583,91 @@ def extract_goals_for_all_transcripts(folder_url=None, folder_key=None, days_bac
             seen_ids.add(file['id'])
             unique_files.append(file)
     
-    files = unique_files
+    return filter_since(unique_files, since)
+
+def call_llm(content: str) -> Dict[str, str]:
+    """Raw LLM responses for one transcript, keyed by archive task."""
+    # Gemini preferred, fallback to ChatGPT
+    return {'goals': ai_generate_content(PROMPT.format(transcript=content))}
+
+def parse(raw: Dict[str, str]) -> list:
+    """Participants parsed from the goals response (empty if none were found)."""
+    group_data = _parse_gemini_response(raw['goals'], '', None)
+    return group_data['participants'] if group_data else []
+
+def save_rows(processor, supabase: Client, file: Dict, organization_id: str, session: Dict, participants: list) -> int:
+    """Save goals plus attendance and goal events for the participants. Returns goals saved."""
+    filename = file['name']
+    session_date = session.get('session_date')
+    if not participants:
+        print(f"  ⚠️  No participants found in response")
+        return 0
+    group_data = {'name': filename, 'session_date': session_date, 'participants': participants}
+    
+    # Save to Supabase
+    saved_count = _save_group_to_supabase(supabase, group_data, organization_id, filename, session_date)
+    # Also populate attendance and goal_events for members present
+    group_code = filename
+    group_id = _ensure_group(supabase, group_code)
+    member_ids = _ensure_members(supabase, [p['name'] for p in group_data['participants']], group_code)
+    for p in group_data['participants']:
+        member_id = member_ids.get(p['name'])
+        if member_id and group_id:
+            if session_date and session_date != 'Unknown':
+                _record_attendance(supabase, member_id, group_id, session_date)
+            goal_txt = p.get('commitment') or p.get('discussion') or ''
+            if goal_txt:
+                _record_goal_event(supabase, member_id, group_id, goal_txt, (p.get('classification') == 'quantifiable'), session_date or datetime.utcnow().date().isoformat())
+    print(f"  ✓ Saved {saved_count} goals to Supabase")
+    if saved_count == 0:
+        print(f"     ⚠️  Warning: No goals were saved (might be duplicates or errors)")
+    return saved_count
+
+def process_file(processor, supabase: Client, file: Dict, organization_id: str, content: str) -> int:
+    """Extract and save goals for one downloaded transcript. Returns goals saved."""
+    filename = file['name']
+    
+    # Extract group info from filename to get date
+    group_info = processor.extract_group_info_from_filename(filename)
+    
+    # Use Google Drive modification date as session date
+    modified_time = file.get('modifiedTime', '')
+    if modified_time:
+        try:
+            dt = datetime.fromisoformat(modified_time.replace('Z', '+00:00'))
+            session_date = dt.strftime('%Y-%m-%d')
+        except:
+            session_date = group_info.get('session_date', 'Unknown')
+    else:
+        session_date = group_info.get('session_date', 'Unknown')
+    
+    # Extract goals with LLM, then parse participants out of the response
+    raw = call_llm(content)
+    archive_responses(raw, ARCHIVE_VERSIONS, file['id'], {
+        'filename': filename, 'session_date': session_date, 'organization_id': organization_id,
+    })
+    return save_rows(processor, supabase, file, organization_id, {'session_date': session_date}, parse(raw))
+
+def extract_goals_for_all_transcripts(folder_url=None, folder_key=None, days_back=None, multiple_folders=None, recursive=True, force=False, since=None):
+    """
+    Extract quantifiable goals from all transcripts and save to file.
+    
+    Args:
+        folder_url: Direct folder URL to use
+        folder_key: Key from FOLDER_URLS dict (e.g., 'october_2025')
+        days_back: Number of days to look back for transcripts (None = no date filter)
+        multiple_folders: List of folder URLs or folder_keys to process (combines results)
+        recursive: If True, search subfolders recursively (default: True)
+        force: If True, ignore the processing ledger and re-run every file
+        since: Only process files modified on/after this date (YYYY-MM-DD)
+    """
+    
+    # Use existing processor for Google Drive access
+    processor = TranscriptProcessor(organization_id='f58a2d22-4e96-4d4a-9348-b82c8e3f1f2e')
+    
+    # Determine which folders to process, then get transcripts from all of them
+    folders_to_process = _resolve_folders(folder_url, folder_key, multiple_folders)
+    files = _collect_transcript_files(processor, folders_to_process, days_back, recursive, since)
     print(f"\n📊 Total unique transcripts: {len(files)}\n")
     
     # Initialize Supabase client
@@ -560,71 +689,26 @@ def extract_goals_for_all_transcripts(folder_url=None, folder_key=None, days_bac
     
     organization_id = 'f58a2d22-4e96-4d4a-9348-b82c8e3f1f2e'
     total_goals_saved = 0
+    ledger = ProcessingLedger(supabase, organization_id).load([EXTRACTOR])
     
     for file in files:
         filename = file['name']
         print(f"Processing: {filename}")
         
         try:
-            # Read transcript
-            content = processor.download_and_read_file(
-                file['id'], 
-                filename, 
-                file['mimeType']
+            saved_count = run_with_ledger(
+                ledger, processor, file, EXTRACTOR, PROMPT_VERSION,
+                lambda content: process_file(processor, supabase, file, organization_id, content),
+                force=force
             )
-            
-            if not content.strip():
-                continue
-            
-            # Extract group info from filename to get date
-            group_info = processor.extract_group_info_from_filename(filename)
-            
-            # Use Google Drive modification date as session date
-            modified_time = file.get('modifiedTime', '')
-            if modified_time:
-                try:
-                    from datetime import datetime
-                    dt = datetime.fromisoformat(modified_time.replace('Z', '+00:00'))
-                    session_date = dt.strftime('%Y-%m-%d')
-                except:
-                    session_date = group_info.get('session_date', 'Unknown')
-            else:
-                session_date = group_info.get('session_date', 'Unknown')
-            
-            # Extract goals with LLM (Gemini preferred, fallback to ChatGPT)
-            gemini_output = ai_generate_content(PROMPT.format(transcript=content))
-            
-            # Parse the LLM output to extract group and participants
-            group_data = _parse_gemini_response(gemini_output, filename, session_date)
-            
-            if group_data and group_data.get('participants'):
-                # Save to Supabase
-                saved_count = _save_group_to_supabase(supabase, group_data, organization_id, filename, session_date)
-                # Also populate attendance and goal_events for members present
-                group_code = filename
-                group_id = _ensure_group(supabase, group_code)
-                for p in group_data['participants']:
-                    member_id = _ensure_member(supabase, p['name'], group_code)
-                    if member_id and group_id:
-                        if session_date and session_date != 'Unknown':
-                            _record_attendance(supabase, member_id, group_id, session_date)
-                        goal_txt = p.get('commitment') or p.get('discussion') or ''
-                        if goal_txt:
-                            _record_goal_event(supabase, member_id, group_id, goal_txt, (p.get('classification') == 'quantifiable'), session_date or datetime.utcnow().date().isoformat())
-                total_goals_saved += saved_count
-                print(f"  ✓ Saved {saved_count} goals to Supabase")
-                if saved_count == 0:
-                    print(f"     ⚠️  Warning: No goals were saved (might be duplicates or errors)")
-            else:
-                print(f"  ⚠️  No participants found in response")
-                if group_data:
-                    print(f"     Participants in group_data: {len(group_data.get('participants', []))}")
+            total_goals_saved += saved_count or 0
             
         except Exception as e:
             print(f"  ✗ Error: {e}")
             import traceback
             traceback.print_exc()
     
+    flush_all()
     print(f"\n✅ Complete! Saved {total_goals_saved} goals to Supabase")
 
 if __name__ == "__main__":
@@ -0,0 +1,178 @@
+"""
+In-memory identity map for peer_progress.groups and peer_progress.members.
+
+All groups and members are loaded once (and again after max_age_seconds), names
+are resolved from hash maps, and missing rows are created in one bulk upsert
+per call. Creation is serialized by a lock inside the process and by the unique
+indexes from add_identity_unique_constraints.sql across processes, so
+concurrent workers never create duplicate members.
+
+Usage:
+    ids = identity_map_for(sb)
+    group_id = ids.group_id('Group 1.2')
+    member_ids = ids.ensure_members(['Ana Diaz', 'Ben Cho'], 'Group 1.2')
+"""
+
+import threading
+import time
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from supabase import Client
+
+
+PAGE_SIZE = 1000
+
+
+class IdentityMap:
+    def __init__(self, sb: Client, max_age_seconds: Optional[float] = 900):
+        self.sb = sb
+        self.max_age_seconds = max_age_seconds
+        self._groups: Dict[str, str] = {}                      # group_code -> id
+        self._members: Dict[Tuple[str, str], Dict] = {}        # (full_name, group_code) -> row
+        self._members_by_name: Dict[str, Dict] = {}            # full_name -> first row seen
+        self._unknown_names: set = set()                       # names looked up and not found since load
+        self._loaded_at: Optional[float] = None
+        self._lock = threading.RLock()
+
+    def _table(self, name: str):
+        return self.sb.schema('peer_progress').table(name)
+
+    def _fetch_all(self, table: str, columns: str) -> List[Dict]:
+        rows: List[Dict] = []
+        offset = 0
+        while True:
+            page = self._table(table).select(columns).order('id').range(offset, offset + PAGE_SIZE - 1).execute().data or []
+            rows.extend(page)
+            if len(page) < PAGE_SIZE:
+                return rows
+            offset += PAGE_SIZE
+
+    def load(self) -> 'IdentityMap':
+        """(Re)load every group and member."""
+        groups = self._fetch_all('groups', 'id, group_code')
+        members = self._fetch_all('members', '*')
+        with self._lock:
+            self._groups = {g['group_code']: g['id'] for g in groups if g.get('group_code')}
+            self._members = {}
+            self._members_by_name = {}
+            self._unknown_names = set()
+            for m in members:
+                self._remember_member(m)
+            self._loaded_at = time.monotonic()
+        return self
+
+    def _ensure_loaded(self) -> None:
+        stale = self._loaded_at is None or (
+            self.max_age_seconds is not None and time.monotonic() - self._loaded_at > self.max_age_seconds)
+        if stale:
+            with self._lock:
+                if self._loaded_at is None or (
+                        self.max_age_seconds is not None and time.monotonic() - self._loaded_at > self.max_age_seconds):
+                    self.load()
+
+    def _remember_member(self, row: Dict) -> None:
+        self._members[(row.get('full_name'), row.get('group_code'))] = row
+        self._members_by_name.setdefault(row.get('full_name'), row)
+        self._unknown_names.discard(row.get('full_name'))
+
+    # ---- groups ----
+
+    def ensure_groups(self, group_codes: Iterable[str]) -> Dict[str, str]:
+        """Return group_code -> id, creating missing groups in one bulk upsert."""
+        self._ensure_loaded()
+        codes = list(dict.fromkeys(c for c in group_codes if c))
+        missing = [c for c in codes if c not in self._groups]
+        if missing:
+            with self._lock:
+                missing = [c for c in missing if c not in self._groups]
+                if missing:
+                    res = self._table('groups').upsert([{'group_code': c} for c in missing], on_conflict='group_code',
+                                                       ignore_duplicates=True).execute()
+                    for g in res.data or []:
+                        self._groups[g['group_code']] = g['id']
+                    # Rows another process created first are not returned by DO NOTHING
+                    leftover = [c for c in missing if c not in self._groups]
+                    if leftover:
+                        res = self._table('groups').select('id, group_code').in_('group_code', leftover).execute()
+                        for g in res.data or []:
+                            self._groups[g['group_code']] = g['id']
+        return {c: self._groups[c] for c in codes if c in self._groups}
+
+    def group_id(self, group_code: str) -> Optional[str]:
+        return self.ensure_groups([group_code]).get(group_code)
+
+    # ---- members ----
+
+    def ensure_members(self, full_names: Iterable[str], group_code: str) -> Dict[str, str]:
+        """Return full_name -> member id for one group, creating missing members in one bulk upsert."""
+        self._ensure_loaded()
+        names = list(dict.fromkeys(n for n in full_names if n))
+        missing = [n for n in names if (n, group_code) not in self._members]
+        if missing:
+            with self._lock:
+                missing = [n for n in missing if (n, group_code) not in self._members]
+                if missing:
+                    res = self._table('members').upsert(
+                        [{'full_name': n, 'status': 'active', 'group_code': group_code} for n in missing],
+                        on_conflict='full_name,group_code', ignore_duplicates=True).execute()
+                    for m in res.data or []:
+                        self._remember_member(m)
+                    leftover = [n for n in missing if (n, group_code) not in self._members]
+                    if leftover:
+                        res = self._table('members').select('*').eq('group_code', group_code).in_('full_name', leftover).execute()
+                        for m in res.data or []:
+                            self._remember_member(m)
+        return {n: self._members[(n, group_code)]['id'] for n in names if (n, group_code) in self._members}
+
+    def member_id(self, full_name: str, group_code: str) -> Optional[str]:
+        return self.ensure_members([full_name], group_code).get(full_name)
+
+    def member_by_name(self, full_name: str) -> Optional[Dict]:
+        """Existing member row with this name in any group (no row is created).
+        Names missing from the map are checked once against the table in case another process added them."""
+        self._ensure_loaded()
+        row = self._members_by_name.get(full_name)
+        if row is not None or not full_name or full_name in self._unknown_names:
+            return row
+        res = self._table('members').select('*').eq('full_name', full_name).limit(1).execute()
+        with self._lock:
+            if res.data:
+                self._remember_member(res.data[0])
+                return res.data[0]
+            self._unknown_names.add(full_name)
+        return None
+
+    def members_by_name(self, full_names: Iterable[str]) -> Dict[str, Dict]:
+        self._ensure_loaded()
+        return {n: self._members_by_name[n] for n in full_names if n in self._members_by_name}
+
+    def resolve_names(self, full_names: Iterable[str]) -> Dict[str, Optional[Dict]]:
+        """member_by_name for many names: names missing from the map are checked with one in_ query.
+        Returns every requested name, mapped to None when no member has it."""
+        self._ensure_loaded()
+        names = list(dict.fromkeys(n for n in full_names if n))
+        unknown = [n for n in names if n not in self._members_by_name and n not in self._unknown_names]
+        if unknown:
+            res = self._table('members').select('*').in_('full_name', unknown).execute()
+            with self._lock:
+                for m in res.data or []:
+                    self._remember_member(m)
+                self._unknown_names.update(n for n in unknown if n not in self._members_by_name)
+        return {n: self._members_by_name.get(n) for n in names}
+
+
+_maps: Dict[int, Tuple[Client, IdentityMap]] = {}
+_maps_lock = threading.Lock()
+
+
+def identity_map_for(sb: Client) -> IdentityMap:
+    """Shared identity map per Supabase client, so every caller in a run reuses one load.
+    Wrappers such as db_metrics.CountingClient share the map of the client they wrap."""
+    client = getattr(sb, 'client', sb)
+    with _maps_lock:
+        entry = _maps.get(id(client))
+        if entry is None or entry[0] is not client:
+            # A stale entry (its client is gone and the id was reused) is replaced, not kept
+            entry = (client, IdentityMap(client))
+            _maps[id(client)] = entry
+        return entry[1]
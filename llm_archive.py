@@ -0,0 +1,114 @@
+"""
+Compressed archive of raw LLM responses.
+
+Every response produced by the extractors is written as a gzip'd JSON record
+keyed by transcript (Drive file id), task and prompt version. reparse.py replays
+these records through the current parsers so parser fixes don't need a new
+LLM run.
+
+Layout: <LLM_ARCHIVE_DIR>/<task>/<transcript_key>/<prompt_version>.json.gz
+"""
+
+import os
+import re
+import gzip
+import json
+import hashlib
+from datetime import datetime, timezone
+from typing import Dict, Iterator, List, Optional
+
+
+ARCHIVE_DIR = os.getenv('LLM_ARCHIVE_DIR') or os.path.join(os.path.dirname(os.path.abspath(__file__)), 'llm_archive')
+
+
+# Prompt file (path relative to the repo) -> hash of the template as loaded.
+# Filled by the extractors' _load_prompt helpers at import time.
+PROMPT_HASHES: Dict[str, str] = {}
+
+
+def prompt_version(prompt_template: str) -> str:
+    """Short, stable hash identifying a prompt template."""
+    return hashlib.sha256(prompt_template.encode('utf-8')).hexdigest()[:12]
+
+
+def register_prompt(rel_path: str, prompt_template: str) -> str:
+    """Record the hash of a loaded prompt file and return the template unchanged."""
+    PROMPT_HASHES[rel_path] = prompt_version(prompt_template)
+    return prompt_template
+
+
+def _safe(part: str) -> str:
+    return re.sub(r'[^A-Za-z0-9_.-]+', '_', part or 'unknown')
+
+
+def _record_path(task: str, transcript_key: str, version: str, archive_dir: Optional[str] = None) -> str:
+    return os.path.join(archive_dir or ARCHIVE_DIR, _safe(task), _safe(transcript_key), f'{_safe(version)}.json.gz')
+
+
+def archive_response(task: str, transcript_key: str, version: str, response_text: str,
+                     metadata: Optional[Dict] = None, archive_dir: Optional[str] = None) -> Optional[str]:
+    """Store one raw response. Never raises: archiving must not break extraction."""
+    try:
+        path = _record_path(task, transcript_key, version, archive_dir)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        record = {
+            'task': task,
+            'transcript_key': transcript_key,
+            'prompt_version': version,
+            'archived_at': datetime.now(timezone.utc).isoformat(),
+            'metadata': metadata or {},
+            'response': response_text,
+        }
+        tmp = path + '.tmp'
+        with gzip.open(tmp, 'wt', encoding='utf-8') as f:
+            json.dump(record, f)
+        os.replace(tmp, path)
+        return path
+    except Exception as e:
+        print(f'  ⚠️ Could not archive {task} response for {transcript_key}: {e}')
+        return None
+
+
+def archive_responses(raw: Dict[str, str], versions: Dict[str, str], transcript_key: str,
+                      metadata: Optional[Dict] = None) -> None:
+    """Archive every response of an extractor's call_llm() result under its own task."""
+    for task, text in raw.items():
+        archive_response(task, transcript_key, versions[task], text, metadata)
+
+
+def load_response(task: str, transcript_key: str, version: str, archive_dir: Optional[str] = None) -> Optional[Dict]:
+    path = _record_path(task, transcript_key, version, archive_dir)
+    if not os.path.exists(path):
+        return None
+    with gzip.open(path, 'rt', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def iter_archived(tasks: Optional[List[str]] = None, latest_only: bool = True,
+                  archive_dir: Optional[str] = None) -> Iterator[Dict]:
+    """Yield archived records, optionally only the newest prompt version per (task, transcript)."""
+    root = archive_dir or ARCHIVE_DIR
+    if not os.path.isdir(root):
+        return
+    for task in sorted(os.listdir(root)):
+        if tasks and task not in tasks:
+            continue
+        task_dir = os.path.join(root, task)
+        if not os.path.isdir(task_dir):
+            continue
+        for key in sorted(os.listdir(task_dir)):
+            key_dir = os.path.join(task_dir, key)
+            records = []
+            for fname in os.listdir(key_dir):
+                if not fname.endswith('.json.gz'):
+                    continue
+                try:
+                    with gzip.open(os.path.join(key_dir, fname), 'rt', encoding='utf-8') as f:
+                        records.append(json.load(f))
+                except Exception as e:
+                    print(f'  ⚠️ Skipping unreadable archive record {key_dir}/{fname}: {e}')
+            records.sort(key=lambda r: r.get('archived_at') or '')
+            if latest_only and records:
+                records = records[-1:]
+            for r in records:
+                yield r
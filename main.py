@@ -1,7 +1,9 @@
 import os
 import re
 import json
+import threading
 import requests
+from collections import Counter
 from datetime import datetime, timedelta
 from typing import List, Dict, Any, Optional
 from concurrent.futures import ThreadPoolExecutor, as_completed
@@ -15,11 +17,22 @@ import io
 import PyPDF2
 from docx import Document
 import prompts
+from stage_scheduler import Stage, run_stages, format_timings
+from identity_map import identity_map_for
+from analysis_writer import upsert_analysis
+from write_buffer import write_buffer_for
+from transcript_store import transcript_store_for
+from follow_up_dispatcher import FollowUpDispatcher
 
 load_dotenv()
 
+UUID_PATTERN = re.compile(r'^[0-9a-fA-F]{8}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{12}$')
+
+# Session columns callers use; never the transcript body
+SESSION_COLUMNS = 'id, filename, group_name, session_date, organization_id, transcript_hash'
+
 class TranscriptProcessor:
-    def __init__(self, organization_id: str):
+    def __init__(self, organization_id: str, service_account_info: Dict = None):
         self.supabase: Client = create_client(
             os.getenv('SUPABASE_URL'),
             os.getenv('SUPABASE_SERVICE_KEY')
@@ -30,8 +43,12 @@ class TranscriptProcessor:
         genai.configure(api_key=os.getenv('GOOGLE_AI_API_KEY'))
         self.model = genai.GenerativeModel('gemini-2.5-pro')
         
-        # Initialize Google Drive service
-        self.drive_service = self._initialize_google_drive()
+        # Initialize Google Drive service. Credentials may be passed per organization;
+        # otherwise they come from GOOGLE_SERVICE_ACCOUNT_JSON / _FILE.
+        self._service_account_info = service_account_info
+        self._drive_local = threading.local()
+        self._drive_override = None
+        self._drive_local.service = self._initialize_google_drive()
         
         # Your existing prompts
         self.EXTRACT_COMMITMENTS = prompts.EXTRACT_COMMITMENTS
@@ -48,9 +65,25 @@ class TranscriptProcessor:
         # Community posting configuration
         self.community_config = self._load_community_config()
     
+    @property
+    def drive_service(self):
+        """Drive client for the calling thread (googleapiclient/httplib2 are not thread-safe)."""
+        if self._drive_override is not None:
+            return self._drive_override
+        service = getattr(self._drive_local, 'service', None)
+        if service is None:
+            service = self._initialize_google_drive()
+            self._drive_local.service = service
+        return service
+    
+    @drive_service.setter
+    def drive_service(self, service):
+        # Explicitly assigned services (e.g. test doubles) are shared by all threads
+        self._drive_override = service
+    
     def _initialize_google_drive(self):
         try:
-            service_account_info = json.loads(os.getenv('GOOGLE_SERVICE_ACCOUNT_JSON', '{}'))
+            service_account_info = self._service_account_info or json.loads(os.getenv('GOOGLE_SERVICE_ACCOUNT_JSON', '{}'))
             
             if not service_account_info:
                 service_account_file = os.getenv('GOOGLE_SERVICE_ACCOUNT_FILE')
@@ -319,8 +352,12 @@ class TranscriptProcessor:
             print(f"Error extracting group info from {filename}: {e}")
             return {'group_name': 'Unknown Group', 'session_date': '2024-10-15'}
     
-    def process_recent_transcripts(self, folder_url: str = None, days_back: int = 7) -> Dict:
-        """Process recent transcripts from the last N days"""
+    def process_recent_transcripts(self, folder_url: str = None, days_back: int = 7, max_workers: int = 1) -> Dict:
+        """Process recent transcripts from the last N days.
+
+        max_workers > 1 processes that many transcripts concurrently; each file is
+        isolated so one failure does not stall the rest of the batch.
+        """
         try:
             transcripts = self.get_recent_transcripts(folder_url, days_back)
             results = {
@@ -329,74 +366,30 @@ class TranscriptProcessor:
                 'details': []
             }
             
-            for transcript_file in transcripts:
-                print(f"Processing: {transcript_file['name']}")
-                
-                try:
-                    # Read file content
-                    content = self.download_and_read_file(
-                        transcript_file['id'],
-                        transcript_file['name'],
-                        transcript_file['mimeType']
-                    )
-                    
-                    if not content.strip():
-                        print(f"Skipping empty file: {transcript_file['name']}")
-                        continue
-                    
-                    # Extract group info from filename
-                    group_info = self.extract_group_info_from_filename(transcript_file['name'])
-                    
-                    # Use Google Drive modification date as session date
-                    modified_time = transcript_file.get('modifiedTime', '')
-                    if modified_time:
+            def _collect(detail: Optional[Dict]):
+                if not detail:
+                    return
+                if detail['status'] == 'success':
+                    results['processed'] += 1
+                else:
+                    results['failed'] += 1
+                results['details'].append(detail)
+            
+            if max_workers and max_workers > 1 and len(transcripts) > 1:
+                print(f"🚀 Processing {len(transcripts)} transcripts with {max_workers} workers...")
+                with ThreadPoolExecutor(max_workers=max_workers) as executor:
+                    futures = {executor.submit(self._process_transcript_file, f): f for f in transcripts}
+                    for future in as_completed(futures):
+                        transcript_file = futures[future]
                         try:
-                            # Parse ISO format: 2025-10-22T23:16:31.303Z
-                            from datetime import datetime
-                            dt = datetime.fromisoformat(modified_time.replace('Z', '+00:00'))
-                            session_date = dt.strftime('%Y-%m-%d')
-                            print(f"📅 Using Google Drive modification date: {session_date}")
+                            _collect(future.result())
                         except Exception as e:
-                            print(f"⚠️ Could not parse modification date {modified_time}: {e}")
-                            session_date = group_info['session_date']
-                    else:
-                        session_date = group_info['session_date']
-                    
-                    # Process transcript
-                    success = self.process_transcript(
-                        transcript_text=content,
-                        filename=transcript_file['name'],
-                        group_name=group_info['group_name'],
-                        session_date=session_date
-                    )
-                    
-                    if success:
-                        results['processed'] += 1
-                        results['details'].append({
-                            'filename': transcript_file['name'],
-                            'status': 'success',
-                            'group': group_info['group_name'],
-                            'date': group_info['session_date']
-                        })
-                    else:
-                        results['failed'] += 1
-                        results['details'].append({
-                            'filename': transcript_file['name'],
-                            'status': 'failed',
-                            'group': group_info['group_name'],
-                            'date': group_info['session_date']
-                        })
-                    
-                    print(f"Completed: {transcript_file['name']} - {'Success' if success else 'Failed'}")
-                    
-                except Exception as e:
-                    print(f"Error processing {transcript_file['name']}: {e}")
-                    results['failed'] += 1
-                    results['details'].append({
-                        'filename': transcript_file['name'],
-                        'status': 'error',
-                        'error': str(e)
-                    })
+                            # _process_transcript_file already isolates errors; this is a last resort
+                            print(f"Error processing {transcript_file['name']}: {e}")
+                            _collect({'filename': transcript_file['name'], 'status': 'error', 'error': str(e)})
+            else:
+                for transcript_file in transcripts:
+                    _collect(self._process_transcript_file(transcript_file))
             
             return results
             
@@ -404,14 +397,72 @@ class TranscriptProcessor:
             print(f"Error processing October transcripts: {e}")
             return {'processed': 0, 'failed': 0, 'details': [], 'error': str(e)}
 
+    def _process_transcript_file(self, transcript_file: Dict) -> Optional[Dict]:
+        """Download, process and report on a single transcript file. Returns None for skipped files."""
+        print(f"Processing: {transcript_file['name']}")
+        
+        try:
+            # Read file content
+            content = self.download_and_read_file(
+                transcript_file['id'],
+                transcript_file['name'],
+                transcript_file['mimeType']
+            )
+            
+            if not content.strip():
+                print(f"Skipping empty file: {transcript_file['name']}")
+                return None
+            
+            # Extract group info from filename
+            group_info = self.extract_group_info_from_filename(transcript_file['name'])
+            
+            # Use Google Drive modification date as session date
+            modified_time = transcript_file.get('modifiedTime', '')
+            if modified_time:
+                try:
+                    # Parse ISO format: 2025-10-22T23:16:31.303Z
+                    dt = datetime.fromisoformat(modified_time.replace('Z', '+00:00'))
+                    session_date = dt.strftime('%Y-%m-%d')
+                    print(f"📅 Using Google Drive modification date: {session_date}")
+                except Exception as e:
+                    print(f"⚠️ Could not parse modification date {modified_time}: {e}")
+                    session_date = group_info['session_date']
+            else:
+                session_date = group_info['session_date']
+            
+            # Process transcript
+            success = self.process_transcript(
+                transcript_text=content,
+                filename=transcript_file['name'],
+                group_name=group_info['group_name'],
+                session_date=session_date
+            )
+            
+            print(f"Completed: {transcript_file['name']} - {'Success' if success else 'Failed'}")
+            return {
+                'filename': transcript_file['name'],
+                'status': 'success' if success else 'failed',
+                'group': group_info['group_name'],
+                'date': group_info['session_date']
+            }
+            
+        except Exception as e:
+            print(f"Error processing {transcript_file['name']}: {e}")
+            return {
+                'filename': transcript_file['name'],
+                'status': 'error',
+                'error': str(e)
+            }
+
     # The following methods are the same as in the previous implementation
     # but included for completeness
     
     def create_transcript_session(self, filename: str, group_name: str, session_date: str = None, raw_transcript: str = None) -> Dict:
-        """Create a new transcript session record"""
-        existing_session = self.supabase.schema('peer_progress').table('transcript_sessions').select('*').eq(
-            'filename', filename
-        ).eq('group_name', group_name).execute()
+        """Create a new transcript session record.
+        The transcript body goes to the compressed transcript store; the row keeps only its hash."""
+        existing_session = self.supabase.schema('peer_progress').table('transcript_sessions').select(
+            SESSION_COLUMNS
+        ).eq('filename', filename).eq('group_name', group_name).limit(1).execute()
         
         if existing_session.data:
             return existing_session.data[0]
@@ -420,7 +471,8 @@ class TranscriptProcessor:
             'filename': filename,
             'group_name': group_name,
             'session_date': session_date or datetime.now().date().isoformat(),
-            'raw_transcript': raw_transcript,
+            'raw_transcript': None,
+            'transcript_hash': transcript_store_for(self.supabase).put(raw_transcript) if raw_transcript else None,
             'analysis_date': datetime.now().isoformat(),
             'organization_id': self.organization_id
         }
@@ -429,63 +481,83 @@ class TranscriptProcessor:
         return result.data[0] if result.data else None
     
     def get_member_by_name(self, name: str) -> Dict:
-        """Find member by name"""
-        result = self.supabase.schema('peer_progress').table('members').select('*').eq('full_name', name).execute()
-        return result.data[0] if result.data else None
+        """Find member by name (served from the shared identity map)"""
+        return identity_map_for(self.supabase).member_by_name(name)
+    
+    def resolve_members(self, names: List[str]) -> Dict[str, Optional[Dict]]:
+        """Resolve many participant names at once (one query for names not already known)"""
+        return identity_map_for(self.supabase).resolve_names(names)
     
     def process_transcript(self, transcript_text: str, filename: str, group_name: str, session_date: str = None) -> bool:
-        """Main method to process a transcript and store results"""
+        """Main method to process a transcript and store results.
+
+        The steps are declared as a dependency graph (see _build_transcript_stages)
+        and run by stage_scheduler, so independent LLM calls and writes overlap.
+        """
+        # 0. Early exit for Main Room transcripts - skip ALL processing
+        if group_name and ('Main Room' in group_name or group_name.startswith('Main Room')):
+            print(f"⚠️ Skipping Main Room transcript: {group_name} - no processing needed")
+            return False
+        
+        context = {
+            'transcript_text': transcript_text,
+            'filename': filename,
+            'group_name': group_name,
+            'session_date': session_date,
+        }
+        stages = self._build_transcript_stages()
         try:
-            # 0. Early exit for Main Room transcripts - skip ALL processing
-            if group_name and ('Main Room' in group_name or group_name.startswith('Main Room')):
-                print(f"⚠️ Skipping Main Room transcript: {group_name} - no processing needed")
-                return False
+            timings = run_stages(stages, context)
+            print(format_timings(stages, timings))
+            return True
             
-            # Initialize member cache for this session
-            member_cache = {}
+        except Exception as e:
+            session = context.get('session')
+            if session:
+                upsert_analysis(self.supabase, session['id'], self.organization_id, {'error_message': str(e)},
+                                processing_status='failed')
             
-            # 1. Create transcript session
+            print(f"Error processing transcript: {e}")
+            return False
+    
+    def _build_transcript_stages(self) -> List[Stage]:
+        """Declare process_transcript's steps with their inputs and outputs."""
+        
+        # 1. Create transcript session
+        def create_session(filename, group_name, session_date, transcript_text):
             session = self.create_transcript_session(filename, group_name, session_date, transcript_text)
             if not session:
                 raise Exception("Failed to create transcript session")
-            
-            # 2. Extract commitments using AI
-            commitments = self.extract_commitments_from_transcript(transcript_text, group_name, session_date)
-            
-            # 3. Extract quantifiable goals using AI
-            quantifiable_goals = self.extract_quantifiable_goals_from_transcript(transcript_text, group_name, session_date)
-            
-            # 4. Classify commitments
-            classified_commitments = self.classify_commitments(commitments)
-            
-            # 5. Generate nudge messages
-            final_commitments = self.generate_nudge_messages(classified_commitments)
-            
-            # 6. Store analysis results (simplified for existing schema)
-            analysis_data = {
-                'transcript_session_id': session['id'],
-                'organization_id': self.organization_id,
-                'processing_status': 'completed'
-            }
-            
+            return session
+        
+        # 6. Store analysis results (simplified for existing schema)
+        def store_analysis(session):
             try:
-                analysis_result = self.supabase.schema('peer_progress').table('transcript_analysis').insert(analysis_data).execute()
+                upsert_analysis(self.supabase, session['id'], self.organization_id, {})
             except Exception as e:
-                print(f"Warning: Could not insert analysis data: {e}")
-                # Continue processing even if analysis table insert fails
-            
-            # 7. Store individual commitments
+                print(f"Warning: Could not write analysis data: {e}")
+                # Continue processing even if analysis table write fails
+            return True
+        
+        # 6b. Resolve every participant once; later stages read this name -> member map
+        def resolve_participants(final_commitments):
+            return self.resolve_members([c['participant_name'] for c in final_commitments])
+        
+        # 7. Store individual commitments
+        def store_commitments(session, final_commitments, member_cache):
             for commitment in final_commitments:
                 try:
-                    self.store_individual_commitment(commitment, session['id'])
+                    self.store_individual_commitment(commitment, session['id'], member_cache)
                 except Exception as e:
                     print(f"Warning: Could not store commitment: {e}")
                     # Continue processing other commitments
-            
-            # 8. Store quantifiable goals with batch operations
+            return True
+        
+        # 8. Store quantifiable goals with batch operations
+        def store_goals(session, quantifiable_goals, member_cache):
             if quantifiable_goals:
                 try:
-                    self.store_quantifiable_goals_batch(quantifiable_goals, session['id'], member_cache)
+                    self.store_quantifiable_goals_batch(quantifiable_goals, session['id'], member_cache if member_cache is not None else {})
                 except Exception as e:
                     print(f"Warning: Could not store quantifiable goals: {e}")
                     # Fallback to individual storage if batch fails
@@ -494,101 +566,87 @@ class TranscriptProcessor:
                             self.store_quantifiable_goals(goal_data, session['id'])
                         except Exception as e2:
                             print(f"Warning: Could not store quantifiable goal: {e2}")
-            
-            # 9. Vague goals are now automatically detected by database trigger when commitments are stored
+            # 9. Vague goals are automatically detected by database trigger when commitments are stored
             total_quantifiable = sum(len(g.get('quantifiable_goals', [])) for g in quantifiable_goals)
-            print(f"✅ Successfully processed {filename} with {len(final_commitments)} participants and {total_quantifiable} quantifiable goals")
-            print(f"📝 Vague goals will be automatically detected and scheduled for follow-up by database trigger")
-            
-            # 10. Track attendance from transcript participants
+            print(f"✅ Stored {total_quantifiable} quantifiable goals")
+            return True
+        
+        # 10. Track attendance from transcript participants
+        def track_attendance(session, group_name, session_date, final_commitments, member_cache):
             participants = [c['participant_name'] for c in final_commitments]
-            self.track_attendance_from_transcript(session['id'], group_name, session_date, participants)
-            
-            # 11. Post goals to community platform
+            self.track_attendance_from_transcript(session['id'], group_name, session_date, participants, member_cache)
+            return participants
+        
+        # 11. Post goals to community platform (reads the goals stored for this session)
+        def post_to_community(session, group_name, session_date, _commitments_stored, _goals_stored):
             self.post_goals_to_community(session['id'], group_name, session_date)
-            
-            # 12. Assess risk for all participants
+            return True
+        
+        # 12. Assess risk for all participants
+        def assess_risk(participants, _commitments_stored, member_cache):
+            member_ids = []
             for participant in participants:
-                member = self.get_member_by_name(participant)
+                member = self._member_from(participant, member_cache)
                 if member:
-                    self.assess_member_risk(member['id'])
+                    member_ids.append(member['id'])
                 else:
                     print(f"Warning: Could not find member {participant} for risk assessment")
-            
-            # 13-15. Extract additional data in parallel for better performance
-            # These extractions are independent and can run concurrently
-            marketing_activities = []
-            pipeline_outcomes = []
-            challenges_strategies = {'challenges': [], 'strategies': []}
-            stuck_signals = {'stuck_signals': []}
-            help_offers = []
-            
-            print("🚀 Running parallel AI extractions...")
-            start_time = datetime.now()
-            
-            with ThreadPoolExecutor(max_workers=5) as executor:
-                # Submit all independent extraction tasks
-                futures = {
-                    executor.submit(self.extract_marketing_activities, transcript_text, session['id'], group_name, session_date): 'marketing',
-                    executor.submit(self.extract_pipeline_outcomes, transcript_text, session['id'], group_name, session_date): 'pipeline',
-                    executor.submit(self.extract_challenges_and_strategies, transcript_text, session['id'], group_name, session_date): 'challenges',
-                    executor.submit(self.extract_stuck_signals, transcript_text, session['id'], group_name, session_date): 'stuck',
-                    executor.submit(self.extract_help_offers, transcript_text, session['id'], group_name, session_date): 'help'
-                }
-                
-                # Collect results as they complete
-                for future in as_completed(futures):
-                    task_name = futures[future]
-                    try:
-                        result = future.result()
-                        if task_name == 'marketing':
-                            marketing_activities = result
-                        elif task_name == 'pipeline':
-                            pipeline_outcomes = result
-                        elif task_name == 'challenges':
-                            challenges_strategies = result
-                        elif task_name == 'stuck':
-                            stuck_signals = result
-                        elif task_name == 'help':
-                            help_offers = result if isinstance(result, list) else []
-                        print(f"✅ Completed {task_name} extraction")
-                    except Exception as e:
-                        print(f"⚠️ Error in {task_name} extraction: {e}")
-            
-            elapsed = (datetime.now() - start_time).total_seconds()
-            print(f"⚡ Parallel extractions completed in {elapsed:.1f}s")
-            
-            # 16. Analyze sentiment and group health
-            try:
-                sentiment_analysis = self.analyze_sentiment(transcript_text, session['id'], group_name, session_date)
-            except Exception as e:
-                print(f"Error analyzing sentiment: {e}")
-                sentiment_analysis = None
-            
-            # 17. Log attendance changes for participants
-            for participant in participants:
-                self.log_member_change(
-                    member_id=participant,
-                    change_type='attendance_update',
-                    change_category='attendance',
-                    new_value={'group': group_name, 'session_date': session_date, 'status': 'present'},
-                    change_description=f"Attended {group_name} call on {session_date}",
-                    change_source='automatic'
-                )
+            if member_ids:
+                self.assess_org_risk(member_ids=member_ids)
             return True
-            
-        except Exception as e:
-            if 'session' in locals():
-                error_data = {
-                    'transcript_session_id': session['id'],
-                    'organization_id': self.organization_id,
-                    'processing_status': 'failed',
-                    'error_message': str(e)
-                }
-                self.supabase.schema('peer_progress').table('transcript_analysis').insert(error_data).execute()
-            
-            print(f"Error processing transcript: {e}")
-            return False
+        
+        # 13-15. Additional extractions, independent of each other
+        def extraction(method, label):
+            def _run(transcript_text, session, group_name, session_date):
+                result = method(transcript_text, session['id'], group_name, session_date)
+                print(f"✅ Completed {label} extraction")
+                return result
+            return _run
+        
+        def extract_help(transcript_text, session, group_name, session_date):
+            result = self.extract_help_offers(transcript_text, session['id'], group_name, session_date)
+            print("✅ Completed help extraction")
+            return result if isinstance(result, list) else []
+        
+        # 17. Log attendance changes for participants
+        def log_attendance_changes(participants, group_name, session_date, member_cache):
+            self.log_member_changes([{
+                'member_id': participant,
+                'change_type': 'attendance_update',
+                'change_category': 'attendance',
+                'new_value': {'group': group_name, 'session_date': session_date, 'status': 'present'},
+                'change_description': f"Attended {group_name} call on {session_date}",
+                'change_source': 'automatic'
+            } for participant in participants], member_cache)
+            return True
+        
+        llm_args = ['transcript_text', 'session', 'group_name', 'session_date']
+        return [
+            Stage('session', create_session, ['filename', 'group_name', 'session_date', 'transcript_text'], ['session']),
+            # 2. Extract commitments using AI
+            Stage('commitments', self.extract_commitments_from_transcript, ['transcript_text', 'group_name', 'session_date'], ['commitments']),
+            # 3. Extract quantifiable goals using AI
+            Stage('quantifiable_goals', self.extract_quantifiable_goals_from_transcript, ['transcript_text', 'group_name', 'session_date'], ['quantifiable_goals']),
+            # 4. Classify commitments
+            Stage('classify', self.classify_commitments, ['commitments'], ['classified_commitments']),
+            # 5. Generate nudge messages
+            Stage('nudges', self.generate_nudge_messages, ['classified_commitments'], ['final_commitments']),
+            Stage('analysis_record', store_analysis, ['session'], ['analysis_stored']),
+            Stage('members', resolve_participants, ['final_commitments'], ['member_cache'], required=False),
+            Stage('store_commitments', store_commitments, ['session', 'final_commitments', 'member_cache'], ['commitments_stored']),
+            Stage('store_goals', store_goals, ['session', 'quantifiable_goals', 'member_cache'], ['goals_stored']),
+            Stage('attendance', track_attendance, ['session', 'group_name', 'session_date', 'final_commitments', 'member_cache'], ['participants']),
+            Stage('community_post', post_to_community, ['session', 'group_name', 'session_date', 'commitments_stored', 'goals_stored'], ['community_posted']),
+            Stage('risk', assess_risk, ['participants', 'commitments_stored', 'member_cache'], ['risk_assessed'], required=False),
+            Stage('marketing', extraction(self.extract_marketing_activities, 'marketing'), llm_args, ['marketing_activities'], required=False),
+            Stage('pipeline', extraction(self.extract_pipeline_outcomes, 'pipeline'), llm_args, ['pipeline_outcomes'], required=False),
+            Stage('challenges', extraction(self.extract_challenges_and_strategies, 'challenges'), llm_args, ['challenges_strategies'], required=False),
+            Stage('stuck', extraction(self.extract_stuck_signals, 'stuck'), llm_args, ['stuck_signals'], required=False),
+            Stage('help', extract_help, llm_args, ['help_offers'], required=False),
+            # 16. Analyze sentiment and group health
+            Stage('sentiment', extraction(self.analyze_sentiment, 'sentiment'), llm_args, ['sentiment_analysis'], required=False),
+            Stage('change_log', log_attendance_changes, ['participants', 'group_name', 'session_date', 'member_cache'], ['changes_logged'], required=False),
+        ]
     
     def extract_commitments_from_transcript(self, transcript_text: str, group_name: str, call_date: str = None) -> List[Dict]:
         """Extract commitments using AI"""
@@ -996,10 +1054,10 @@ class TranscriptProcessor:
         
         return commitments
     
-    def store_individual_commitment(self, commitment: Dict, transcript_session_id: str):
+    def store_individual_commitment(self, commitment: Dict, transcript_session_id: str, members: Optional[Dict] = None):
         """Store an individual commitment in the database"""
         try:
-            member = self.get_member_by_name(commitment['participant_name'])
+            member = self._member_from(commitment['participant_name'], members)
             member_id = member['id'] if member else None
             
             target_number = commitment.get('target_number')
@@ -1053,6 +1111,12 @@ class TranscriptProcessor:
             member_cache[name] = self.get_member_by_name(name)
         return member_cache[name]
     
+    def _member_from(self, name: str, members: Optional[Dict]) -> Optional[Dict]:
+        """Member from a pre-resolved name -> member map, falling back to a lookup"""
+        if members is None:
+            return self.get_member_by_name(name)
+        return self.get_member_cached(name, members)
+    
     def store_quantifiable_goals_batch(self, all_goal_data: List[Dict], transcript_session_id: str, member_cache: Dict):
         """Store quantifiable and non-quantifiable goals in batches for better performance"""
         try:
@@ -1427,31 +1491,14 @@ class TranscriptProcessor:
             return False
 
     def send_pending_follow_ups(self):
-        """Send scheduled follow-up messages (simple version - just logs for now)"""
+        """Send due follow-up messages via the claim-and-batch dispatcher (see follow_up_dispatcher.py)"""
         try:
-            # Get follow-ups that are due to be sent
-            now = datetime.now()
-            result = self.supabase.schema('peer_progress').table('participant_follow_ups').select('*').eq('follow_up_status', 'scheduled').lte('scheduled_date', now.isoformat()).execute()
-            
-            if not result.data:
+            counts = FollowUpDispatcher(self.supabase).run()
+            if not any(counts.values()):
                 print("No pending follow-ups to send")
                 return
-            
-            for follow_up in result.data:
-                # For now, just log the message (ready for email/SMS integration)
-                print(f"\n📧 FOLLOW-UP MESSAGE FOR {follow_up['participant_name']}:")
-                print(f"📅 Scheduled: {follow_up['scheduled_date']}")
-                print(f"💬 Message: {follow_up['nudge_message']}")
-                print("-" * 50)
-                
-                # Update status to 'sent' (simulate sending)
-                self.supabase.schema('peer_progress').table('participant_follow_ups').update({
-                    'follow_up_status': 'sent',
-                    'sent_date': now.isoformat()
-                }).eq('id', follow_up['id']).execute()
-            
-            print(f"✅ Processed {len(result.data)} follow-up messages")
-            
+            print(f"✅ Processed {counts['sent'] + counts['retry'] + counts['failed']} follow-up messages "
+                  f"({counts['sent']} sent, {counts['retry']} to retry, {counts['failed']} failed)")
         except Exception as e:
             print(f"Error sending follow-ups: {e}")
     
@@ -1688,18 +1735,18 @@ class TranscriptProcessor:
                 'group_name': post['group_name']
             }
             
-            self.supabase.schema('peer_progress').table('community_posts').insert(log_data).execute()
+            write_buffer_for(self.supabase, 'community_posts').add(log_data)
         except Exception as e:
             print(f"Error logging community post: {e}")
     
-    def track_attendance_from_transcript(self, transcript_session_id: str, group_name: str, session_date: str, participants: List[str]):
+    def track_attendance_from_transcript(self, transcript_session_id: str, group_name: str, session_date: str, participants: List[str], members: Optional[Dict] = None):
         """Track attendance from transcript participants"""
         try:
             attendance_records = []
             
             for participant in participants:
                 # Check if member exists in database
-                member = self.get_member_by_name(participant)
+                member = self._member_from(participant, members)
                 member_id = member['id'] if member else None
                 
                 attendance_record = {
@@ -1725,11 +1772,13 @@ class TranscriptProcessor:
             print(f"Error tracking attendance: {e}")
             return []
     
-    def assess_member_risk(self, member_id: str, organization_id: str = None) -> Dict:
-        """Assess member risk level based on attendance and goals"""
+    def assess_member_risk(self, member_id: str, organization_id: str = None, member: Dict = None) -> Dict:
+        """Assess member risk level based on attendance and goals.
+        Pass the already-resolved member row to skip looking member_id up again."""
         try:
             org_filter = organization_id or self.organization_id
-            member = self.get_member_by_name(member_id) if not member_id.startswith('uuid:') else None
+            if member is None:
+                member = self.get_member_by_name(member_id) if not member_id.startswith('uuid:') else None
             actual_member_id = member['id'] if member else member_id
             
             # Get recent attendance data (last 2 weeks)
@@ -1746,22 +1795,7 @@ class TranscriptProcessor:
             risk_assessment = self._calculate_risk_factors(attendance_result.data, goals_result.data, commitments_result.data)
             
             # Store risk assessment
-            assessment_data = {
-                'member_id': actual_member_id,
-                'organization_id': org_filter,
-                'risk_level': risk_assessment['risk_level'],
-                'risk_triggers': risk_assessment['triggers'],
-                'consecutive_missed_calls': risk_assessment['consecutive_missed_calls'],
-                'weeks_without_goals': risk_assessment['weeks_without_goals'],
-                'weeks_without_goal_completion': risk_assessment['weeks_without_goal_completion'],
-                'weeks_without_meetings': risk_assessment['weeks_without_meetings'],
-                'meetings_scheduled': risk_assessment['meetings_scheduled'],
-                'proposals_out': risk_assessment['proposals_out'],
-                'clients_closed': risk_assessment['clients_closed'],
-                'last_communication_date': risk_assessment['last_communication_date'],
-                'last_goal_update_date': risk_assessment['last_goal_update_date'],
-                'last_meeting_date': risk_assessment['last_meeting_date']
-            }
+            assessment_data = self._risk_assessment_row(actual_member_id, org_filter, risk_assessment)
             
             # Update or insert risk assessment
             existing_result = self.supabase.schema('peer_progress').table('member_risk_assessment').select('id').eq('member_id', actual_member_id).eq('assessment_date', datetime.now().date()).execute()
@@ -1780,6 +1814,94 @@ class TranscriptProcessor:
             print(f"Error assessing member risk: {e}")
             return {'risk_level': 'on_track', 'triggers': []}
     
+    def _risk_assessment_row(self, member_id: str, organization_id: str, risk_assessment: Dict) -> Dict:
+        """member_risk_assessment columns for one computed assessment"""
+        return {
+            'member_id': member_id,
+            'organization_id': organization_id,
+            'risk_level': risk_assessment['risk_level'],
+            'risk_triggers': risk_assessment['triggers'],
+            'consecutive_missed_calls': risk_assessment['consecutive_missed_calls'],
+            'weeks_without_goals': risk_assessment['weeks_without_goals'],
+            'weeks_without_goal_completion': risk_assessment['weeks_without_goal_completion'],
+            'weeks_without_meetings': risk_assessment['weeks_without_meetings'],
+            'meetings_scheduled': risk_assessment['meetings_scheduled'],
+            'proposals_out': risk_assessment['proposals_out'],
+            'clients_closed': risk_assessment['clients_closed'],
+            'last_communication_date': risk_assessment['last_communication_date'],
+            'last_goal_update_date': risk_assessment['last_goal_update_date'],
+            'last_meeting_date': risk_assessment['last_meeting_date']
+        }
+    
+    def _fetch_recent_rows(self, table: str, date_column: str, since: str, organization_id: str,
+                           member_ids: Optional[List[str]] = None, page_size: int = 1000) -> List[Dict]:
+        """All rows of a table since a date, for the org or for the given members, paged with range()"""
+        if member_ids is not None and not member_ids:
+            return []
+        # Keep the in_ list short enough for the request URL
+        id_chunks = [member_ids[i:i + 200] for i in range(0, len(member_ids), 200)] if member_ids is not None else [None]
+        rows: List[Dict] = []
+        for ids in id_chunks:
+            offset = 0
+            while True:
+                query = self.supabase.schema('peer_progress').table(table).select('*').gte(date_column, since)
+                query = query.in_('member_id', ids) if ids is not None else query.eq('organization_id', organization_id)
+                page = query.order(date_column).order('id').range(offset, offset + page_size - 1).execute().data or []
+                rows.extend(page)
+                if len(page) < page_size:
+                    break
+                offset += page_size
+        return rows
+    
+    def assess_org_risk(self, organization_id: str = None, member_ids: List[str] = None) -> Dict[str, Dict]:
+        """Assess risk for many members at once (by default, every member with recent activity in the org).
+        Attendance, goal summaries and commitments are loaded in three range queries, risk is computed in
+        memory, and assessments and follow-up actions are written with bulk upserts
+        (see add_risk_batch_constraints.sql). Members with no rows in any of the three are skipped
+        rather than scored as high risk. Returns member_id -> risk assessment."""
+        try:
+            org_filter = organization_id or self.organization_id
+            # Everyone reads the org's rows; named members read just their own
+            scoped_ids = list(dict.fromkeys(member_ids)) if member_ids is not None else None
+            
+            two_weeks_ago = (datetime.now() - timedelta(days=14)).date().isoformat()
+            by_member: Dict[str, tuple] = {}
+            sources = [('member_attendance', 'call_date'), ('member_goals_summary', 'week_start_date'), ('commitments', 'created_at')]
+            for index, (table, date_column) in enumerate(sources):
+                for row in self._fetch_recent_rows(table, date_column, two_weeks_ago, org_filter, scoped_ids):
+                    member_id = row.get('member_id')
+                    if member_id:
+                        by_member.setdefault(member_id, ([], [], []))[index].append(row)
+            skipped = len(scoped_ids) - len(by_member) if scoped_ids is not None else 0
+            
+            today = datetime.now().date().isoformat()
+            assessments: Dict[str, Dict] = {}
+            assessment_rows, action_rows = [], []
+            for member_id, (attendance_data, goals_data, commitments_data) in by_member.items():
+                risk_assessment = self._calculate_risk_factors(attendance_data, goals_data, commitments_data)
+                assessments[member_id] = risk_assessment
+                assessment_rows.append(dict(self._risk_assessment_row(member_id, org_filter, risk_assessment), assessment_date=today))
+                action_rows.extend(self._follow_up_actions(member_id, risk_assessment, org_filter))
+            
+            # One row per member per day: re-scoring the same day overwrites it
+            for i in range(0, len(assessment_rows), 500):
+                self.supabase.schema('peer_progress').table('member_risk_assessment').upsert(
+                    assessment_rows[i:i + 500], on_conflict='member_id,assessment_date').execute()
+            # An action already raised for the same trigger and due date is left as it is
+            for i in range(0, len(action_rows), 500):
+                self.supabase.schema('peer_progress').table('success_champion_actions').upsert(
+                    action_rows[i:i + 500], on_conflict='member_id,action_type,trigger_reason,due_date',
+                    ignore_duplicates=True).execute()
+            
+            print(f"📊 Assessed risk for {len(assessments)} members ({len(action_rows)} follow-up actions)")
+            if skipped:
+                print(f"   Skipped {skipped} members with no recent attendance, goals or commitments")
+            return assessments
+            
+        except Exception as e:
+            print(f"Error assessing org risk: {e}")
+            return {}
+    
     def _calculate_risk_factors(self, attendance_data: List[Dict], goals_data: List[Dict], commitments_data: List[Dict]) -> Dict:
         """Calculate risk factors based on attendance and goals data"""
         triggers = []
@@ -1844,70 +1966,78 @@ class TranscriptProcessor:
             'last_meeting_date': None  # Would need additional data source
         }
     
+    def _follow_up_actions(self, member_id: str, risk_assessment: Dict, organization_id: str = None) -> List[Dict]:
+        """Success champion actions called for by a risk assessment"""
+        org_id = organization_id or self.organization_id
+        actions = []
+        risk_level = risk_assessment['risk_level']
+        triggers = risk_assessment['triggers']
+        
+        # Create actions based on risk level and triggers
+        if risk_level == 'high_risk':
+            for trigger in triggers:
+                if 'missed_2_consecutive_calls' in trigger:
+                    actions.append({
+                        'member_id': member_id,
+                        'organization_id': org_id,
+                        'action_type': 'attendance_followup',
+                        'trigger_reason': trigger,
+                        'priority': 'urgent',
+                        'due_date': (datetime.now() + timedelta(days=1)).date().isoformat()
+                    })
+                elif 'no_goals_for_2_weeks' in trigger:
+                    actions.append({
+                        'member_id': member_id,
+                        'organization_id': org_id,
+                        'action_type': 'goal_followup',
+                        'trigger_reason': trigger,
+                        'priority': 'high',
+                        'due_date': (datetime.now() + timedelta(days=2)).date().isoformat()
+                    })
+        
+        elif risk_level == 'medium_risk':
+            for trigger in triggers:
+                if 'missed_1_call' in trigger:
+                    actions.append({
+                        'member_id': member_id,
+                        'organization_id': org_id,
+                        'action_type': 'attendance_followup',
+                        'trigger_reason': trigger,
+                        'priority': 'medium',
+                        'due_date': (datetime.now() + timedelta(days=3)).date().isoformat()
+                    })
+                elif 'no_goal_updates' in trigger:
+                    actions.append({
+                        'member_id': member_id,
+                        'organization_id': org_id,
+                        'action_type': 'goal_followup',
+                        'trigger_reason': trigger,
+                        'priority': 'medium',
+                        'due_date': (datetime.now() + timedelta(days=3)).date().isoformat()
+                    })
+        
+        # Special case for coaching intervention
+        if '4_plus_meetings_no_proposals' in triggers:
+            actions.append({
+                'member_id': member_id,
+                'organization_id': org_id,
+                'action_type': 'coaching',
+                'trigger_reason': '4_plus_meetings_no_proposals',
+                'priority': 'medium',
+                'due_date': (datetime.now() + timedelta(days=5)).date().isoformat()
+            })
+        
+        return actions
+    
     def _create_follow_up_actions(self, member_id: str, risk_assessment: Dict):
         """Create follow-up actions for success champion based on risk assessment"""
         try:
-            actions = []
-            risk_level = risk_assessment['risk_level']
-            triggers = risk_assessment['triggers']
-            
-            # Create actions based on risk level and triggers
-            if risk_level == 'high_risk':
-                for trigger in triggers:
-                    if 'missed_2_consecutive_calls' in trigger:
-                        actions.append({
-                            'member_id': member_id,
-                            'organization_id': self.organization_id,
-                            'action_type': 'attendance_followup',
-                            'trigger_reason': trigger,
-                            'priority': 'urgent',
-                            'due_date': (datetime.now() + timedelta(days=1)).date().isoformat()
-                        })
-                    elif 'no_goals_for_2_weeks' in trigger:
-                        actions.append({
-                            'member_id': member_id,
-                            'organization_id': self.organization_id,
-                            'action_type': 'goal_followup',
-                            'trigger_reason': trigger,
-                            'priority': 'high',
-                            'due_date': (datetime.now() + timedelta(days=2)).date().isoformat()
-                        })
-            
-            elif risk_level == 'medium_risk':
-                for trigger in triggers:
-                    if 'missed_1_call' in trigger:
-                        actions.append({
-                            'member_id': member_id,
-                            'organization_id': self.organization_id,
-                            'action_type': 'attendance_followup',
-                            'trigger_reason': trigger,
-                            'priority': 'medium',
-                            'due_date': (datetime.now() + timedelta(days=3)).date().isoformat()
-                        })
-                    elif 'no_goal_updates' in trigger:
-                        actions.append({
-                            'member_id': member_id,
-                            'organization_id': self.organization_id,
-                            'action_type': 'goal_followup',
-                            'trigger_reason': trigger,
-                            'priority': 'medium',
-                            'due_date': (datetime.now() + timedelta(days=3)).date().isoformat()
-                        })
+            actions = self._follow_up_actions(member_id, risk_assessment)
             
-            # Special case for coaching intervention
-            if '4_plus_meetings_no_proposals' in triggers:
-                actions.append({
-                    'member_id': member_id,
-                    'organization_id': self.organization_id,
-                    'action_type': 'coaching',
-                    'trigger_reason': '4_plus_meetings_no_proposals',
-                    'priority': 'medium',
-                    'due_date': (datetime.now() + timedelta(days=5)).date().isoformat()
-                })
-            
-            # Insert actions if any
+            # Insert actions if any (one already raised for the same trigger and due date is kept)
             if actions:
-                self.supabase.schema('peer_progress').table('success_champion_actions').insert(actions).execute()
+                self.supabase.schema('peer_progress').table('success_champion_actions').upsert(
+                    actions, on_conflict='member_id,action_type,trigger_reason,due_date', ignore_duplicates=True).execute()
                 print(f"📋 Created {len(actions)} follow-up actions for member {member_id}")
             
         except Exception as e:
@@ -1987,73 +2117,129 @@ class TranscriptProcessor:
             print(f"Error getting success champion actions: {e}")
             return []
     
-    def log_member_change(self, member_id: str, change_type: str, change_category: str, old_value: Dict = None, new_value: Dict = None, change_description: str = None, change_reason: str = None, changed_by: str = "System", change_source: str = "automatic", effective_date: str = None, notes: str = None):
-        """Log a member change event"""
-        try:
-            member = self.get_member_by_name(member_id) if not member_id.startswith('uuid:') else None
-            actual_member_id = member['id'] if member else member_id
-            
-            change_data = {
-                'member_id': actual_member_id,
-                'organization_id': self.organization_id,
-                'change_type': change_type,
-                'change_category': change_category,
-                'old_value': old_value,
-                'new_value': new_value,
-                'change_description': change_description or f"{change_type} change",
-                'change_reason': change_reason,
-                'changed_by': changed_by,
-                'change_source': change_source,
-                'effective_date': effective_date or datetime.now().date().isoformat(),
-                'notes': notes
-            }
+    def _resolve_member_ids(self, refs: List[str], members: Optional[Dict] = None) -> Dict[str, Optional[str]]:
+        """Map member references (ids, 'uuid:'-prefixed ids or names) to member ids.
+        Names are served from the members map when given, else resolved together via the identity map."""
+        resolved: Dict[str, Optional[str]] = {}
+        names = []
+        for ref in dict.fromkeys(r for r in refs if r):
+            if ref.startswith('uuid:'):
+                resolved[ref] = ref[len('uuid:'):]
+            elif UUID_PATTERN.match(ref):
+                resolved[ref] = ref
+            elif members is not None and ref in members:
+                resolved[ref] = members[ref]['id'] if members[ref] else None
+            else:
+                names.append(ref)
+        if names:
+            for name, member in self.resolve_members(names).items():
+                resolved[name] = member['id'] if member else None
+        return resolved
+    
+    def log_member_changes(self, events: List[Dict], members: Optional[Dict] = None) -> int:
+        """Log many member change events in one insert.
+        Each event takes log_member_change's keyword arguments; member_id may be an id or a member name.
+        Returns the number of events logged."""
+        if not events:
+            return 0
+        try:
+            member_ids = self._resolve_member_ids([e['member_id'] for e in events], members)
+            today = datetime.now().date().isoformat()
+            rows = []
+            for event in events:
+                actual_member_id = member_ids.get(event['member_id'])
+                if not actual_member_id:
+                    print(f"Warning: Could not find member {event['member_id']} for change log")
+                    continue
+                rows.append({
+                    'member_id': actual_member_id,
+                    'organization_id': self.organization_id,
+                    'change_type': event['change_type'],
+                    'change_category': event['change_category'],
+                    'old_value': event.get('old_value'),
+                    'new_value': event.get('new_value'),
+                    'change_description': event.get('change_description') or f"{event['change_type']} change",
+                    'change_reason': event.get('change_reason'),
+                    'changed_by': event.get('changed_by', "System"),
+                    'change_source': event.get('change_source', "automatic"),
+                    'effective_date': event.get('effective_date') or today,
+                    'notes': event.get('notes')
+                })
             
-            self.supabase.schema('peer_progress').table('member_change_log').insert(change_data).execute()
-            print(f"📝 Logged {change_type} change for member {member_id}")
+            if rows:
+                self.supabase.schema('peer_progress').table('member_change_log').insert(rows).execute()
+                print(f"📝 Logged {len(rows)} member change(s)")
+            return len(rows)
             
         except Exception as e:
-            print(f"Error logging member change: {e}")
+            print(f"Error logging member changes: {e}")
+            return 0
     
-    def change_member_group(self, member_id: str, new_group: str, old_group: str = None, reason: str = None, changed_by: str = "Success Champion"):
-        """Change member's group assignment and log the change"""
-        try:
-            member = self.get_member_by_name(member_id) if not member_id.startswith('uuid:') else None
-            actual_member_id = member['id'] if member else member_id
-            
-            # Log the group change
-            self.log_member_change(
-                member_id=actual_member_id,
-                change_type='group_change',
-                change_category='membership',
-                old_value={'group': old_group} if old_group else None,
-                new_value={'group': new_group},
-                change_description=f"Group changed from '{old_group}' to '{new_group}'" if old_group else f"Assigned to group '{new_group}'",
-                change_reason=reason,
-                changed_by=changed_by,
-                change_source='manual'
-            )
-            
-            # Update status history
-            status_data = {
-                'member_id': actual_member_id,
-                'organization_id': self.organization_id,
-                'status_type': 'group_assignment',
-                'old_status': old_group,
-                'new_status': new_group,
-                'effective_date': datetime.now().date().isoformat(),
-                'changed_by': changed_by,
-                'change_reason': reason
-            }
+    def log_member_change(self, member_id: str, change_type: str, change_category: str, old_value: Dict = None, new_value: Dict = None, change_description: str = None, change_reason: str = None, changed_by: str = "System", change_source: str = "automatic", effective_date: str = None, notes: str = None):
+        """Log a member change event"""
+        self.log_member_changes([{
+            'member_id': member_id,
+            'change_type': change_type,
+            'change_category': change_category,
+            'old_value': old_value,
+            'new_value': new_value,
+            'change_description': change_description,
+            'change_reason': change_reason,
+            'changed_by': changed_by,
+            'change_source': change_source,
+            'effective_date': effective_date,
+            'notes': notes
+        }])
+    
+    def change_member_groups(self, changes: List[Dict], changed_by: str = "Success Champion") -> bool:
+        """Change several members' groups: one change-log insert and one status-history insert.
+        Each change is {'member_id', 'new_group', 'old_group'?, 'reason'?}."""
+        try:
+            member_ids = self._resolve_member_ids([c['member_id'] for c in changes])
+            today = datetime.now().date().isoformat()
+            events, status_rows = [], []
+            for change in changes:
+                actual_member_id = member_ids.get(change['member_id']) or change['member_id']
+                old_group, new_group, reason = change.get('old_group'), change['new_group'], change.get('reason')
+                events.append({
+                    'member_id': actual_member_id,
+                    'change_type': 'group_change',
+                    'change_category': 'membership',
+                    'old_value': {'group': old_group} if old_group else None,
+                    'new_value': {'group': new_group},
+                    'change_description': f"Group changed from '{old_group}' to '{new_group}'" if old_group else f"Assigned to group '{new_group}'",
+                    'change_reason': reason,
+                    'changed_by': changed_by,
+                    'change_source': 'manual'
+                })
+                status_rows.append({
+                    'member_id': actual_member_id,
+                    'organization_id': self.organization_id,
+                    'status_type': 'group_assignment',
+                    'old_status': old_group,
+                    'new_status': new_group,
+                    'effective_date': today,
+                    'changed_by': changed_by,
+                    'change_reason': reason
+                })
             
-            self.supabase.schema('peer_progress').table('member_status_history').insert(status_data).execute()
+            # Log the group changes, then update status history
+            self.log_member_changes(events)
+            if status_rows:
+                self.supabase.schema('peer_progress').table('member_status_history').insert(status_rows).execute()
             
-            print(f"✅ Changed member {member_id} from group '{old_group}' to '{new_group}'")
+            for change in changes:
+                print(f"✅ Changed member {change['member_id']} from group '{change.get('old_group')}' to '{change['new_group']}'")
             return True
             
         except Exception as e:
             print(f"Error changing member group: {e}")
             return False
     
+    def change_member_group(self, member_id: str, new_group: str, old_group: str = None, reason: str = None, changed_by: str = "Success Champion"):
+        """Change member's group assignment and log the change"""
+        return self.change_member_groups([{'member_id': member_id, 'new_group': new_group, 'old_group': old_group, 'reason': reason}], changed_by)
+    
     def process_member_renewal(self, member_id: str, renewal_type: str, renewal_date: str = None, amount: float = None, payment_method: str = None, invoice_number: str = None, notes: str = None, processed_by: str = "Success Champion"):
         """Process a member renewal and log the change"""
         try:
@@ -2130,130 +2316,153 @@ class TranscriptProcessor:
             print(f"Error processing member renewal: {e}")
             return False
     
-    def pause_member(self, member_id: str, pause_type: str, pause_reason: str, pause_start_date: str = None, pause_end_date: str = None, notes: str = None, requested_by: str = "Member", approved_by: str = "Success Champion"):
-        """Pause a member and log the change"""
+    def pause_members(self, pauses: List[Dict], approved_by: str = "Success Champion") -> bool:
+        """Pause several members: one insert each into member_pauses, the change log and status history.
+        Each pause is {'member_id', 'pause_type', 'pause_reason', 'pause_start_date'?, 'pause_end_date'?, 'notes'?, 'requested_by'?}."""
         try:
-            member = self.get_member_by_name(member_id) if not member_id.startswith('uuid:') else None
-            actual_member_id = member['id'] if member else member_id
-            
-            pause_start = datetime.strptime(pause_start_date, '%Y-%m-%d') if pause_start_date else datetime.now()
-            pause_end = datetime.strptime(pause_end_date, '%Y-%m-%d') if pause_end_date else None
-            
-            # Create pause record
-            pause_data = {
-                'member_id': actual_member_id,
-                'organization_id': self.organization_id,
-                'pause_type': pause_type,
-                'pause_start_date': pause_start.date().isoformat(),
-                'pause_end_date': pause_end.date().isoformat() if pause_end else None,
-                'pause_reason': pause_reason,
-                'notes': notes,
-                'requested_by': requested_by,
-                'approved_by': approved_by
-            }
-            
-            self.supabase.schema('peer_progress').table('member_pauses').insert(pause_data).execute()
-            
-            # Log the pause change
-            self.log_member_change(
-                member_id=actual_member_id,
-                change_type='pause',
-                change_category='membership',
-                new_value={
+            member_ids = self._resolve_member_ids([p['member_id'] for p in pauses])
+            pause_rows, events, status_rows = [], [], []
+            for pause in pauses:
+                actual_member_id = member_ids.get(pause['member_id']) or pause['member_id']
+                pause_type, pause_reason, notes = pause['pause_type'], pause['pause_reason'], pause.get('notes')
+                pause_start = datetime.strptime(pause['pause_start_date'], '%Y-%m-%d') if pause.get('pause_start_date') else datetime.now()
+                pause_end = datetime.strptime(pause['pause_end_date'], '%Y-%m-%d') if pause.get('pause_end_date') else None
+                
+                pause_rows.append({
+                    'member_id': actual_member_id,
+                    'organization_id': self.organization_id,
                     'pause_type': pause_type,
                     'pause_start_date': pause_start.date().isoformat(),
                     'pause_end_date': pause_end.date().isoformat() if pause_end else None,
-                    'pause_reason': pause_reason
-                },
-                change_description=f"Member paused - {pause_type}",
-                change_reason=pause_reason,
-                changed_by=approved_by,
-                change_source='manual',
-                notes=notes
-            )
-            
-            # Update status history
-            status_data = {
-                'member_id': actual_member_id,
-                'organization_id': self.organization_id,
-                'status_type': 'membership_status',
-                'old_status': 'active',
-                'new_status': 'paused',
-                'effective_date': pause_start.date().isoformat(),
-                'changed_by': approved_by,
-                'change_reason': pause_reason,
-                'notes': notes
-            }
+                    'pause_reason': pause_reason,
+                    'notes': notes,
+                    'requested_by': pause.get('requested_by', "Member"),
+                    'approved_by': approved_by
+                })
+                events.append({
+                    'member_id': actual_member_id,
+                    'change_type': 'pause',
+                    'change_category': 'membership',
+                    'new_value': {
+                        'pause_type': pause_type,
+                        'pause_start_date': pause_start.date().isoformat(),
+                        'pause_end_date': pause_end.date().isoformat() if pause_end else None,
+                        'pause_reason': pause_reason
+                    },
+                    'change_description': f"Member paused - {pause_type}",
+                    'change_reason': pause_reason,
+                    'changed_by': approved_by,
+                    'change_source': 'manual',
+                    'notes': notes
+                })
+                status_rows.append({
+                    'member_id': actual_member_id,
+                    'organization_id': self.organization_id,
+                    'status_type': 'membership_status',
+                    'old_status': 'active',
+                    'new_status': 'paused',
+                    'effective_date': pause_start.date().isoformat(),
+                    'changed_by': approved_by,
+                    'change_reason': pause_reason,
+                    'notes': notes
+                })
             
-            self.supabase.schema('peer_progress').table('member_status_history').insert(status_data).execute()
+            if pause_rows:
+                self.supabase.schema('peer_progress').table('member_pauses').insert(pause_rows).execute()
+            self.log_member_changes(events)
+            if status_rows:
+                self.supabase.schema('peer_progress').table('member_status_history').insert(status_rows).execute()
             
-            print(f"✅ Paused member {member_id} - {pause_type}")
+            for pause in pauses:
+                print(f"✅ Paused member {pause['member_id']} - {pause['pause_type']}")
             return True
             
         except Exception as e:
             print(f"Error pausing member: {e}")
             return False
     
-    def resume_member(self, member_id: str, pause_id: str = None, resumed_date: str = None, notes: str = None, resumed_by: str = "Success Champion"):
-        """Resume a paused member and log the change"""
-        try:
-            member = self.get_member_by_name(member_id) if not member_id.startswith('uuid:') else None
-            actual_member_id = member['id'] if member else member_id
-            
-            resumed_date_obj = datetime.strptime(resumed_date, '%Y-%m-%d') if resumed_date else datetime.now()
+    def pause_member(self, member_id: str, pause_type: str, pause_reason: str, pause_start_date: str = None, pause_end_date: str = None, notes: str = None, requested_by: str = "Member", approved_by: str = "Success Champion"):
+        """Pause a member and log the change"""
+        return self.pause_members([{
+            'member_id': member_id,
+            'pause_type': pause_type,
+            'pause_reason': pause_reason,
+            'pause_start_date': pause_start_date,
+            'pause_end_date': pause_end_date,
+            'notes': notes,
+            'requested_by': requested_by
+        }], approved_by)
+    
+    def resume_members(self, resumes: List[Dict], resumed_by: str = "Success Champion") -> bool:
+        """Resume several paused members with bulk pause updates, change log and status history.
+        Each resume is {'member_id', 'pause_id'?, 'resumed_date'?, 'notes'?}; without pause_id the member's active pause is closed."""
+        try:
+            member_ids = self._resolve_member_ids([r['member_id'] for r in resumes])
+            resolved = [(r, member_ids.get(r['member_id']) or r['member_id'],
+                         datetime.strptime(r['resumed_date'], '%Y-%m-%d') if r.get('resumed_date') else datetime.now())
+                        for r in resumes]
+            
+            # Find active pauses for members resumed without an explicit pause_id in one query
+            without_pause_id = [member_id for r, member_id, _ in resolved if not r.get('pause_id')]
+            active_pause_ids: Dict[str, List[str]] = {}
+            if without_pause_id:
+                active_pause = self.supabase.schema('peer_progress').table('member_pauses').select('id, member_id').in_('member_id', without_pause_id).eq('pause_status', 'active').execute()
+                for row in active_pause.data or []:
+                    active_pause_ids.setdefault(row['member_id'], []).append(row['id'])
+            
+            # Close pauses: one update per distinct (resumed_date, notes) pair
+            pause_updates: Dict[tuple, List[str]] = {}
+            events, status_rows = [], []
+            for r, actual_member_id, resumed_date_obj in resolved:
+                resumed_on, notes = resumed_date_obj.date().isoformat(), r.get('notes')
+                pause_ids = [r['pause_id']] if r.get('pause_id') else active_pause_ids.get(actual_member_id, [])[:1]
+                if pause_ids:
+                    pause_updates.setdefault((resumed_on, notes), []).extend(pause_ids)
+                events.append({
+                    'member_id': actual_member_id,
+                    'change_type': 'resume',
+                    'change_category': 'membership',
+                    'new_value': {'resumed_date': resumed_on},
+                    'change_description': "Member resumed from pause",
+                    'change_reason': "Pause period ended",
+                    'changed_by': resumed_by,
+                    'change_source': 'manual',
+                    'notes': notes
+                })
+                status_rows.append({
+                    'member_id': actual_member_id,
+                    'organization_id': self.organization_id,
+                    'status_type': 'membership_status',
+                    'old_status': 'paused',
+                    'new_status': 'active',
+                    'effective_date': resumed_on,
+                    'changed_by': resumed_by,
+                    'change_reason': 'Resumed from pause',
+                    'notes': notes
+                })
             
-            # Update pause record
-            if pause_id:
+            for (resumed_on, notes), pause_ids in pause_updates.items():
                 self.supabase.schema('peer_progress').table('member_pauses').update({
                     'pause_status': 'completed',
-                    'resumed_date': resumed_date_obj.date().isoformat(),
+                    'resumed_date': resumed_on,
                     'notes': notes
-                }).eq('id', pause_id).execute()
-            else:
-                # Find active pause
-                active_pause = self.supabase.schema('peer_progress').table('member_pauses').select('id').eq('member_id', actual_member_id).eq('pause_status', 'active').execute()
-                if active_pause.data:
-                    self.supabase.schema('peer_progress').table('member_pauses').update({
-                        'pause_status': 'completed',
-                        'resumed_date': resumed_date_obj.date().isoformat(),
-                        'notes': notes
-                    }).eq('id', active_pause.data[0]['id']).execute()
-            
-            # Log the resume change
-            self.log_member_change(
-                member_id=actual_member_id,
-                change_type='resume',
-                change_category='membership',
-                new_value={'resumed_date': resumed_date_obj.date().isoformat()},
-                change_description="Member resumed from pause",
-                change_reason="Pause period ended",
-                changed_by=resumed_by,
-                change_source='manual',
-                notes=notes
-            )
-            
-            # Update status history
-            status_data = {
-                'member_id': actual_member_id,
-                'organization_id': self.organization_id,
-                'status_type': 'membership_status',
-                'old_status': 'paused',
-                'new_status': 'active',
-                'effective_date': resumed_date_obj.date().isoformat(),
-                'changed_by': resumed_by,
-                'change_reason': 'Resumed from pause',
-                'notes': notes
-            }
-            
-            self.supabase.schema('peer_progress').table('member_status_history').insert(status_data).execute()
+                }).in_('id', pause_ids).execute()
+            self.log_member_changes(events)
+            if status_rows:
+                self.supabase.schema('peer_progress').table('member_status_history').insert(status_rows).execute()
             
-            print(f"✅ Resumed member {member_id}")
+            for r in resumes:
+                print(f"✅ Resumed member {r['member_id']}")
             return True
             
         except Exception as e:
             print(f"Error resuming member: {e}")
             return False
     
+    def resume_member(self, member_id: str, pause_id: str = None, resumed_date: str = None, notes: str = None, resumed_by: str = "Success Champion"):
+        """Resume a paused member and log the change"""
+        return self.resume_members([{'member_id': member_id, 'pause_id': pause_id, 'resumed_date': resumed_date, 'notes': notes}], resumed_by)
+    
     def get_member_change_log(self, member_id: str, change_type: str = None, limit: int = 50) -> List[Dict]:
         """Get change log for a specific member"""
         try:
@@ -2675,18 +2884,16 @@ class TranscriptProcessor:
             if challenges:
                 challenge_records = self.supabase.schema('peer_progress').table('challenges').insert(challenges).execute()
                 print(f"🧠 Extracted {len(challenges)} challenges")
-                
-                # Update challenge category usage counts
-                for challenge in challenges:
-                    self._update_challenge_category_usage(challenge['challenge_category'])
             
             if strategies:
                 self.supabase.schema('peer_progress').table('strategies').insert(strategies).execute()
                 print(f"💡 Extracted {len(strategies)} strategies")
-                
-                # Update strategy type usage counts
-                for strategy in strategies:
-                    self._update_strategy_type_usage(strategy['strategy_type'])
+            
+            # Update category/type usage counts for the whole transcript in one call
+            self._update_usage_counts(
+                Counter(c['challenge_category'] for c in challenges if c.get('challenge_category')),
+                Counter(s['strategy_type'] for s in strategies if s.get('strategy_type'))
+            )
             
             return {
                 'challenges': challenges,
@@ -2827,31 +3034,18 @@ class TranscriptProcessor:
             print(f"Error parsing strategy line: {e}")
             return None
     
-    def _update_challenge_category_usage(self, category_name: str):
-        """Update usage count for challenge category"""
-        try:
-            # Simple increment - could be enhanced with RPC function
-            result = self.supabase.schema('peer_progress').table('challenge_categories').select('usage_count').eq('category_name', category_name).execute()
-            if result.data:
-                current_count = result.data[0].get('usage_count', 0)
-                self.supabase.schema('peer_progress').table('challenge_categories').update({
-                    'usage_count': current_count + 1
-                }).eq('category_name', category_name).execute()
-        except Exception as e:
-            print(f"Error updating challenge category usage: {e}")
-    
-    def _update_strategy_type_usage(self, strategy_type: str):
-        """Update usage count for strategy type"""
+    def _update_usage_counts(self, category_deltas: Dict[str, int], strategy_type_deltas: Dict[str, int]):
+        """Atomically add this organization's usage counts for challenge categories and strategy types (see create_usage_count_increments.sql)"""
+        if not category_deltas and not strategy_type_deltas:
+            return
         try:
-            # Simple increment - could be enhanced with RPC function
-            result = self.supabase.schema('peer_progress').table('strategy_types').select('usage_count').eq('type_name', strategy_type).execute()
-            if result.data:
-                current_count = result.data[0].get('usage_count', 0)
-                self.supabase.schema('peer_progress').table('strategy_types').update({
-                    'usage_count': current_count + 1
-                }).eq('type_name', strategy_type).execute()
+            self.supabase.schema('peer_progress').rpc('increment_usage_counts', {
+                'p_organization_id': self.organization_id,
+                'p_category_deltas': dict(category_deltas),
+                'p_strategy_type_deltas': dict(strategy_type_deltas)
+            }).execute()
         except Exception as e:
-            print(f"Error updating strategy type usage: {e}")
+            print(f"Error updating challenge/strategy usage counts: {e}")
     
     def get_challenge_analysis_dashboard(self, organization_id: str = None, weeks_back: int = 8) -> Dict:
         """Get challenge analysis dashboard data"""
@@ -3397,7 +3591,7 @@ class TranscriptProcessor:
                 'triggered_by': 'stuck_signal_extraction'
             }
             
-            self.supabase.schema('peer_progress').table('group_health_flags').insert(flag_data).execute()
+            write_buffer_for(self.supabase, 'group_health_flags').add(flag_data)
             
         except Exception as e:
             print(f"Error creating stuck signal flag: {e}")
@@ -3418,7 +3612,7 @@ class TranscriptProcessor:
                 'follow_up_notes': ''
             }
             
-            self.supabase.schema('peer_progress').table('support_connections').insert(connection_data).execute()
+            write_buffer_for(self.supabase, 'support_connections').add(connection_data)
             
         except Exception as e:
             print(f"Error creating support connection: {e}")
@@ -3847,13 +4041,28 @@ class TranscriptProcessor:
 
 
 def main():
+    import argparse
+    
+    parser = argparse.ArgumentParser(description='Process recent transcripts end to end')
+    parser.add_argument('--folder_url', type=str, default="https://drive.google.com/drive/folders/1ku7IhbFWsYWDnYf0FJMcqOn2EIOfPnWu", help='Google Drive folder URL')
+    parser.add_argument('--days_back', type=int, default=7, help='Only process files modified within N days')
+    parser.add_argument('--concurrency', type=int, default=1, help='Number of transcripts to process at once')
+    parser.add_argument('--organization_id', type=str, default='f58a2d22-4e96-4d4a-9348-b82c8e3f1f2e', help='Organization to process for')
+    parser.add_argument('--assess_risk', action='store_true', help='Only re-assess risk for every member with recent activity in the organization')
+    args = parser.parse_args()
+    
     # Initialize the processor
-    processor = TranscriptProcessor(organization_id='f58a2d22-4e96-4d4a-9348-b82c8e3f1f2e')
+    processor = TranscriptProcessor(organization_id=args.organization_id)
+    
+    if args.assess_risk:
+        assessments = processor.assess_org_risk(args.organization_id)
+        levels = Counter(a['risk_level'] for a in assessments.values())
+        print(f"Risk levels: {dict(levels)}")
+        return
     
     # Process yesterday's transcripts from the specific folder
     print("🔍 Looking for yesterday's transcripts...")
-    yesterday_folder_url = "https://drive.google.com/drive/folders/1ku7IhbFWsYWDnYf0FJMcqOn2EIOfPnWu"
-    results = processor.process_recent_transcripts(folder_url=yesterday_folder_url, days_back=7)
+    results = processor.process_recent_transcripts(folder_url=args.folder_url, days_back=args.days_back, max_workers=args.concurrency)
     
     print(f"\nProcessing Complete:")
     print(f"Successfully processed: {results['processed']}")
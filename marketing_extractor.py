@@ -14,10 +14,15 @@ from datetime import datetime
 from dotenv import load_dotenv
 from supabase import create_client, Client
 from ai_llm_fallback import ai_generate_content
+from llm_archive import archive_responses, register_prompt, PROMPT_HASHES
+from processing_ledger import ProcessingLedger, run_with_ledger, filter_since
+from analysis_writer import upsert_analysis
+from write_buffer import write_rows
 
 from main import TranscriptProcessor
 from goal_extractor import _get_files_recursively  # reuse folder crawl
-from goal_extractor import _ensure_group as _ensure_group_ref, _ensure_member as _ensure_member_ref
+from goal_extractor import _ensure_group as _ensure_group_ref, _ensure_members as _ensure_members_ref
+from db_metrics import CountingClient, counting
 
 
 load_dotenv()
@@ -26,11 +31,17 @@ load_dotenv()
 def _load_prompt(path: str, placeholder: str = '{transcript}') -> str:
     p = os.path.join(os.path.dirname(__file__), path)
     with open(p, 'r', encoding='utf-8') as f:
-        return f.read().replace('[Transcript goes here]', placeholder)
+        return register_prompt(path, f.read().replace('[Transcript goes here]', placeholder))
 
 
 PROMPT_ACTIVITY = _load_prompt('prompts/marketing_activity.md')
 PROMPT_OUTCOMES = _load_prompt('prompts/pipeline_outcomes.md')
+PROMPT_ACTIVITY_VERSION = PROMPT_HASHES['prompts/marketing_activity.md']
+PROMPT_OUTCOMES_VERSION = PROMPT_HASHES['prompts/pipeline_outcomes.md']
+# Both prompts feed one ledger entry / analysis row
+PROMPT_VERSION = f'{PROMPT_ACTIVITY_VERSION}.{PROMPT_OUTCOMES_VERSION}'
+EXTRACTOR = 'marketing'
+ARCHIVE_VERSIONS = {'marketing_activity': PROMPT_ACTIVITY_VERSION, 'pipeline_outcomes': PROMPT_OUTCOMES_VERSION}
 
 
 def _parse_activity_block(text: str) -> Dict[str, Dict[str, str]]:
@@ -86,137 +97,180 @@ def _parse_multi_blocks(text: str, parse_fn) -> List[Dict]:
     return items
 
 
-def _save_analysis(supabase: Client, session_id: str, org_id: str, activities: List[Dict], outcomes: List[Dict]) -> None:
-    # Upsert transcript_analysis row per session
-    payload = {
+def _save_analysis(supabase: Client, session_id: str, org_id: str, activities: List[Dict], outcomes: List[Dict],
+                   prompt_hash: str = PROMPT_VERSION) -> None:
+    # Upsert transcript_analysis row per session, touching only the marketing columns
+    upsert_analysis(supabase, session_id, org_id, {
         'marketing_activities_json': activities,
         'pipeline_outcomes_json': outcomes,
-        'processing_status': 'completed',
-        'organization_id': org_id,
-    }
-    # Try update then insert
-    existing = supabase.schema('peer_progress').table('transcript_analysis').select('id').eq('transcript_session_id', session_id).execute()
-    if existing.data:
-        supabase.schema('peer_progress').table('transcript_analysis').update(payload).eq('id', existing.data[0]['id']).execute()
-    else:
-        payload['transcript_session_id'] = session_id
-        supabase.schema('peer_progress').table('transcript_analysis').insert(payload).execute()
+        'marketing_prompt_hash': prompt_hash,
+    })
 
 
-def _record_activity_rows(sb: Client, group_code: str, session_date: str, activities: List[Dict], outcomes: List[Dict]) -> None:
-    """Persist activity table rows based on parsed marketing activities and pipeline outcomes."""
-    group_id = _ensure_group_ref(sb, group_code)
-    # Activities: per participant
+ACTIVITY_CHANNELS = ('network_activation', 'linkedin', 'cold_outreach')
+OUTCOME_SUBTYPES = (('meetings', 'meeting_booked'), ('proposals', 'proposal_sent'), ('clients', 'client_closed'))
+INSERT_CHUNK_SIZE = 500
+
+
+def _activity_rows(member_ids: Dict[str, str], group_id: str, session_date: str,
+                   activities: List[Dict], outcomes: List[Dict]) -> List[Dict]:
+    """Build the activity_events rows for one transcript in memory."""
+    ts = session_date + 'T00:00:00Z' if session_date else None
+    rows: List[Dict] = []
+    # Activities: one marketing_touch per mentioned channel
     for a in activities or []:
-        name = a.get('name') or 'Unknown'
-        member_id = _ensure_member_ref(sb, name, group_code)
-        if not member_id or not group_id:
+        member_id = member_ids.get(a.get('name') or 'Unknown')
+        if not member_id or a.get('none'):
             continue
-        if a.get('none'):
-            continue
-        # Map categories to channel marketing_touch
-        if a.get('network_activation'):
-            sb.schema('peer_progress').table('activity_events').insert({
-                'member_id': member_id,
-                'group_id': group_id,
-                'subtype': 'marketing_touch',
-                'count': 1,
-                'channel': 'network_activation',
-                'ts': session_date + 'T00:00:00Z' if session_date else None,
-                'source': 'transcript',
-                'note': a['network_activation'][:250]
-            }).execute()
-        if a.get('linkedin'):
-            sb.schema('peer_progress').table('activity_events').insert({
-                'member_id': member_id,
-                'group_id': group_id,
-                'subtype': 'marketing_touch',
-                'count': 1,
-                'channel': 'linkedin',
-                'ts': session_date + 'T00:00:00Z' if session_date else None,
-                'source': 'transcript',
-                'note': a['linkedin'][:250]
-            }).execute()
-        if a.get('cold_outreach'):
-            sb.schema('peer_progress').table('activity_events').insert({
-                'member_id': member_id,
-                'group_id': group_id,
-                'subtype': 'marketing_touch',
-                'count': 1,
-                'channel': 'cold_outreach',
-                'ts': session_date + 'T00:00:00Z' if session_date else None,
-                'source': 'transcript',
-                'note': a['cold_outreach'][:250]
-            }).execute()
+        for channel in ACTIVITY_CHANNELS:
+            if a.get(channel):
+                rows.append({
+                    'member_id': member_id,
+                    'group_id': group_id,
+                    'subtype': 'marketing_touch',
+                    'count': 1,
+                    'channel': channel,
+                    'ts': ts,
+                    'source': 'transcript',
+                    'note': a[channel][:250],
+                })
     # Outcomes: meetings, proposals, clients (counts)
     for o in outcomes or []:
-        name = o.get('name') or 'Unknown'
-        member_id = _ensure_member_ref(sb, name, group_code)
-        if not member_id or not group_id:
+        member_id = member_ids.get(o.get('name') or 'Unknown')
+        if not member_id:
             continue
-        def _ins(subtype: str, count_val: int):
-            if count_val and count_val > 0:
-                sb.schema('peer_progress').table('activity_events').insert({
+        for key, subtype in OUTCOME_SUBTYPES:
+            count_val = int(o.get(key, 0))
+            if count_val > 0:
+                rows.append({
                     'member_id': member_id,
                     'group_id': group_id,
                     'subtype': subtype,
-                    'count': int(count_val),
-                    'ts': session_date + 'T00:00:00Z' if session_date else None,
+                    'count': count_val,
+                    'channel': None,
+                    'ts': ts,
                     'source': 'transcript',
-                    'note': (o.get('notes') or '')[:250]
-                }).execute()
-        _ins('meeting_booked', int(o.get('meetings', 0)))
-        _ins('proposal_sent', int(o.get('proposals', 0)))
-        _ins('client_closed', int(o.get('clients', 0)))
+                    'note': (o.get('notes') or '')[:250],
+                })
+    return rows
+
+
+def _record_activity_rows(sb: Client, group_code: str, session_date: str, activities: List[Dict], outcomes: List[Dict]) -> int:
+    """Persist activity table rows based on parsed marketing activities and pipeline outcomes.
+    Participants are resolved once and all rows go out in one (chunked) bulk insert. Returns rows inserted."""
+    group_id = _ensure_group_ref(sb, group_code)
+    if not group_id:
+        return 0
+    names = [p.get('name') or 'Unknown' for p in (activities or []) + (outcomes or [])]
+    member_ids = _ensure_members_ref(sb, names, group_code)
+    rows = _activity_rows(member_ids, group_id, session_date, activities, outcomes)
+    return write_rows(sb, 'activity_events', rows, chunk_size=INSERT_CHUNK_SIZE)
+
+
+def call_llm(content: str) -> Dict[str, str]:
+    """Raw LLM responses for one transcript, keyed by archive task."""
+    return {
+        'marketing_activity': ai_generate_content(PROMPT_ACTIVITY.format(transcript=content)),
+        'pipeline_outcomes': ai_generate_content(PROMPT_OUTCOMES.format(transcript=content)),
+    }
+
+
+def parse(raw: Dict[str, str]) -> Dict[str, List[Dict]]:
+    return {
+        'activities': _parse_multi_blocks(raw['marketing_activity'], _parse_activity_block),
+        'outcomes': _parse_multi_blocks(raw['pipeline_outcomes'], _parse_outcome_block),
+    }
+
+
+def analysis_payload(parsed: Dict[str, List[Dict]]) -> Dict:
+    """transcript_analysis columns written for this task."""
+    return {
+        'marketing_activities_json': parsed['activities'],
+        'pipeline_outcomes_json': parsed['outcomes'],
+        'marketing_prompt_hash': PROMPT_VERSION,
+    }
+
+
+def save_rows(processor: TranscriptProcessor, supabase: Client, f: Dict, organization_id: str,
+              session: Dict, parsed: Dict[str, List[Dict]]) -> int:
+    """Row-per-event writes that go alongside the analysis payload."""
+    _record_activity_rows(supabase, f['name'], session.get('session_date'), parsed['activities'], parsed['outcomes'])
+    return len(parsed['activities']) + len(parsed['outcomes'])
+
+
+def process_file(processor: TranscriptProcessor, supabase: Client, f: Dict, organization_id: str, content: str) -> int:
+    """Run marketing activity and pipeline outcome extraction for one downloaded transcript.
+    Returns the number of participant blocks parsed."""
+    if not isinstance(supabase, CountingClient):
+        # Count only on the caller's own counted client: a wrapper per file would also give
+        # every file its own identity map (and a full member reload)
+        return _process_file(processor, supabase, f, organization_id, content)
+    with supabase.track() as trips:
+        count = _process_file(processor, supabase, f, organization_id, content)
+    # Session lookups are included when processor.supabase is the same counted client
+    print(f"    {trips.count} DB round trips")
+    return count
+
+
+def _process_file(processor: TranscriptProcessor, supabase: Client, f: Dict, organization_id: str, content: str) -> int:
+    name = f['name']
+    # Derive session_date & create/find session to attach analysis to
+    mod = f.get('modifiedTime') or ''
+    try:
+        session_date = datetime.fromisoformat(mod.replace('Z', '+00:00')).date().isoformat()
+    except Exception:
+        session_date = None
+    session_rec = processor.create_transcript_session(filename=name, group_name=name, session_date=session_date, raw_transcript=None)
+    session_id = session_rec['id'] if session_rec else None
+    if not session_id:
+        raise Exception('could not create/find session')
+
+    # Use LLM (Gemini or ChatGPT) for activities and outcomes
+    raw = call_llm(content)
+    archive_responses(raw, ARCHIVE_VERSIONS, f['id'],
+                      {'filename': name, 'session_id': session_id, 'session_date': session_date, 'organization_id': organization_id})
+    parsed = parse(raw)
+
+    _save_analysis(supabase, session_id, organization_id, parsed['activities'], parsed['outcomes'])
+    # Also persist normalized activity rows for KPIs
+    count = save_rows(processor, supabase, f, organization_id, {'id': session_id, 'session_date': session_date or None}, parsed)
+    print(f"  ✓ Saved analysis for session {session_id}")
+    return count
 
 
 def extract_marketing(organization_id: str = 'f58a2d22-4e96-4d4a-9348-b82c8e3f1f2e',
                       folder_url: Optional[str] = None,
                       days_back: Optional[int] = None,
-                      recursive: bool = True) -> None:
+                      recursive: bool = True,
+                      force: bool = False,
+                      since: Optional[str] = None) -> None:
 
-    supabase = create_client(os.getenv('SUPABASE_URL'), os.getenv('SUPABASE_SERVICE_KEY'))
+    supabase = counting(create_client(os.getenv('SUPABASE_URL'), os.getenv('SUPABASE_SERVICE_KEY')))
     processor = TranscriptProcessor(organization_id=organization_id)
+    processor.supabase = supabase  # count session lookups too
 
     files = _get_files_recursively(processor, folder_url, days_back) if recursive else processor.get_recent_transcripts(folder_url, days_back or 30)
+    files = filter_since(files, since)
     if not files:
         print('No files found')
         return
 
+    ledger = ProcessingLedger(supabase, organization_id).load([EXTRACTOR])
+    processed, trips_total = 0, 0
     for f in files:
         name = f['name']
         print(f"Processing: {name}")
         try:
-            content = processor.download_and_read_file(f['id'], name, f['mimeType'])
-            if not content.strip():
-                continue
-            # Derive session_date & create/find session to attach analysis to
-            mod = f.get('modifiedTime') or ''
-            try:
-                session_date = datetime.fromisoformat(mod.replace('Z', '+00:00')).date().isoformat()
-            except Exception:
-                session_date = None
-            session_rec = processor.create_transcript_session(filename=name, group_name=name, session_date=session_date, raw_transcript=None)
-            session_id = session_rec['id'] if session_rec else None
-            if not session_id:
-                print('  ✗ could not create/find session')
-                continue
-
-            # Use LLM (Gemini or ChatGPT) for activities
-            act_text = ai_generate_content(PROMPT_ACTIVITY.format(transcript=content))
-            activities = _parse_multi_blocks(act_text, _parse_activity_block)
-
-            # Use LLM for outcomes
-            out_text = ai_generate_content(PROMPT_OUTCOMES.format(transcript=content))
-            outcomes = _parse_multi_blocks(out_text, _parse_outcome_block)
-
-            _save_analysis(supabase, session_id, organization_id, activities, outcomes)
-            # Also persist normalized activity rows for KPIs
-            session_date_str = session_date or None
-            _record_activity_rows(supabase, name, session_date_str, activities, outcomes)
-            print(f"  ✓ Saved analysis for session {session_id}")
+            with supabase.track() as trips:
+                result = run_with_ledger(ledger, processor, f, EXTRACTOR, PROMPT_VERSION,
+                                         lambda content: process_file(processor, supabase, f, organization_id, content), force=force)
+            if result is not None:
+                processed += 1
+                trips_total += trips.count
         except Exception as e:
             print(f"  ✗ Error: {e}")
+    if processed:
+        print(f"📊 {processed} transcripts, {trips_total / processed:.1f} DB round trips per transcript (incl. ledger)")
 
 
 if __name__ == '__main__':
@@ -0,0 +1,237 @@
+"""Run the extractors for several organizations at once.
+
+Each organization is a shard with its own Drive credentials, folder roots,
+LLM concurrency quota, processing ledger and priority queue. Shards are
+crawled in parallel; a shared worker pool then takes transcripts from the
+shards round-robin, so a large backfill in one organization can't starve
+the others. A shard that keeps failing is stopped without affecting the rest.
+
+Config (--config or ORGS_CONFIG), a JSON list of organizations:
+
+  [
+    {
+      "organization_id": "f58a2d22-4e96-4d4a-9348-b82c8e3f1f2e",
+      "name": "Peer Progress",
+      "folders": ["october_2025", "https://drive.google.com/drive/folders/XXX"],
+      "service_account_file": "/secrets/peer-progress.json",
+      "llm_concurrency": 2,
+      "tasks": ["goals", "marketing", "stuck", "challenges"]
+    }
+  ]
+
+"service_account_env" may name an env var holding the service account JSON
+instead of a file; with neither, GOOGLE_SERVICE_ACCOUNT_JSON / _FILE are used.
+
+Usage examples:
+  python org_runner.py --config orgs.json --workers 8
+  python org_runner.py --config orgs.json --since 2025-10-01 --days_back 30
+"""
+
+import os
+import json
+import argparse
+import threading
+from dataclasses import dataclass, field
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from typing import Dict, List, Optional
+
+from dotenv import load_dotenv
+from supabase import create_client
+
+from main import TranscriptProcessor
+from ai_llm_fallback import llm_quota
+from goal_extractor import _resolve_folders, _collect_transcript_files
+from extractor_registry import DEFAULT_TASKS, TASKS, run_task
+from processing_ledger import ProcessingLedger
+from transcript_priority import PriorityScheduler, fetch_demand, clear_demand
+
+
+@dataclass
+class OrgConfig:
+    organization_id: str
+    name: str = ''
+    folders: List[str] = field(default_factory=list)
+    service_account_file: Optional[str] = None
+    service_account_env: Optional[str] = None
+    llm_concurrency: int = 2
+    tasks: List[str] = field(default_factory=lambda: list(DEFAULT_TASKS))
+
+    @property
+    def label(self) -> str:
+        return self.name or self.organization_id[:8]
+
+    def service_account_info(self) -> Optional[Dict]:
+        if self.service_account_file:
+            with open(self.service_account_file) as f:
+                return json.load(f)
+        if self.service_account_env:
+            return json.loads(os.getenv(self.service_account_env, '{}')) or None
+        return None
+
+
+def load_org_configs(path: str) -> List[OrgConfig]:
+    with open(path) as f:
+        raw = json.load(f)
+    configs = []
+    for entry in raw:
+        config = OrgConfig(**entry)
+        unknown = [t for t in config.tasks if t not in TASKS]
+        if unknown:
+            raise ValueError(f'{config.label}: unknown task(s) {unknown}')
+        configs.append(config)
+    return configs
+
+
+class OrgShard:
+    """Per-organization state: clients, quota, queue and failure accounting."""
+
+    def __init__(self, config: OrgConfig, sb, max_consecutive_failures: int = 5):
+        self.config = config
+        self.sb = sb
+        self.max_in_flight = max(1, config.llm_concurrency)
+        self.llm_semaphore = threading.BoundedSemaphore(self.max_in_flight)
+        self.max_consecutive_failures = max_consecutive_failures
+        self.processor: Optional[TranscriptProcessor] = None
+        self.ledger: Optional[ProcessingLedger] = None
+        self.scheduler = PriorityScheduler()
+        self.demand = None
+        self.unfinished_files: List[Dict] = []
+        self.total = 0
+        self.in_flight = 0
+        self.completed = 0
+        self.failed = 0
+        self.consecutive_failures = 0
+        self.error: Optional[str] = None
+
+    @property
+    def label(self) -> str:
+        return self.config.label
+
+    @property
+    def active(self) -> bool:
+        return self.error is None
+
+    def can_dispatch(self) -> bool:
+        # Keep no more transcripts in flight than the org's LLM quota can serve
+        return self.active and len(self.scheduler) > 0 and self.in_flight < self.max_in_flight
+
+    def prepare(self, days_back: Optional[int], recursive: bool, since: Optional[str], starvation_every: int) -> None:
+        """Build the org's clients, crawl its folders and queue its transcripts."""
+        org_id = self.config.organization_id
+        try:
+            self.processor = TranscriptProcessor(organization_id=org_id,
+                                                 service_account_info=self.config.service_account_info())
+            if not self.processor.drive_service:
+                raise RuntimeError('Google Drive credentials not available')
+            folders = _resolve_folders(multiple_folders=self.config.folders) if self.config.folders else _resolve_folders()
+            files = _collect_transcript_files(self.processor, folders, days_back, recursive, since)
+            self.demand = fetch_demand(self.sb, org_id)
+            self.scheduler = PriorityScheduler(starvation_every=starvation_every)
+            for f in files:
+                self.scheduler.push(f, self.demand.boost_for(f))
+            self.ledger = ProcessingLedger(self.sb, org_id).load(self.config.tasks)
+            self.total = len(files)
+            print(f'📊 [{self.label}] {self.total} transcripts queued')
+        except Exception as e:
+            self.error = f'setup failed: {e}'
+            print(f'❌ [{self.label}] {self.error}')
+
+    def process(self, f: Dict, force: bool) -> bool:
+        """Run the org's tasks for one file under its LLM quota. Returns True if every task succeeded."""
+        ok = True
+        with llm_quota(self.llm_semaphore):
+            for task in self.config.tasks:
+                try:
+                    run_task(task, self.processor, self.sb, f, self.config.organization_id, self.ledger,
+                             force=force or self.demand.is_rerun(f))
+                except Exception as e:
+                    ok = False
+                    print(f"  ⚠️ [{self.label}] {task} error on {f['name']}: {e}")
+        return ok
+
+    def record_result(self, f: Dict, ok: bool) -> None:
+        self.in_flight -= 1
+        self.demand.record(f, ok)
+        if ok:
+            self.completed += 1
+            self.consecutive_failures = 0
+            return
+        self.unfinished_files.append(f)
+        self.failed += 1
+        self.consecutive_failures += 1
+        if self.active and self.consecutive_failures >= self.max_consecutive_failures:
+            self.error = f'stopped after {self.consecutive_failures} consecutive failures'
+            print(f'❌ [{self.label}] {self.error}; {len(self.scheduler)} transcripts left unprocessed')
+
+
+def run_orgs(shards: List[OrgShard], workers: int = 8, force: bool = False) -> None:
+    """Dispatch transcripts from all shards round-robin onto one worker pool."""
+    turn = 0
+    futures = {}
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+        while True:
+            # Fill free workers, taking one transcript per eligible org in turn
+            while len(futures) < workers:
+                eligible = [s for s in shards if s.can_dispatch()]
+                if not eligible:
+                    break
+                shard = eligible[turn % len(eligible)]
+                turn += 1
+                f = shard.scheduler.pop()
+                shard.in_flight += 1
+                print(f"▶ [{shard.label}] {f['name']}")
+                futures[executor.submit(shard.process, f, force)] = (shard, f)
+
+            if not futures:
+                break
+            done, _ = wait(list(futures), return_when=FIRST_COMPLETED)
+            for future in done:
+                shard, f = futures.pop(future)
+                try:
+                    ok = future.result()
+                except Exception as e:
+                    print(f'  ⚠️ [{shard.label}] worker error: {e}')
+                    ok = False
+                shard.record_result(f, ok)
+
+
+def main() -> None:
+    load_dotenv()
+
+    parser = argparse.ArgumentParser(description='Run extractors for several organizations concurrently')
+    parser.add_argument('--config', type=str, default=os.getenv('ORGS_CONFIG'), help='JSON file listing organizations')
+    parser.add_argument('--workers', type=int, default=8, help='Transcripts processed at once across all orgs')
+    parser.add_argument('--days_back', type=int, default=None, help='Only process files modified within N days')
+    parser.add_argument('--no_recursive', action='store_true', help='Do not search subfolders')
+    parser.add_argument('--since', type=str, default=None, help='Only process files modified on/after this date (YYYY-MM-DD)')
+    parser.add_argument('--force', action='store_true', help='Ignore the processing ledger and re-run every file')
+    parser.add_argument('--starvation_every', type=int, default=5, help='Every Nth transcript per org is its oldest pending one')
+    parser.add_argument('--max_consecutive_failures', type=int, default=5, help='Stop an org after this many failed transcripts in a row')
+    args = parser.parse_args()
+
+    if not args.config:
+        parser.error('--config (or ORGS_CONFIG) is required')
+
+    configs = load_org_configs(args.config)
+    sb = create_client(os.getenv('SUPABASE_URL'), os.getenv('SUPABASE_SERVICE_KEY'))
+    shards = [OrgShard(c, sb, args.max_consecutive_failures) for c in configs]
+
+    print(f'🏢 Preparing {len(shards)} organization(s)...')
+    with ThreadPoolExecutor(max_workers=len(shards) or 1) as executor:
+        list(executor.map(lambda s: s.prepare(args.days_back, not args.no_recursive, args.since, args.starvation_every), shards))
+
+    run_orgs(shards, workers=args.workers, force=bool(args.force))
+
+    print('\n📋 Summary:')
+    for s in shards:
+        if s.demand:
+            # Transcripts a stopped org never dispatched keep their requests for the next run
+            while len(s.scheduler):
+                s.unfinished_files.append(s.scheduler.pop())
+            clear_demand(sb, s.demand, s.unfinished_files)
+        status = f'❌ {s.error}' if s.error else '✅'
+        print(f'  {status} {s.label}: {s.completed}/{s.total} completed, {s.failed} failed')
+
+
+if __name__ == '__main__':
+    main()
@@ -4,6 +4,8 @@ from typing import List, Dict
 from dotenv import load_dotenv
 from supabase import create_client, Client
 
+from transcript_priority import record_dashboard_view
+
 load_dotenv()
 
 
@@ -73,6 +75,15 @@ def fetch_stuck(org_id: str, date: str) -> List[Dict]:
     return rows
 
 
+@st.cache_data(ttl=300)
+def mark_viewed(org_id: str, date: str) -> bool:
+    """Ask the extraction runner to process this session date first."""
+    client = get_sb()
+    if client:
+        record_dashboard_view(client, org_id, date)
+    return True
+
+
 def main():
     st.set_page_config(page_title='Stuck Signals', page_icon='🆘', layout='wide')
     st.title('🆘 Stuck / Support Needed')
@@ -89,6 +100,7 @@ def main():
         st.info('No session dates found. Run stuck_extractor.py first.')
         return
     date = st.sidebar.selectbox('📅 Session Date', dates, index=0)
+    mark_viewed(org_id, date)
 
     data = fetch_stuck(org_id, date)
     if not data:
@@ -4,6 +4,8 @@ from typing import List, Dict
 from dotenv import load_dotenv
 from supabase import create_client, Client
 
+from transcript_priority import record_dashboard_view
+
 load_dotenv()
 
 
@@ -73,6 +75,15 @@ def fetch(org_id: str, date: str) -> List[Dict]:
     return rows
 
 
+@st.cache_data(ttl=300)
+def mark_viewed(org_id: str, date: str) -> bool:
+    """Ask the extraction runner to process this session date first."""
+    client = sb()
+    if client:
+        record_dashboard_view(client, org_id, date)
+    return True
+
+
 def main():
     st.set_page_config(page_title='Challenges & Strategies', page_icon='🧠', layout='wide')
     st.title('🧠 Challenges & Strategies')
@@ -89,6 +100,7 @@ def main():
         st.info('No session dates found. Run challenges_extractor.py first.')
         return
     d = st.sidebar.selectbox('📅 Session Date', ds, index=0)
+    mark_viewed(org, d)
 
     data = fetch(org, d)
     if not data:
@@ -16,8 +16,11 @@ from dotenv import load_dotenv
 from supabase import create_client, Client
 
 from main import TranscriptProcessor
-from goal_extractor import _get_files_recursively, _ensure_group as ensure_group, _ensure_member as ensure_member
+from goal_extractor import _get_files_recursively, _ensure_group as ensure_group, _ensure_members as ensure_members
 from ai_llm_fallback import ai_generate_content
+from llm_archive import archive_responses, register_prompt, PROMPT_HASHES
+from processing_ledger import ProcessingLedger, run_with_ledger, filter_since
+from write_buffer import write_buffer_for, flush_all
 
 
 load_dotenv()
@@ -26,10 +29,13 @@ load_dotenv()
 def _load_prompt(rel_path: str) -> str:
     p = os.path.join(os.path.dirname(__file__), rel_path)
     with open(p, 'r', encoding='utf-8') as f:
-        return f.read().replace('[Transcript goes here]', '{transcript}')
+        return register_prompt(rel_path, f.read().replace('[Transcript goes here]', '{transcript}'))
 
 
 PROMPT = _load_prompt('prompts/pipeline_strict.md')
+PROMPT_VERSION = PROMPT_HASHES['prompts/pipeline_strict.md']
+EXTRACTOR = 'pipeline'
+ARCHIVE_VERSIONS = {'pipeline_strict': PROMPT_VERSION}
 
 
 def _parse_blocks(text: str) -> List[Dict]:
@@ -75,58 +81,88 @@ def _channel_to_db(ch: str) -> Optional[str]:
     return None
 
 
+def call_llm(content: str) -> Dict[str, str]:
+    """Raw LLM responses for one transcript, keyed by archive task."""
+    return {'pipeline_strict': ai_generate_content(PROMPT.format(transcript=content))}
+
+
+def parse(raw: Dict[str, str]) -> List[Dict]:
+    return _parse_blocks(raw['pipeline_strict'])
+
+
+def save_rows(processor: TranscriptProcessor, sb: Client, f: Dict, organization_id: str,
+              session: Dict, rows: List[Dict]) -> int:
+    """Write one activity_events row per parsed pipeline entry. Returns entries parsed."""
+    fname = f['name']
+    call_date = session.get('session_date')
+    group_id = ensure_group(sb, fname)
+    member_ids = ensure_members(sb, [r['name'] for r in rows if _stage_to_subtype(r['stage'])], fname)
+    for r in rows:
+        subtype = _stage_to_subtype(r['stage'])
+        channel = _channel_to_db(r['channel'])
+        if not subtype:
+            continue
+        member_id = member_ids.get(r['name'])
+        if not member_id or not group_id:
+            continue
+        note = (r['outcome'] + ' | ' + r['quote']).strip()[:500]
+        payload = {
+            'member_id': member_id,
+            'group_id': group_id,
+            'subtype': subtype,
+            'marketing_channel': channel,
+            'count': 1,
+            'ts': call_date + 'T00:00:00Z' if call_date else None,
+            'source': 'transcript',
+            'note': note
+        }
+        write_buffer_for(sb, 'activity_events').add(payload)
+    print(f'  ✓ Saved {len(rows)} pipeline entries')
+    return len(rows)
+
+
+def process_file(processor: TranscriptProcessor, sb: Client, f: Dict, organization_id: str, content: str) -> int:
+    """Run strict pipeline extraction for one downloaded transcript. Returns entries parsed."""
+    fname = f['name']
+    # derive session date
+    mod = f.get('modifiedTime') or ''
+    try:
+        call_date = datetime.fromisoformat(mod.replace('Z', '+00:00')).date().isoformat()
+    except Exception:
+        call_date = None
+    # run LLM
+    raw = call_llm(content)
+    archive_responses(raw, ARCHIVE_VERSIONS, f['id'], {
+        'filename': fname, 'session_date': call_date, 'organization_id': organization_id,
+    })
+    return save_rows(processor, sb, f, organization_id, {'session_date': call_date}, parse(raw))
+
+
 def extract_pipeline(folder_url: Optional[str] = None,
                      organization_id: str = 'f58a2d22-4e96-4d4a-9348-b82c8e3f1f2e',
                      days_back: Optional[int] = None,
-                     recursive: bool = True) -> None:
+                     recursive: bool = True,
+                     force: bool = False,
+                     since: Optional[str] = None) -> None:
     sb = create_client(os.getenv('SUPABASE_URL'), os.getenv('SUPABASE_SERVICE_KEY'))
     processor = TranscriptProcessor(organization_id=organization_id)
 
     files = _get_files_recursively(processor, folder_url, days_back) if recursive else processor.get_recent_transcripts(folder_url, days_back or 30)
+    files = filter_since(files, since)
     if not files:
         print('No files found')
         return
 
+    ledger = ProcessingLedger(sb, organization_id).load([EXTRACTOR])
     for f in files:
         fname = f['name']
         print(f'Processing: {fname}')
         try:
-            content = processor.download_and_read_file(f['id'], fname, f['mimeType'])
-            if not content.strip():
-                continue
-            # derive session date
-            mod = f.get('modifiedTime') or ''
-            try:
-                call_date = datetime.fromisoformat(mod.replace('Z', '+00:00')).date().isoformat()
-            except Exception:
-                call_date = None
-            # run LLM
-            text = ai_generate_content(PROMPT.format(transcript=content))
-            rows = _parse_blocks(text)
-            group_id = ensure_group(sb, fname)
-            for r in rows:
-                subtype = _stage_to_subtype(r['stage'])
-                channel = _channel_to_db(r['channel'])
-                if not subtype:
-                    continue
-                member_id = ensure_member(sb, r['name'], fname)
-                if not member_id or not group_id:
-                    continue
-                note = (r['outcome'] + ' | ' + r['quote']).strip()[:500]
-                payload = {
-                    'member_id': member_id,
-                    'group_id': group_id,
-                    'subtype': subtype,
-                    'marketing_channel': channel,
-                    'count': 1,
-                    'ts': call_date + 'T00:00:00Z' if call_date else None,
-                    'source': 'transcript',
-                    'note': note
-                }
-                sb.schema('peer_progress').table('activity_events').insert(payload).execute()
-            print(f'  ✓ Saved {len(rows)} pipeline entries')
+            run_with_ledger(ledger, processor, f, EXTRACTOR, PROMPT_VERSION,
+                            lambda content: process_file(processor, sb, f, organization_id, content), force=force)
         except Exception as e:
             print(f'  ✗ Error: {e}')
+    flush_all()
 
 
 if __name__ == '__main__':
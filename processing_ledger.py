@@ -0,0 +1,147 @@
+"""
+Idempotent processing ledger.
+
+Records which (file_id, modifiedTime, extractor, prompt_hash) combinations have
+been processed, with status, timings and output counts, so scheduled runs skip
+transcripts that are unchanged since they were last extracted with the same
+prompt. Backed by peer_progress.processing_ledger (see create_processing_ledger.sql).
+"""
+
+import time
+from datetime import datetime, timezone
+from typing import Callable, Dict, List, Optional, Set, Tuple
+
+from supabase import Client
+
+import write_buffer
+
+
+LedgerKey = Tuple[str, str, str, str]
+
+# Empty files are recorded as 'skipped' and, like completed ones, not re-downloaded
+DONE_STATUSES = ('completed', 'skipped')
+
+
+def _key(file_id: str, modified_time: Optional[str], extractor: str, prompt_hash: str) -> LedgerKey:
+    return (file_id, modified_time or '', extractor, prompt_hash)
+
+
+def _normalize_ts(ts: Optional[str]) -> str:
+    """Compare Drive and Postgres timestamps on the same footing."""
+    if not ts:
+        return ''
+    try:
+        return datetime.fromisoformat(ts.replace('Z', '+00:00')).astimezone(timezone.utc).isoformat()
+    except Exception:
+        return ts
+
+
+def filter_since(files: List[Dict], since: Optional[str]) -> List[Dict]:
+    """Keep files modified on/after `since` (YYYY-MM-DD or ISO timestamp)."""
+    if not since:
+        return files
+    cutoff = _normalize_ts(since if 'T' in since else since + 'T00:00:00+00:00')
+    return [f for f in files if _normalize_ts(f.get('modifiedTime')) >= cutoff]
+
+
+class ProcessingLedger:
+    def __init__(self, sb: Client, organization_id: str):
+        self.sb = sb
+        self.organization_id = organization_id
+        self.enabled = True
+        self._completed: Set[LedgerKey] = set()
+
+    def _table(self):
+        return self.sb.schema('peer_progress').table('processing_ledger')
+
+    def load(self, extractors: Optional[List[str]] = None, page_size: int = 1000) -> 'ProcessingLedger':
+        """Preload completed keys once per run so lookups don't cost a round trip per file."""
+        try:
+            offset = 0
+            while True:
+                q = self._table().select('file_id, modified_time, extractor, prompt_hash').eq(
+                    'organization_id', self.organization_id).in_('status', list(DONE_STATUSES))
+                if extractors:
+                    q = q.in_('extractor', extractors)
+                rows = q.range(offset, offset + page_size - 1).execute().data or []
+                for r in rows:
+                    self._completed.add(_key(r['file_id'], _normalize_ts(r.get('modified_time')), r['extractor'], r['prompt_hash']))
+                if len(rows) < page_size:
+                    break
+                offset += page_size
+        except Exception as e:
+            print(f"⚠️ Processing ledger unavailable, every file will be processed: {e}")
+            self.enabled = False
+        return self
+
+    def is_done(self, f: Dict, extractor: str, prompt_hash: str) -> bool:
+        return _key(f['id'], _normalize_ts(f.get('modifiedTime')), extractor, prompt_hash) in self._completed
+
+    def _row(self, f: Dict, extractor: str, prompt_hash: str, status: str,
+             started: float, output_count: int = 0, error: Optional[str] = None) -> Dict:
+        finished = time.time()
+        return {
+            'organization_id': self.organization_id,
+            'file_id': f['id'],
+            'file_name': f.get('name'),
+            'mime_type': f.get('mimeType'),
+            'modified_time': f.get('modifiedTime'),
+            'extractor': extractor,
+            'prompt_hash': prompt_hash,
+            'status': status,
+            'started_at': datetime.fromtimestamp(started, timezone.utc).isoformat(),
+            'finished_at': datetime.fromtimestamp(finished, timezone.utc).isoformat(),
+            'duration_ms': int((finished - started) * 1000),
+            'output_count': output_count,
+            'error_message': error,
+        }
+
+    def record(self, f: Dict, extractor: str, prompt_hash: str, status: str,
+               started: float, output_count: int = 0, error: Optional[str] = None) -> None:
+        self.record_many([(f, extractor, prompt_hash, status, started, output_count, error)])
+
+    def record_many(self, entries: List[Tuple]) -> None:
+        """Write several outcomes in one upsert. Entries are record() argument tuples."""
+        if not self.enabled or not entries:
+            return
+        rows = [self._row(*entry) for entry in entries]
+        try:
+            self._table().upsert(rows, on_conflict='file_id,modified_time,extractor,prompt_hash').execute()
+            for f, extractor, prompt_hash, status, *_ in entries:
+                if status in DONE_STATUSES:
+                    self._completed.add(_key(f['id'], _normalize_ts(f.get('modifiedTime')), extractor, prompt_hash))
+        except Exception as e:
+            print(f"  ⚠️ Could not write ledger entry: {e}")
+
+
+def run_with_ledger(ledger: Optional[ProcessingLedger], processor, f: Dict, extractor: str, prompt_hash: str,
+                    handler: Callable[[str], int], force: bool = False) -> Optional[int]:
+    """Consult the ledger, download the file, run handler(content) and record the outcome.
+
+    Returns the handler's output count, or None when the file was skipped.
+    """
+    if ledger and not force and ledger.is_done(f, extractor, prompt_hash):
+        print(f"  ↷ {extractor}: unchanged since last run, skipping")
+        return None
+    started = time.time()
+    try:
+        content = processor.download_and_read_file(f['id'], f['name'], f['mimeType'])
+        if not content.strip():
+            if ledger:
+                ledger.record(f, extractor, prompt_hash, 'skipped', started)
+            return None
+        tag = object()
+        with write_buffer.tagged(tag):
+            count = handler(content) or 0
+        # Buffered rows must reach the database before the file is recorded as done
+        write_buffer.flush_all()
+        dropped = write_buffer.take_dead_lettered(tag)
+        if dropped:
+            raise RuntimeError(f'{dropped} buffered rows were dead-lettered')
+        if ledger:
+            ledger.record(f, extractor, prompt_hash, 'completed', started, output_count=count)
+        return count
+    except Exception as e:
+        if ledger:
+            ledger.record(f, extractor, prompt_hash, 'failed', started, error=str(e))
+        raise
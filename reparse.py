@@ -0,0 +1,123 @@
+"""Replay archived LLM responses through the current parsers and rewrite Supabase rows.
+
+No LLM calls are made: responses come from llm_archive. Only idempotent writes
+are replayed (transcript_analysis JSON columns and quantifiable_goals, which
+dedups on normalized goal text). Row-per-event tables such as activity_events
+are not rewritten because replaying them would duplicate rows.
+
+Usage examples:
+  python reparse.py                       # all supported tasks
+  python reparse.py --tasks stuck challenges
+  python reparse.py --tasks goals --dry_run
+"""
+
+import os
+import argparse
+from typing import Dict, List, Optional
+
+from dotenv import load_dotenv
+from supabase import create_client
+
+from llm_archive import iter_archived
+from analysis_writer import upsert_analysis_many
+from stuck_extractor import _parse_stuck_blocks
+from challenges_extractor import _parse_response as _parse_challenges
+from marketing_extractor import _parse_multi_blocks, _parse_activity_block, _parse_outcome_block
+from goal_extractor import _parse_gemini_response, _save_group_to_supabase
+
+
+SUPPORTED_TASKS = ['goals', 'marketing', 'stuck', 'challenges']
+
+
+def reparse(tasks: Optional[List[str]] = None,
+            organization_id: str = 'f58a2d22-4e96-4d4a-9348-b82c8e3f1f2e',
+            dry_run: bool = False) -> Dict[str, int]:
+    tasks = tasks or SUPPORTED_TASKS
+    sb = None if dry_run else create_client(os.getenv('SUPABASE_URL'), os.getenv('SUPABASE_SERVICE_KEY'))
+    counts: Dict[str, int] = {}
+
+    # transcript_analysis columns keyed by session; each task merges its own columns
+    analysis_rows: Dict[str, Dict] = {}
+
+    if 'stuck' in tasks:
+        n = 0
+        for rec in iter_archived(['stuck']):
+            meta = rec.get('metadata') or {}
+            if meta.get('organization_id', organization_id) != organization_id or not meta.get('session_id'):
+                continue
+            row = analysis_rows.setdefault(meta['session_id'], {})
+            row['stuck_signals_json'] = _parse_stuck_blocks(rec['response'])
+            row['stuck_prompt_hash'] = rec['prompt_version']
+            n += 1
+        counts['stuck'] = n
+
+    if 'challenges' in tasks:
+        n = 0
+        for rec in iter_archived(['challenges']):
+            meta = rec.get('metadata') or {}
+            if meta.get('organization_id', organization_id) != organization_id or not meta.get('session_id'):
+                continue
+            row = analysis_rows.setdefault(meta['session_id'], {})
+            row['challenges_strategies_json'] = _parse_challenges(rec['response'])
+            row['challenges_prompt_hash'] = rec['prompt_version']
+            n += 1
+        counts['challenges'] = n
+
+    if 'marketing' in tasks:
+        # Activities and outcomes are written together, so both responses are required
+        outcomes_by_key = {r['transcript_key']: r for r in iter_archived(['pipeline_outcomes'])}
+        n = 0
+        for rec in iter_archived(['marketing_activity']):
+            meta = rec.get('metadata') or {}
+            if meta.get('organization_id', organization_id) != organization_id or not meta.get('session_id'):
+                continue
+            out_rec = outcomes_by_key.get(rec['transcript_key'])
+            if not out_rec:
+                print(f"  ⚠️ No archived pipeline_outcomes for {meta.get('filename')}, skipping marketing")
+                continue
+            row = analysis_rows.setdefault(meta['session_id'], {})
+            row['marketing_activities_json'] = _parse_multi_blocks(rec['response'], _parse_activity_block)
+            row['pipeline_outcomes_json'] = _parse_multi_blocks(out_rec['response'], _parse_outcome_block)
+            row['marketing_prompt_hash'] = f"{rec['prompt_version']}.{out_rec['prompt_version']}"
+            n += 1
+        counts['marketing'] = n
+
+    if analysis_rows and not dry_run:
+        upsert_analysis_many(sb, organization_id, analysis_rows)
+
+    if 'goals' in tasks:
+        n = 0
+        for rec in iter_archived(['goals']):
+            meta = rec.get('metadata') or {}
+            if meta.get('organization_id', organization_id) != organization_id:
+                continue
+            filename = meta.get('filename') or rec['transcript_key']
+            session_date = meta.get('session_date')
+            group_data = _parse_gemini_response(rec['response'], filename, session_date)
+            if not group_data or not group_data.get('participants'):
+                continue
+            if not dry_run:
+                _save_group_to_supabase(sb, group_data, organization_id, filename, session_date, prompt_hash=rec['prompt_version'])
+            n += 1
+        counts['goals'] = n
+
+    return counts
+
+
+def main() -> None:
+    load_dotenv()
+
+    parser = argparse.ArgumentParser(description='Re-parse archived LLM responses without calling the LLM')
+    parser.add_argument('--tasks', nargs='*', choices=SUPPORTED_TASKS, help='Tasks to replay (default: all)')
+    parser.add_argument('--organization_id', type=str, default='f58a2d22-4e96-4d4a-9348-b82c8e3f1f2e')
+    parser.add_argument('--dry_run', action='store_true', help='Parse only; do not write to Supabase')
+    args = parser.parse_args()
+
+    counts = reparse(tasks=args.tasks, organization_id=args.organization_id, dry_run=args.dry_run)
+    for task, n in counts.items():
+        print(f'  {task}: {n} transcripts re-parsed')
+    print('\n✅ Re-parse complete.')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,108 @@
+"""Re-run only the extraction tasks whose prompt changed.
+
+Each extractor hashes its prompt file(s) at load time. The processing ledger
+records the hash every file was last extracted with, so after editing e.g.
+prompts/stuck_signals.md only the stuck task is stale; goals, marketing and
+challenges are left alone. File metadata comes from the ledger, so no Drive
+crawl is needed.
+
+Usage examples:
+  python reprocess_prompts.py --dry_run                        # show what is stale
+  python reprocess_prompts.py --tasks stuck --since 2025-10-01 --until 2025-10-31
+  python reprocess_prompts.py --concurrency 4
+"""
+
+import os
+import argparse
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Dict, List, Optional
+
+from dotenv import load_dotenv
+from supabase import create_client, Client
+
+from main import TranscriptProcessor
+from extractor_registry import TASKS, run_task
+from processing_ledger import ProcessingLedger
+
+
+def find_stale(sb: Client, organization_id: str, tasks: List[str],
+               since: Optional[str] = None, until: Optional[str] = None, page_size: int = 1000) -> Dict[str, List[Dict]]:
+    """Return {task: [drive file dicts]} for files not yet extracted with the task's current prompt."""
+    current = {t: TASKS[t].prompt_version for t in tasks}
+    seen: Dict[tuple, Dict] = {}
+    up_to_date = set()
+    offset = 0
+    while True:
+        q = sb.schema('peer_progress').table('processing_ledger').select(
+            'file_id, file_name, mime_type, modified_time, extractor, prompt_hash'
+        ).eq('organization_id', organization_id).eq('status', 'completed').in_('extractor', tasks)
+        if since:
+            q = q.gte('modified_time', since)
+        if until:
+            q = q.lte('modified_time', until if 'T' in until else until + 'T23:59:59Z')
+        rows = q.order('modified_time', desc=True).range(offset, offset + page_size - 1).execute().data or []
+        for r in rows:
+            key = (r['extractor'], r['file_id'])
+            if r['prompt_hash'] == current[r['extractor']]:
+                up_to_date.add(key)
+            # Keep the newest file version per (task, file)
+            if key not in seen:
+                seen[key] = {'id': r['file_id'], 'name': r.get('file_name') or r['file_id'],
+                             'mimeType': r.get('mime_type'), 'modifiedTime': r.get('modified_time')}
+        if len(rows) < page_size:
+            break
+        offset += page_size
+
+    stale: Dict[str, List[Dict]] = {t: [] for t in tasks}
+    for (task, _file_id), f in seen.items():
+        if (task, _file_id) not in up_to_date:
+            stale[task].append(f)
+    return stale
+
+
+def reprocess(organization_id: str, tasks: List[str], since: Optional[str] = None, until: Optional[str] = None,
+              concurrency: int = 2, dry_run: bool = False) -> Dict[str, int]:
+    sb = create_client(os.getenv('SUPABASE_URL'), os.getenv('SUPABASE_SERVICE_KEY'))
+    stale = find_stale(sb, organization_id, tasks, since, until)
+    for task, files in stale.items():
+        print(f'  {task}: prompt {TASKS[task].prompt_version}, {len(files)} stale file(s)')
+    if dry_run:
+        return {t: len(fs) for t, fs in stale.items()}
+
+    processor = TranscriptProcessor(organization_id=organization_id)
+    ledger = ProcessingLedger(sb, organization_id).load(tasks)
+    jobs = [(task, f) for task, files in stale.items() for f in files]
+    done: Dict[str, int] = {t: 0 for t in tasks}
+
+    with ThreadPoolExecutor(max_workers=max(1, concurrency)) as executor:
+        futures = {executor.submit(run_task, task, processor, sb, f, organization_id, ledger): (task, f) for task, f in jobs}
+        for future in as_completed(futures):
+            task, f = futures[future]
+            try:
+                future.result()
+                done[task] += 1
+                print(f"  ✓ {task}: {f['name']}")
+            except Exception as e:
+                print(f"  ✗ {task}: {f['name']}: {e}")
+    return done
+
+
+def main() -> None:
+    load_dotenv()
+
+    parser = argparse.ArgumentParser(description='Re-run tasks whose prompt file changed')
+    parser.add_argument('--tasks', nargs='*', choices=list(TASKS.keys()), default=None, help='Tasks to check (default: all)')
+    parser.add_argument('--since', type=str, default=None, help='Only files modified on/after this date (YYYY-MM-DD)')
+    parser.add_argument('--until', type=str, default=None, help='Only files modified on/before this date (YYYY-MM-DD)')
+    parser.add_argument('--concurrency', type=int, default=2, help='Tasks to run at once')
+    parser.add_argument('--organization_id', type=str, default='f58a2d22-4e96-4d4a-9348-b82c8e3f1f2e')
+    parser.add_argument('--dry_run', action='store_true', help='Only report stale files')
+    args = parser.parse_args()
+
+    counts = reprocess(args.organization_id, args.tasks or list(TASKS.keys()), args.since, args.until,
+                       args.concurrency, args.dry_run)
+    print(f'\n✅ Reprocessed: {counts}')
+
+
+if __name__ == '__main__':
+    main()
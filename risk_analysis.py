@@ -1,10 +1,13 @@
 from __future__ import annotations
 
 import os
+import threading
 from dataclasses import dataclass
 from datetime import datetime, timedelta, timezone
-from typing import Dict, List, Optional, Tuple
+from typing import Dict, Iterable, List, Optional, Tuple
 
+import numpy as np
+import pandas as pd
 from dotenv import load_dotenv
 from supabase import create_client, Client
 
@@ -64,105 +67,137 @@ def fetch_members(sb: Client, group_id_filter: Optional[str], status: Optional[s
     return rows
 
 
+# Column names differ between deployments, so each role lists the names it may go by
+TS_COLUMNS = ['ts', 'created_at', 'timestamp', 'time']
+TYPE_COLUMNS = ['subtype', 'type', 'event_type']
+CHANNEL_COLUMNS = ['channel', 'marketing_channel']
+ATTENDANCE_DATE_COLUMNS = ['date', 'call_date', 'created_at']
+DATE_ONLY_COLUMNS = {'date', 'call_date'}
+GOAL_EVENT_TYPES = ['goal_set', 'goal_update', 'goal_completed']
+CHANNEL_VALUES = {'LinkedIn': 'linkedin', 'Network Activation': 'network_activation', 'Cold Outreach': 'cold_outreach'}
+MEMBER_CHUNK = 200
+PAGE_SIZE = 1000
+
+_columns: Dict[Tuple[str, str], bool] = {}
+_probed_tables: Dict[str, bool] = {}
+_columns_lock = threading.Lock()
+
+
+def has_column(sb: Client, table: str, column: str) -> bool:
+    """Whether peer_progress.<table> has column, probed once per process.
+    One sample row answers for every column; an empty table is probed column by column."""
+    with _columns_lock:
+        if table not in _probed_tables:
+            rows = sb.schema('peer_progress').table(table).select('*').limit(1).execute().data or []
+            for key in (rows[0] if rows else {}):
+                _columns[(table, key)] = True
+            _probed_tables[table] = bool(rows)
+        if (table, column) not in _columns:
+            if _probed_tables[table]:
+                _columns[(table, column)] = False
+            else:
+                try:
+                    sb.schema('peer_progress').table(table).select(column).limit(0).execute()
+                    _columns[(table, column)] = True
+                except Exception:
+                    _columns[(table, column)] = False
+        return _columns[(table, column)]
+
+
+def existing_columns(sb: Client, table: str, candidates: List[str]) -> List[str]:
+    return [c for c in candidates if has_column(sb, table, c)]
+
+
+def _time_bounds(query, column: str, start: Optional[datetime], end: Optional[datetime]):
+    if column in DATE_ONLY_COLUMNS:
+        # A day counts from its midnight UTC, so a window starting mid-day begins with the next day
+        if start:
+            first = start.date() if start.time() == datetime.min.time() else start.date() + timedelta(days=1)
+            query = query.gte(column, first.isoformat())
+        if end:
+            query = query.lte(column, end.date().isoformat())
+        return query
+    if start:
+        query = query.gte(column, start.isoformat())
+    if end:
+        query = query.lte(column, end.isoformat())
+    return query
+
+
+def _fetch(sb: Client, table: str, columns: List[str], member_ids: List[str], narrow) -> List[Dict]:
+    """Projected rows for member_ids, in member chunks and pages, with narrow(query) adding filters."""
+    rows: List[Dict] = []
+    order_by = 'id' if has_column(sb, table, 'id') else None
+    for i in range(0, len(member_ids), MEMBER_CHUNK):
+        offset = 0
+        while True:
+            q = sb.schema('peer_progress').table(table).select(', '.join(columns)).in_('member_id', member_ids[i:i + MEMBER_CHUNK])
+            q = narrow(q)
+            if order_by:
+                q = q.order(order_by)
+            page = q.range(offset, offset + PAGE_SIZE - 1).execute().data or []
+            rows.extend(page)
+            if len(page) < PAGE_SIZE or not order_by:
+                break
+            offset += PAGE_SIZE
+    return rows
+
+
 def fetch_activity(sb: Client, member_ids: List[str], start: Optional[datetime], end: Optional[datetime], channel: Optional[str]) -> List[Dict]:
     if not member_ids:
         return []
-    # Select all columns to tolerate schema differences (e.g., type vs subtype)
-    q = sb.schema('peer_progress').table('activity_events').select('*').in_('member_id', member_ids)
-    rows = (q.execute().data) or []
-    # Time filter in Python to handle varying timestamp column names
-    def _row_ts(r: Dict) -> Optional[datetime]:
-        ts_str = r.get('ts') or r.get('created_at') or r.get('timestamp') or r.get('time')
-        if not ts_str:
-            return None
-        try:
-            return datetime.fromisoformat(ts_str.replace('Z', '+00:00'))
-        except Exception:
-            return None
-    if start or end:
-        filtered = []
-        for r in rows:
-            ts_val = _row_ts(r)
-            if not ts_val:
-                continue
-            if start and ts_val < start:
-                continue
-            if end and ts_val > end:
-                continue
-            filtered.append(r)
-        rows = filtered
-    # Apply channel filter in Python to avoid column name issues upstream
-    if channel and channel != 'All Channels':
-        mapping = {'LinkedIn': 'linkedin', 'Network Activation': 'network_activation', 'Cold Outreach': 'cold_outreach'}
-        target = mapping.get(channel, channel)
-        rows = [r for r in rows if (r.get('channel') == target or r.get('marketing_channel') == target)]
-    return rows
+    table = 'activity_events'
+    ts_cols = existing_columns(sb, table, TS_COLUMNS)
+    type_cols = existing_columns(sb, table, TYPE_COLUMNS)
+    channel_cols = existing_columns(sb, table, CHANNEL_COLUMNS)
+    columns = ['member_id'] + type_cols + existing_columns(sb, table, ['count']) + channel_cols + ts_cols[:1]
+
+    def narrow(q):
+        if ts_cols:
+            q = _time_bounds(q, ts_cols[0], start, end)
+        if channel and channel != 'All Channels':
+            target = CHANNEL_VALUES.get(channel, channel)
+            if len(channel_cols) > 1:
+                q = q.or_(','.join(f'{c}.eq.{target}' for c in channel_cols))
+            elif channel_cols:
+                q = q.eq(channel_cols[0], target)
+        return q
+    return _fetch(sb, table, columns, member_ids, narrow)
 
 
 def fetch_goal_events(sb: Client, member_ids: List[str], start: Optional[datetime], end: Optional[datetime]) -> List[Dict]:
     if not member_ids:
         return []
     # Use activity_events as the unified store; filter to goal_* types
-    q = sb.schema('peer_progress').table('activity_events').select('*').in_('member_id', member_ids)
-    rows = (q.execute().data) or []
-    def _row_ts(r: Dict) -> Optional[datetime]:
-        ts_str = r.get('ts') or r.get('created_at') or r.get('timestamp')
-        if not ts_str:
-            return None
-        try:
-            return datetime.fromisoformat(ts_str.replace('Z', '+00:00'))
-        except Exception:
-            return None
-    # Keep only goal-related events
+    table = 'activity_events'
+    ts_cols = existing_columns(sb, table, TS_COLUMNS)
+    type_cols = existing_columns(sb, table, TYPE_COLUMNS)
+    if not type_cols:
+        return []
+    columns = ['member_id'] + type_cols + ts_cols[:1]
+
+    def narrow(q):
+        if ts_cols:
+            q = _time_bounds(q, ts_cols[0], start, end)
+        goal_types = ','.join(GOAL_EVENT_TYPES)
+        return q.or_(','.join(f'{c}.in.({goal_types})' for c in type_cols))
+    rows = _fetch(sb, table, columns, member_ids, narrow)
+    # The event type is the first type column set, so a row can match above on a later one
     def _etype(r: Dict) -> str:
         return (r.get('subtype') or r.get('type') or r.get('event_type') or '').lower()
-    rows = [r for r in rows if _etype(r) in ('goal_set', 'goal_update', 'goal_completed')]
-
-    if start or end:
-        filtered = []
-        for r in rows:
-            tsv = _row_ts(r)
-            if not tsv:
-                continue
-            if start and tsv < start:
-                continue
-            if end and tsv > end:
-                continue
-            filtered.append(r)
-        rows = filtered
-    return rows
+    return [r for r in rows if _etype(r) in GOAL_EVENT_TYPES]
 
 
 def fetch_attendance(sb: Client, member_ids: List[str], start: Optional[datetime], end: Optional[datetime]) -> List[Dict]:
     if not member_ids:
         return []
-    q = sb.schema('peer_progress').table('member_attendance').select('*').in_('member_id', member_ids)
-    rows = (q.execute().data) or []
-    def _row_date(r: Dict) -> Optional[datetime]:
-        # support 'date' (YYYY-MM-DD) or 'call_date' or 'created_at'
-        ds = r.get('date') or r.get('call_date') or r.get('created_at')
-        if not ds:
-            return None
-        try:
-            # Handle pure date
-            if len(ds) == 10:
-                return datetime.fromisoformat(ds + 'T00:00:00+00:00')
-            return datetime.fromisoformat(ds.replace('Z', '+00:00'))
-        except Exception:
-            return None
-    if start or end:
-        filtered = []
-        for r in rows:
-            dv = _row_date(r)
-            if not dv:
-                continue
-            if start and dv < start:
-                continue
-            if end and dv > end:
-                continue
-            filtered.append(r)
-        rows = filtered
-    return rows
+    table = 'member_attendance'
+    date_cols = existing_columns(sb, table, ATTENDANCE_DATE_COLUMNS)
+    columns = ['member_id'] + date_cols[:1] + existing_columns(sb, table, ['status', 'attendance_status', 'reason'])
+
+    def narrow(q):
+        return _time_bounds(q, date_cols[0], start, end) if date_cols else q
+    return _fetch(sb, table, columns, member_ids, narrow)
 
 
 # ------------- Risk evaluation -----------------
@@ -182,6 +217,43 @@ class MemberAggregate:
     consecutive_unexcused_misses: int = 0
 
 
+def _codes(positions: Dict, values: Iterable) -> np.ndarray:
+    """positions[value] for each value, -1 where it has none."""
+    return np.fromiter((positions.get(v, -1) for v in values), dtype=np.int64)
+
+
+def _attendance_misses(attendance: List[Dict], positions: Dict[str, int]) -> Tuple[np.ndarray, np.ndarray]:
+    """Per member position: unexcused misses, and the longest run of them in date order."""
+    n = len(positions)
+    missed = np.zeros(n, dtype=np.int64)
+    longest = np.zeros(n, dtype=np.int64)
+    member = _codes(positions, (r.get('member_id') or r.get('member') for r in attendance))
+    day, _ = pd.factorize(pd.Index([r.get('date') or r.get('call_date') or r.get('created_at') or '' for r in attendance],
+                                   dtype=object), sort=True)
+    miss = np.fromiter(((r.get('status') or r.get('attendance_status')) == 'absent' and not r.get('reason')
+                        for r in attendance), dtype=bool, count=len(attendance))
+    keep = member >= 0
+    member, day, miss = member[keep], day[keep], miss[keep]
+    if not len(member):
+        return missed, longest
+    # lexsort is stable, so same-day rows keep their input order
+    order = np.lexsort((day, member))
+    member, miss = member[order], miss[order]
+    first = np.ones(len(member), dtype=bool)
+    first[1:] = member[1:] != member[:-1]
+    after_miss = np.zeros(len(miss), dtype=bool)
+    after_miss[1:] = miss[:-1]
+    # Run length: misses so far, minus the misses before the current run started
+    seen = np.cumsum(miss)
+    run_start = miss & (first | ~after_miss)
+    base = np.maximum.accumulate(np.where(run_start, seen - 1, 0))
+    streak = (seen - base) * miss
+    starts = np.flatnonzero(first)
+    missed[:] = np.bincount(member, weights=miss, minlength=n)
+    longest[member[starts]] = np.maximum.reduceat(streak, starts)
+    return missed, longest
+
+
 def aggregate_member_metrics(members: List[Dict], activity: List[Dict], goal_events: List[Dict], attendance: List[Dict], group_map: Dict[str, str]) -> Dict[str, MemberAggregate]:
     # Guard: skip rows without id
     id_to_member = { (m.get('member_id') or m.get('id')): m for m in members if (m.get('member_id') or m.get('id')) }
@@ -217,26 +289,14 @@ def aggregate_member_metrics(members: List[Dict], activity: List[Dict], goal_eve
             agg[mid].goals_set_or_updated += 1
         elif et == 'goal_completed':
             agg[mid].goals_completed += 1
-    # Attendance
-    from collections import defaultdict
-    member_days = defaultdict(list)
-    for att in attendance:
-        mid = att.get('member_id') or att.get('member')
-        if not mid:
-            continue
-        member_days[mid].append(att)
-    for mid, days in member_days.items():
-        # sort by date
-        days_sorted = sorted(days, key=lambda d: d['date'])
-        consecutive = 0
-        for d in days_sorted:
-            status_val = d.get('status') or d.get('attendance_status')
-            if status_val == 'absent' and not d.get('reason'):
-                agg[mid].missed_calls_unexcused += 1
-                consecutive += 1
-            else:
-                consecutive = 0
-            agg[mid].consecutive_unexcused_misses = max(agg[mid].consecutive_unexcused_misses, consecutive)
+    # Attendance: one sort over all members' rows and a vectorized run-length pass
+    # instead of sorting and walking each member's list
+    if attendance and agg:
+        keys = list(agg.keys())
+        missed, longest = _attendance_misses(attendance, {mid: i for i, mid in enumerate(keys)})
+        for i in np.flatnonzero(missed).tolist():
+            agg[keys[i]].missed_calls_unexcused = int(missed[i])
+            agg[keys[i]].consecutive_unexcused_misses = int(longest[i])
     return agg
 
 
@@ -1,26 +1,40 @@
 """Unified runner to populate all dashboard data in one go.
 
-Runs, in order:
+For every transcript, runs:
 1) Goal extractor → quantifiable_goals + transcript_sessions
 2) Marketing extractor → transcript_analysis.marketing_activities_json + pipeline_outcomes_json
 3) Stuck extractor → transcript_analysis.stuck_signals_json
 4) Challenges/Strategies extractor → transcript_analysis.challenges_strategies_json
 
+Transcripts are crawled once across all folders and dispatched by priority:
+newest session dates first, with sessions open on the dashboard and requested
+re-runs jumping the queue (see transcript_priority.py).
+
 Usage examples:
   python run_all_extractors.py --folder_key october_2025
   python run_all_extractors.py --folder_url https://drive.google.com/drive/folders/XXX --recursive --days_back 30
   python run_all_extractors.py --multiple_folders october_2025 folder_1 folder_2
+  python run_all_extractors.py --folder_key october_2025 --since 2025-10-01 --force
+
+Files already handled with the current prompt (per the processing ledger) are
+skipped unless --force is given or a re-run was requested for them.
 """
 
 import os
+import time
 import argparse
 from dotenv import load_dotenv
+from supabase import create_client
+
+from main import TranscriptProcessor
+from goal_extractor import _resolve_folders, _collect_transcript_files
+from extractor_registry import DEFAULT_TASKS, TASKS, run_task
+from processing_ledger import ProcessingLedger
+from transcript_priority import PriorityScheduler, fetch_demand, clear_demand
+from write_buffer import WRITERS, use_writer
+
 
-# Import extractors
-from goal_extractor import extract_goals_for_all_transcripts
-from marketing_extractor import extract_marketing
-from stuck_extractor import extract_stuck
-from challenges_extractor import extract_challenges
+ORGANIZATION_ID = 'f58a2d22-4e96-4d4a-9348-b82c8e3f1f2e'
 
 
 def main() -> None:
@@ -32,65 +46,62 @@ def main() -> None:
     parser.add_argument('--multiple_folders', nargs='*', help='Multiple folder keys or URLs')
     parser.add_argument('--days_back', type=int, default=None, help='Only process files modified within N days')
     parser.add_argument('--recursive', action='store_true', help='Search subfolders recursively')
+    parser.add_argument('--force', action='store_true', help='Ignore the processing ledger and re-run every file')
+    parser.add_argument('--since', type=str, default=None, help='Only process files modified on/after this date (YYYY-MM-DD)')
+    parser.add_argument('--tasks', nargs='*', choices=list(TASKS.keys()), default=None, help='Extractors to run (default: goals marketing stuck challenges)')
+    parser.add_argument('--starvation_every', type=int, default=5, help='Every Nth transcript is the oldest pending one')
+    parser.add_argument('--demand_refresh_seconds', type=int, default=60, help='How often to re-check dashboard/re-run requests')
+    parser.add_argument('--writer', choices=WRITERS, default=os.getenv('DB_WRITER', 'postgrest'), help='postgrest (default) or copy (direct Postgres via DATABASE_URL, for backfills)')
     args = parser.parse_args()
-
-    folder_key = args.folder_key
-    folder_url = args.folder_url
-    multiple_folders = args.multiple_folders
-    days_back = args.days_back
-    recursive = bool(args.recursive)
-
-    print('\n=== 1) Goals Extraction ===')
-    try:
-        extract_goals_for_all_transcripts(
-            folder_key=folder_key,
-            folder_url=folder_url,
-            multiple_folders=multiple_folders,
-            days_back=days_back,
-            recursive=recursive,
-        )
-    except Exception as e:
-        print(f'⚠️ Goals extraction error: {e}')
-
-    print('\n=== 2) Marketing Activity & Pipeline Outcomes ===')
-    try:
-        # marketing_extractor accepts folder_url; if multiple folders/keys provided, prefer folder_url env
-        target_folder = folder_url or os.getenv('GOOGLE_DRIVE_FOLDER_URL')
-        extract_marketing(
-            folder_url=target_folder,
-            days_back=days_back,
-            recursive=recursive,
-        )
-    except Exception as e:
-        print(f'⚠️ Marketing extraction error: {e}')
-
-    print('\n=== 3) Stuck / Support Needed ===')
-    try:
-        # Prefer folder_url; extract_stuck signature uses folder_url
-        target_folder = folder_url or os.getenv('GOOGLE_DRIVE_FOLDER_URL')
-        extract_stuck(
-            folder_url=target_folder,
-            days_back=days_back,
-            recursive=recursive,
-        )
-    except Exception as e:
-        print(f'⚠️ Stuck extraction error: {e}')
-
-    print('\n=== 4) Challenges & Strategies ===')
-    try:
-        target_folder = folder_url or os.getenv('GOOGLE_DRIVE_FOLDER_URL')
-        extract_challenges(
-            folder_url=target_folder,
-            days_back=days_back,
-            recursive=recursive,
-        )
-    except Exception as e:
-        print(f'⚠️ Challenges extraction error: {e}')
-
+    use_writer(args.writer)
+
+    tasks = args.tasks or DEFAULT_TASKS
+    force = bool(args.force)
+    processor = TranscriptProcessor(organization_id=ORGANIZATION_ID)
+    sb = create_client(os.getenv('SUPABASE_URL'), os.getenv('SUPABASE_SERVICE_KEY'))
+
+    folders = _resolve_folders(args.folder_url or os.getenv('GOOGLE_DRIVE_FOLDER_URL'), args.folder_key, args.multiple_folders)
+    files = _collect_transcript_files(processor, folders, args.days_back, bool(args.recursive), args.since)
+    print(f'\n📊 Total unique transcripts: {len(files)}\n')
+
+    demand = fetch_demand(sb, ORGANIZATION_ID)
+    scheduler = PriorityScheduler(starvation_every=args.starvation_every)
+    for f in files:
+        scheduler.push(f, demand.boost_for(f))
+    ledger = ProcessingLedger(sb, ORGANIZATION_ID).load(tasks)
+
+    # Each snapshot only counts files dispatched after it was loaded, so a request made
+    # after its file already ran is kept for the next run
+    snapshots = [demand]
+    unfinished = []
+    last_refresh = time.monotonic()
+    done = 0
+    while len(scheduler):
+        if time.monotonic() - last_refresh > args.demand_refresh_seconds:
+            demand = fetch_demand(sb, ORGANIZATION_ID)
+            scheduler.reprioritize(demand)
+            snapshots.append(demand)
+            last_refresh = time.monotonic()
+
+        f = scheduler.pop()
+        done += 1
+        print(f"\n[{done}/{len(files)}] {f['name']}")
+        ok = True
+        for task in tasks:
+            try:
+                run_task(task, processor, sb, f, ORGANIZATION_ID, ledger, force=force or demand.is_rerun(f))
+            except Exception as e:
+                ok = False
+                print(f'  ⚠️ {task} extraction error: {e}')
+        for d in snapshots:
+            d.record(f, ok)
+        if not ok:
+            unfinished.append(f)
+
+    for d in snapshots:
+        clear_demand(sb, d, unfinished)
     print('\n✅ Completed all extractors.')
 
 
 if __name__ == '__main__':
     main()
-
-
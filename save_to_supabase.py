@@ -352,9 +352,9 @@ def save_to_supabase(groups: List[Dict], organization_id: str):
         filename = f"{group_name} - {session_date_str or 'Unknown'}"
         
         # Check if session already exists
-        existing_session = supabase.schema('peer_progress').table('transcript_sessions').select('*').eq(
+        existing_session = supabase.schema('peer_progress').table('transcript_sessions').select('id').eq(
             'filename', filename
-        ).eq('group_name', group_name).execute()
+        ).eq('group_name', group_name).limit(1).execute()
         
         if existing_session.data:
             session_id = existing_session.data[0]['id']
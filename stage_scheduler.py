@@ -0,0 +1,151 @@
+"""
+Dependency-graph scheduler for per-transcript processing stages.
+
+Each Stage declares the context keys it reads (inputs) and writes (outputs).
+run_stages starts every stage whose inputs are available, so independent
+stages run concurrently and the wall time approaches the critical path.
+"""
+
+import time
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+
+@dataclass
+class Stage:
+    name: str
+    fn: Callable[..., Any]
+    inputs: List[str] = field(default_factory=list)
+    outputs: List[str] = field(default_factory=list)
+    # When False, an exception is logged and the stage's outputs are set to None
+    # instead of aborting the run
+    required: bool = True
+
+
+@dataclass
+class StageTiming:
+    name: str
+    started: float
+    finished: float
+    ok: bool
+    error: Optional[str] = None
+
+    @property
+    def elapsed(self) -> float:
+        return self.finished - self.started
+
+
+def _validate(stages: List[Stage], initial_keys: List[str]) -> None:
+    producers: Dict[str, str] = {}
+    for st in stages:
+        for out in st.outputs:
+            if out in producers:
+                raise ValueError(f"Output '{out}' produced by both {producers[out]} and {st.name}")
+            producers[out] = st.name
+    available = set(initial_keys) | set(producers)
+    for st in stages:
+        missing = [i for i in st.inputs if i not in available]
+        if missing:
+            raise ValueError(f"Stage {st.name} has unsatisfiable inputs: {missing}")
+
+
+def _assign_outputs(stage: Stage, result: Any, context: Dict[str, Any]) -> None:
+    if not stage.outputs:
+        return
+    if len(stage.outputs) == 1:
+        context[stage.outputs[0]] = result
+        return
+    values = result if isinstance(result, (tuple, list)) else [None] * len(stage.outputs)
+    for key, value in zip(stage.outputs, values):
+        context[key] = value
+
+
+def critical_path(stages: List[Stage], timings: Dict[str, StageTiming]) -> Tuple[float, List[str]]:
+    """Longest dependency chain by measured stage time: (seconds, [stage names])."""
+    producer = {out: st for st in stages for out in st.outputs}
+    memo: Dict[str, Tuple[float, List[str]]] = {}
+
+    def _longest(st: Stage) -> Tuple[float, List[str]]:
+        if st.name in memo:
+            return memo[st.name]
+        best: Tuple[float, List[str]] = (0.0, [])
+        for inp in st.inputs:
+            dep = producer.get(inp)
+            if dep:
+                cand = _longest(dep)
+                if cand[0] > best[0]:
+                    best = cand
+        own = timings[st.name].elapsed if st.name in timings else 0.0
+        memo[st.name] = (best[0] + own, best[1] + [st.name])
+        return memo[st.name]
+
+    result: Tuple[float, List[str]] = (0.0, [])
+    for st in stages:
+        cand = _longest(st)
+        if cand[0] > result[0]:
+            result = cand
+    return result
+
+
+def run_stages(stages: List[Stage], context: Dict[str, Any], max_workers: int = 8) -> Dict[str, StageTiming]:
+    """Run stages as soon as their inputs are in context. Mutates and fills context.
+
+    A failing required stage stops new stages from starting; in-flight stages are
+    allowed to finish and the original exception is re-raised.
+    """
+    _validate(stages, list(context.keys()))
+    pending = list(stages)
+    timings: Dict[str, StageTiming] = {}
+    failure: Optional[BaseException] = None
+
+    def _run(stage: Stage):
+        args = [context[i] for i in stage.inputs]
+        started = time.perf_counter()
+        try:
+            return stage.fn(*args), started, None
+        except Exception as e:
+            return None, started, e
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        running = {}
+        while pending or running:
+            if failure is None:
+                ready = [st for st in pending if all(i in context for i in st.inputs)]
+                for st in ready:
+                    pending.remove(st)
+                    running[executor.submit(_run, st)] = st
+            if not running:
+                break
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for fut in done:
+                st = running.pop(fut)
+                result, started, error = fut.result()
+                timings[st.name] = StageTiming(st.name, started, time.perf_counter(), error is None,
+                                               str(error) if error else None)
+                if error is None:
+                    _assign_outputs(st, result, context)
+                elif st.required:
+                    print(f"⚠️ Stage {st.name} failed: {error}")
+                    failure = failure or error
+                else:
+                    print(f"⚠️ Stage {st.name} failed (continuing): {error}")
+                    for out in st.outputs:
+                        context[out] = None
+
+    if failure is not None:
+        raise failure
+    return timings
+
+
+def format_timings(stages: List[Stage], timings: Dict[str, StageTiming]) -> str:
+    if not timings:
+        return ''
+    t0 = min(t.started for t in timings.values())
+    wall = max(t.finished for t in timings.values()) - t0
+    cp_time, cp_names = critical_path(stages, timings)
+    lines = [f"⏱️ Stages: wall {wall:.1f}s, critical path {cp_time:.1f}s ({' → '.join(cp_names)})"]
+    for t in sorted(timings.values(), key=lambda t: t.started):
+        status = '' if t.ok else ' ✗'
+        lines.append(f"   {t.name:<22} +{t.started - t0:6.1f}s  {t.elapsed:6.1f}s{status}")
+    return '\n'.join(lines)
@@ -0,0 +1,411 @@
+"""Streaming extraction pipeline with bounded queues between stages.
+
+  crawl -> download -> llm -> parse -> write
+
+Each stage has its own worker pool and reads from a bounded queue, so a slow
+stage applies backpressure upstream instead of letting work pile up in memory,
+and downloads, LLM calls and writes for different transcripts overlap. The
+writer batches transcript_analysis columns and processing ledger entries into
+bulk writes.
+
+Every stage reports utilization (busy time / wall time / workers), how long it
+waited for input (starved) and how long it was blocked on a full output queue
+(backpressure). The most utilized stage is the bottleneck; give it more workers.
+
+Usage examples:
+  python streaming_pipeline.py --folder_key october_2025 --llm_workers 8
+  python streaming_pipeline.py --multiple_folders folder_1 folder_2 --download_workers 4 --batch_size 50
+  python streaming_pipeline.py --folder_key october_2025 --tasks stuck challenges --report_seconds 10
+"""
+
+import os
+import time
+import queue
+import argparse
+import threading
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional
+
+from dotenv import load_dotenv
+from supabase import create_client, Client
+
+from main import TranscriptProcessor
+from goal_extractor import _resolve_folders, _collect_transcript_files
+from extractor_registry import DEFAULT_TASKS, TASKS, ExtractorTask
+from llm_archive import archive_responses
+from processing_ledger import ProcessingLedger
+from analysis_writer import upsert_analysis_many
+from write_buffer import WRITERS, flush_all, take_dead_lettered, tagged, use_writer
+
+
+ORGANIZATION_ID = 'f58a2d22-4e96-4d4a-9348-b82c8e3f1f2e'
+
+_DONE = object()
+
+
+@dataclass
+class WorkItem:
+    """One (file, task) pair travelling through the pipeline."""
+    f: Dict
+    task: ExtractorTask
+    started: float
+    session: Dict = field(default_factory=dict)
+    content: Optional[str] = None
+    raw: Optional[Dict[str, str]] = None
+    parsed: Any = None
+
+
+class StageMetrics:
+    def __init__(self, name: str, workers: int):
+        self.name = name
+        self.workers = workers
+        self.items_in = 0
+        self.items_out = 0
+        self.errors = 0
+        self.busy = 0.0
+        self.starved = 0.0
+        self.blocked = 0.0
+        self.started = time.perf_counter()
+        self.finished: Optional[float] = None
+        self._lock = threading.Lock()
+
+    def add(self, **deltas) -> None:
+        with self._lock:
+            for k, v in deltas.items():
+                setattr(self, k, getattr(self, k) + v)
+
+    @property
+    def utilization(self) -> float:
+        wall = (self.finished or time.perf_counter()) - self.started
+        return self.busy / (wall * self.workers) if wall > 0 else 0.0
+
+    def summary(self) -> str:
+        avg_ms = self.busy / self.items_in * 1000 if self.items_in else 0.0
+        return (f'{self.name:>9} x{self.workers:<3} in {self.items_in:>6}  out {self.items_out:>6}  err {self.errors:>4}  '
+                f'util {self.utilization:6.1%}  avg {avg_ms:8.1f}ms  starved {self.starved:7.1f}s  blocked {self.blocked:7.1f}s')
+
+
+class StreamingPipeline:
+    def __init__(self, processor: TranscriptProcessor, sb: Client, organization_id: str,
+                 tasks: List[str], ledger: Optional[ProcessingLedger] = None, force: bool = False,
+                 crawl_workers: int = 1, download_workers: int = 4, llm_workers: int = 8,
+                 parse_workers: int = 2, write_workers: int = 1, queue_size: int = 32,
+                 batch_size: int = 25, flush_seconds: float = 5.0):
+        self.processor = processor
+        self.sb = sb
+        self.organization_id = organization_id
+        self.tasks = [TASKS[t] for t in tasks]
+        self.ledger = ledger
+        self.force = force
+        self.batch_size = batch_size
+        self.flush_seconds = flush_seconds
+        self.workers = {'crawl': crawl_workers, 'download': download_workers, 'llm': llm_workers,
+                        'parse': parse_workers, 'write': write_workers}
+        self.queues = {name: queue.Queue(maxsize=queue_size) for name in self.workers}
+        self.metrics = {name: StageMetrics(name, max(1, n)) for name, n in self.workers.items()}
+        self._seen: set = set()
+        self._seen_lock = threading.Lock()
+        self.completed = 0
+        self.failed = 0
+        self._count_lock = threading.Lock()
+
+    # ---- stage functions: item -> list of outputs for the next stage ----
+
+    def _crawl(self, folder: Dict) -> List[Dict]:
+        files = _collect_transcript_files(self.processor, [folder['url']], folder['days_back'],
+                                          folder['recursive'], folder['since'])
+        out = []
+        for f in files:
+            with self._seen_lock:
+                if f['id'] in self._seen:
+                    continue
+                self._seen.add(f['id'])
+            pending = [t for t in self.tasks
+                       if self.force or not self.ledger or not self.ledger.is_done(f, t.name, t.prompt_version)]
+            if pending:
+                out.append({'f': f, 'tasks': pending})
+        return out
+
+    def _download(self, job: Dict) -> List[WorkItem]:
+        f, pending = job['f'], job['tasks']
+        started = time.time()
+        content = self.processor.download_and_read_file(f['id'], f['name'], f['mimeType'])
+        if not content.strip():
+            if self.ledger:
+                self.ledger.record_many([(f, t.name, t.prompt_version, 'skipped', started) for t in pending])
+            return []
+
+        mod = f.get('modifiedTime') or ''
+        try:
+            session_date = datetime.fromisoformat(mod.replace('Z', '+00:00')).date().isoformat()
+        except Exception:
+            session_date = None
+        session = {'session_date': session_date}
+        # One session lookup per file rather than one per task
+        if any(t.analysis_payload for t in pending):
+            session_rec = self.processor.create_transcript_session(filename=f['name'], group_name=f['name'],
+                                                                   session_date=session_date, raw_transcript=None)
+            if not session_rec:
+                items = [WorkItem(f, t, started) for t in pending]
+                for item in items:
+                    self._fail(item, Exception('could not create/find session'))
+                return []
+            session['id'] = session_rec['id']
+        return [WorkItem(f, t, started, session=session, content=content) for t in pending]
+
+    def _call_llm(self, item: WorkItem) -> List[WorkItem]:
+        item.raw = item.task.call_llm(item.content)
+        item.content = None
+        return [item]
+
+    def _parse(self, item: WorkItem) -> List[WorkItem]:
+        meta = {'filename': item.f['name'], 'session_date': item.session.get('session_date'),
+                'organization_id': self.organization_id}
+        if item.session.get('id'):
+            meta['session_id'] = item.session['id']
+        archive_responses(item.raw, item.task.archive_versions, item.f['id'], meta)
+        item.parsed = item.task.parse(item.raw)
+        item.raw = None
+        return [item]
+
+    def _write_batch(self, batch: List[WorkItem]) -> None:
+        """Bulk-write analysis columns, run row writes, then record the batch in the ledger."""
+        outcomes = {id(item): None for item in batch}
+
+        analysis_rows: Dict[str, Dict] = {}
+        for item in batch:
+            if item.task.analysis_payload:
+                analysis_rows.setdefault(item.session['id'], {}).update(item.task.analysis_payload(item.parsed))
+        if analysis_rows:
+            # Bulk upsert needs uniform keys per request, so group sessions by column set
+            by_columns: Dict[tuple, Dict[str, Dict]] = {}
+            for session_id, payload in analysis_rows.items():
+                by_columns.setdefault(tuple(sorted(payload.keys())), {})[session_id] = payload
+            for group in by_columns.values():
+                try:
+                    upsert_analysis_many(self.sb, self.organization_id, group)
+                except Exception as e:
+                    for item in batch:
+                        if item.task.analysis_payload and item.session['id'] in group:
+                            outcomes[id(item)] = e
+
+        saved = []
+        for item in batch:
+            error = outcomes[id(item)]
+            count = 0
+            tag = object()
+            if error is None:
+                try:
+                    with tagged(tag):
+                        if item.task.save_rows:
+                            count = item.task.save_rows(self.processor, self.sb, item.f, self.organization_id,
+                                                        item.session, item.parsed) or 0
+                        else:
+                            count = len(item.parsed or [])
+                except Exception as e:
+                    error = e
+            saved.append((item, tag, count, error))
+        # Buffered event rows must be written before the ledger marks their files done,
+        # and a file whose rows were dead-lettered is not done
+        flush_all()
+        entries = []
+        for item, tag, count, error in saved:
+            dropped = take_dead_lettered(tag)
+            if error is None and dropped:
+                error = RuntimeError(f'{dropped} buffered rows were dead-lettered')
+            if error is None:
+                entries.append((item.f, item.task.name, item.task.prompt_version, 'completed', item.started, count))
+                print(f"  ✓ {item.task.name}: {item.f['name']} ({count})")
+            else:
+                entries.append((item.f, item.task.name, item.task.prompt_version, 'failed', item.started, 0, str(error)))
+                print(f"  ✗ {item.task.name}: {item.f['name']}: {error}")
+        if self.ledger:
+            self.ledger.record_many(entries)
+        done = sum(1 for e in entries if e[3] == 'completed')
+        with self._count_lock:
+            self.completed += done
+            self.failed += len(entries) - done
+
+    def _fail(self, item: Any, error: Exception) -> None:
+        items = item if isinstance(item, list) else [item]
+        for it in items:
+            if isinstance(it, WorkItem):
+                print(f"  ✗ {it.task.name}: {it.f['name']}: {error}")
+                if self.ledger:
+                    self.ledger.record(it.f, it.task.name, it.task.prompt_version, 'failed', it.started, error=str(error))
+                with self._count_lock:
+                    self.failed += 1
+            elif isinstance(it, dict) and 'f' in it:
+                print(f"  ✗ {it['f']['name']}: {error}")
+                if self.ledger:
+                    self.ledger.record_many([(it['f'], t.name, t.prompt_version, 'failed', time.time(), 0, str(error))
+                                             for t in it['tasks']])
+                with self._count_lock:
+                    self.failed += len(it['tasks'])
+            else:
+                print(f'  ✗ {error}')
+
+    # ---- plumbing ----
+
+    def _start_stage(self, name: str, fn: Callable[[Any], List[Any]], downstream: Optional[str]) -> List[threading.Thread]:
+        inq = self.queues[name]
+        outq = self.queues[downstream] if downstream else None
+        m = self.metrics[name]
+        remaining = [m.workers]
+        lock = threading.Lock()
+
+        def worker():
+            while True:
+                t0 = time.perf_counter()
+                item = inq.get()
+                t1 = time.perf_counter()
+                m.add(starved=t1 - t0)
+                if item is _DONE:
+                    break
+                try:
+                    outputs = fn(item)
+                except Exception as e:
+                    self._fail(item, e)
+                    outputs = []
+                    m.add(errors=1)
+                t2 = time.perf_counter()
+                m.add(items_in=1, busy=t2 - t1)
+                for out in outputs:
+                    outq.put(out)
+                m.add(items_out=len(outputs), blocked=time.perf_counter() - t2)
+            with lock:
+                remaining[0] -= 1
+                last = remaining[0] == 0
+            if last:
+                m.finished = time.perf_counter()
+                if outq is not None:
+                    for _ in range(self.metrics[downstream].workers):
+                        outq.put(_DONE)
+
+        return [threading.Thread(target=worker, name=f'{name}-{i}', daemon=True) for i in range(m.workers)]
+
+    def _start_writer(self) -> List[threading.Thread]:
+        inq = self.queues['write']
+        m = self.metrics['write']
+        remaining = [m.workers]
+        lock = threading.Lock()
+
+        def flush(batch: List[WorkItem]) -> None:
+            t0 = time.perf_counter()
+            try:
+                self._write_batch(batch)
+            except Exception as e:
+                self._fail(batch, e)
+                m.add(errors=1)
+            m.add(items_in=len(batch), items_out=len(batch), busy=time.perf_counter() - t0)
+
+        def worker():
+            batch: List[WorkItem] = []
+            deadline = None
+            while True:
+                timeout = None if deadline is None else max(0.0, deadline - time.monotonic())
+                t0 = time.perf_counter()
+                try:
+                    item = inq.get(timeout=timeout)
+                except queue.Empty:
+                    item = None
+                m.add(starved=time.perf_counter() - t0)
+                if item is _DONE:
+                    break
+                if item is not None:
+                    batch.append(item)
+                    deadline = deadline or time.monotonic() + self.flush_seconds
+                if batch and (len(batch) >= self.batch_size or time.monotonic() >= deadline):
+                    flush(batch)
+                    batch, deadline = [], None
+            if batch:
+                flush(batch)
+            with lock:
+                remaining[0] -= 1
+                if remaining[0] == 0:
+                    m.finished = time.perf_counter()
+
+        return [threading.Thread(target=worker, name=f'write-{i}', daemon=True) for i in range(m.workers)]
+
+    def report(self) -> str:
+        depth = '  '.join(f'{name}:{q.qsize()}' for name, q in self.queues.items())
+        return '\n'.join([m.summary() for m in self.metrics.values()] + [f'   queues  {depth}'])
+
+    def run(self, folders: List[str], days_back: Optional[int] = None, recursive: bool = True,
+            since: Optional[str] = None, report_seconds: float = 30.0) -> Dict[str, StageMetrics]:
+        threads = (self._start_stage('crawl', self._crawl, 'download')
+                   + self._start_stage('download', self._download, 'llm')
+                   + self._start_stage('llm', self._call_llm, 'parse')
+                   + self._start_stage('parse', self._parse, 'write')
+                   + self._start_writer())
+        for t in threads:
+            t.start()
+
+        def feed():
+            for url in folders:
+                self.queues['crawl'].put({'url': url, 'days_back': days_back, 'recursive': recursive, 'since': since})
+            for _ in range(self.metrics['crawl'].workers):
+                self.queues['crawl'].put(_DONE)
+        threading.Thread(target=feed, name='feed', daemon=True).start()
+
+        last_report = time.monotonic()
+        while any(t.is_alive() for t in threads):
+            for t in threads:
+                t.join(timeout=1.0)
+                if report_seconds and time.monotonic() - last_report >= report_seconds:
+                    print(f'\n📈 Pipeline status ({self.completed} done, {self.failed} failed)\n{self.report()}\n')
+                    last_report = time.monotonic()
+        return self.metrics
+
+
+def main() -> None:
+    load_dotenv()
+
+    parser = argparse.ArgumentParser(description='Run the extractors as a streaming pipeline with bounded queues')
+    parser.add_argument('--folder_key', type=str, help='Key into predefined FOLDER_URLS')
+    parser.add_argument('--folder_url', type=str, help='Direct Google Drive folder URL')
+    parser.add_argument('--multiple_folders', nargs='*', help='Multiple folder keys or URLs')
+    parser.add_argument('--days_back', type=int, default=None, help='Only process files modified within N days')
+    parser.add_argument('--no_recursive', action='store_true', help='Do not search subfolders')
+    parser.add_argument('--since', type=str, default=None, help='Only process files modified on/after this date (YYYY-MM-DD)')
+    parser.add_argument('--force', action='store_true', help='Ignore the processing ledger and re-run every file')
+    parser.add_argument('--tasks', nargs='*', choices=list(TASKS.keys()), default=None, help='Extractors to run (default: goals marketing stuck challenges)')
+    parser.add_argument('--organization_id', type=str, default=ORGANIZATION_ID)
+    parser.add_argument('--crawl_workers', type=int, default=1)
+    parser.add_argument('--download_workers', type=int, default=4)
+    parser.add_argument('--llm_workers', type=int, default=8)
+    parser.add_argument('--parse_workers', type=int, default=2)
+    parser.add_argument('--write_workers', type=int, default=1)
+    parser.add_argument('--queue_size', type=int, default=32, help='Capacity of each inter-stage queue')
+    parser.add_argument('--batch_size', type=int, default=25, help='Writer flushes after this many results')
+    parser.add_argument('--flush_seconds', type=float, default=5.0, help='...or after this long')
+    parser.add_argument('--report_seconds', type=float, default=30.0, help='How often to print stage metrics (0 = only at the end)')
+    parser.add_argument('--writer', choices=WRITERS, default=os.getenv('DB_WRITER', 'postgrest'), help='postgrest (default) or copy (direct Postgres via DATABASE_URL, for backfills)')
+    args = parser.parse_args()
+    use_writer(args.writer)
+
+    tasks = args.tasks or DEFAULT_TASKS
+    processor = TranscriptProcessor(organization_id=args.organization_id)
+    sb = create_client(os.getenv('SUPABASE_URL'), os.getenv('SUPABASE_SERVICE_KEY'))
+    ledger = ProcessingLedger(sb, args.organization_id).load(tasks)
+    folders = _resolve_folders(args.folder_url or os.getenv('GOOGLE_DRIVE_FOLDER_URL'), args.folder_key, args.multiple_folders)
+
+    pipeline = StreamingPipeline(
+        processor, sb, args.organization_id, tasks, ledger, force=bool(args.force),
+        crawl_workers=args.crawl_workers, download_workers=args.download_workers, llm_workers=args.llm_workers,
+        parse_workers=args.parse_workers, write_workers=args.write_workers, queue_size=args.queue_size,
+        batch_size=args.batch_size, flush_seconds=args.flush_seconds,
+    )
+    started = time.perf_counter()
+    metrics = pipeline.run(folders, args.days_back, not args.no_recursive, args.since, args.report_seconds)
+    elapsed = time.perf_counter() - started
+
+    bottleneck = max(metrics.values(), key=lambda m: m.utilization)
+    print(f'\n📈 Stage metrics ({elapsed:.1f}s)\n{pipeline.report()}')
+    print(f'\n🔎 Bottleneck: {bottleneck.name} ({bottleneck.utilization:.0%} utilized)')
+    print(f'\n✅ Completed {pipeline.completed} task runs, {pipeline.failed} failed.')
+
+
+if __name__ == '__main__':
+    main()
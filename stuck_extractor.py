@@ -14,6 +14,9 @@ from supabase import create_client, Client
 from main import TranscriptProcessor
 from goal_extractor import _get_files_recursively
 from ai_llm_fallback import ai_generate_content
+from llm_archive import archive_responses, register_prompt, PROMPT_HASHES
+from processing_ledger import ProcessingLedger, run_with_ledger, filter_since
+from analysis_writer import upsert_analysis
 
 
 load_dotenv()
@@ -22,10 +25,13 @@ load_dotenv()
 def _load_prompt(path: str) -> str:
     p = os.path.join(os.path.dirname(__file__), path)
     with open(p, 'r', encoding='utf-8') as f:
-        return f.read().replace('[Transcript goes here]', '{transcript}')
+        return register_prompt(path, f.read().replace('[Transcript goes here]', '{transcript}'))
 
 
 PROMPT_STUCK = _load_prompt('prompts/stuck_signals.md')
+PROMPT_STUCK_VERSION = PROMPT_HASHES['prompts/stuck_signals.md']
+EXTRACTOR = 'stuck'
+ARCHIVE_VERSIONS = {'stuck': PROMPT_STUCK_VERSION}
 
 
 def _parse_stuck_blocks(text: str) -> List[Dict]:
@@ -70,55 +76,74 @@ def _parse_stuck_blocks(text: str) -> List[Dict]:
     return items
 
 
-def _save_stuck(supabase: Client, session_id: str, org_id: str, stuck_items: List[Dict]) -> None:
-    payload = {
+def _save_stuck(supabase: Client, session_id: str, org_id: str, stuck_items: List[Dict],
+                prompt_hash: str = PROMPT_STUCK_VERSION) -> None:
+    upsert_analysis(supabase, session_id, org_id, {
         'stuck_signals_json': stuck_items,
-        'organization_id': org_id,
-        'processing_status': 'completed',
-    }
-    existing = supabase.schema('peer_progress').table('transcript_analysis').select('id').eq('transcript_session_id', session_id).execute()
-    if existing.data:
-        supabase.schema('peer_progress').table('transcript_analysis').update(payload).eq('id', existing.data[0]['id']).execute()
-    else:
-        payload['transcript_session_id'] = session_id
-        supabase.schema('peer_progress').table('transcript_analysis').insert(payload).execute()
+        'stuck_prompt_hash': prompt_hash,
+    })
+
+
+def call_llm(content: str) -> Dict[str, str]:
+    """Raw LLM responses for one transcript, keyed by archive task."""
+    return {'stuck': ai_generate_content(PROMPT_STUCK.format(transcript=content))}
+
+
+def parse(raw: Dict[str, str]) -> List[Dict]:
+    return _parse_stuck_blocks(raw['stuck'])
+
+
+def analysis_payload(stuck_items: List[Dict]) -> Dict:
+    """transcript_analysis columns written for this task."""
+    return {'stuck_signals_json': stuck_items, 'stuck_prompt_hash': PROMPT_STUCK_VERSION}
+
+
+def process_file(processor: TranscriptProcessor, supabase: Client, f: Dict, organization_id: str, content: str) -> int:
+    """Run stuck-signal extraction for one downloaded transcript. Returns signals saved."""
+    name = f['name']
+    # derive session
+    mod = f.get('modifiedTime') or ''
+    try:
+        session_date = datetime.fromisoformat(mod.replace('Z', '+00:00')).date().isoformat()
+    except Exception:
+        session_date = None
+    session_rec = processor.create_transcript_session(filename=name, group_name=name, session_date=session_date, raw_transcript=None)
+    if not session_rec:
+        raise Exception('could not create/find session')
+
+    raw = call_llm(content)
+    archive_responses(raw, ARCHIVE_VERSIONS, f['id'], {
+        'filename': name, 'session_id': session_rec['id'], 'session_date': session_date, 'organization_id': organization_id,
+    })
+    stuck_items = parse(raw)
+    _save_stuck(supabase, session_rec['id'], organization_id, stuck_items)
+    print(f'  ✓ Saved {len(stuck_items)} stuck signals')
+    return len(stuck_items)
 
 
 def extract_stuck(organization_id: str = 'f58a2d22-4e96-4d4a-9348-b82c8e3f1f2e',
                   folder_url: str | None = None,
                   days_back: int | None = None,
-                  recursive: bool = True) -> None:
+                  recursive: bool = True,
+                  force: bool = False,
+                  since: str | None = None) -> None:
 
     supabase = create_client(os.getenv('SUPABASE_URL'), os.getenv('SUPABASE_SERVICE_KEY'))
     processor = TranscriptProcessor(organization_id=organization_id)
 
     files = _get_files_recursively(processor, folder_url, days_back) if recursive else processor.get_recent_transcripts(folder_url, days_back or 30)
+    files = filter_since(files, since)
     if not files:
         print('No files found')
         return
 
+    ledger = ProcessingLedger(supabase, organization_id).load([EXTRACTOR])
     for f in files:
         name = f['name']
         print(f'Processing: {name}')
         try:
-            content = processor.download_and_read_file(f['id'], name, f['mimeType'])
-            if not content.strip():
-                continue
-            # derive session
-            mod = f.get('modifiedTime') or ''
-            try:
-                session_date = datetime.fromisoformat(mod.replace('Z', '+00:00')).date().isoformat()
-            except Exception:
-                session_date = None
-            session_rec = processor.create_transcript_session(filename=name, group_name=name, session_date=session_date, raw_transcript=None)
-            if not session_rec:
-                print('  ✗ could not create/find session')
-                continue
-
-            stuck_text = ai_generate_content(PROMPT_STUCK.format(transcript=content))
-            stuck_items = _parse_stuck_blocks(stuck_text)
-            _save_stuck(supabase, session_rec['id'], organization_id, stuck_items)
-            print(f'  ✓ Saved {len(stuck_items)} stuck signals')
+            run_with_ledger(ledger, processor, f, EXTRACTOR, PROMPT_STUCK_VERSION,
+                            lambda content: process_file(processor, supabase, f, organization_id, content), force=force)
         except Exception as e:
             print(f'  ✗ Error: {e}')
 
@@ -0,0 +1,180 @@
+"""Priority scheduling of transcripts for the extraction runner.
+
+Newest sessions go first. Sessions someone is looking at on the dashboard and
+explicitly requested re-runs jump the queue; both are read from
+peer_progress.processing_requests (see create_processing_requests.sql). Every
+Nth dispatch takes the oldest remaining session instead, so a large backfill
+keeps moving while fresh work is prioritized.
+"""
+
+import heapq
+import itertools
+from dataclasses import dataclass, field
+from datetime import date, datetime, timezone
+from typing import Dict, List, Optional, Set, Tuple
+
+from supabase import Client
+
+
+BOOST_RERUN = 2
+BOOST_DASHBOARD = 1
+
+
+def session_date_for(f: Dict) -> Optional[str]:
+    """Session date (YYYY-MM-DD) the extractors will assign to this Drive file."""
+    mod = f.get('modifiedTime') or ''
+    try:
+        return datetime.fromisoformat(mod.replace('Z', '+00:00')).date().isoformat()
+    except Exception:
+        return None
+
+
+def _ordinal(session_date: Optional[str]) -> int:
+    try:
+        return date.fromisoformat(session_date).toordinal() if session_date else 0
+    except ValueError:
+        return 0
+
+
+@dataclass
+class Demand:
+    """Pending requests that raise a transcript's priority."""
+    rerun_keys: Set[str] = field(default_factory=set)       # Drive file ids or filenames
+    viewed_dates: Set[str] = field(default_factory=set)     # session dates open on the dashboard
+    requests: Dict[str, Tuple[str, str, Optional[str]]] = field(default_factory=dict)  # request id -> (reason, request_key, requested_at)
+    completed: List[Dict] = field(default_factory=list)     # files dispatched after this snapshot that completed
+
+    def boost_for(self, f: Dict) -> int:
+        if f['id'] in self.rerun_keys or f.get('name') in self.rerun_keys:
+            return BOOST_RERUN
+        if session_date_for(f) in self.viewed_dates:
+            return BOOST_DASHBOARD
+        return 0
+
+    def is_rerun(self, f: Dict) -> bool:
+        return self.boost_for(f) == BOOST_RERUN
+
+    def record(self, f: Dict, ok: bool) -> None:
+        """Note a file that was dispatched after this snapshot was loaded."""
+        if ok:
+            self.completed.append(f)
+
+    def served_request_ids(self, unfinished: List[Dict]) -> List[str]:
+        """Requests whose files all completed after this snapshot was loaded. A request whose file
+        ran before the request was seen, failed anywhere in the run or was left unprocessed stays
+        for the next run."""
+        done_keys = {f['id'] for f in self.completed} | {f.get('name') for f in self.completed}
+        open_keys = {f['id'] for f in unfinished} | {f.get('name') for f in unfinished}
+        done_dates = {session_date_for(f) for f in self.completed}
+        open_dates = {session_date_for(f) for f in unfinished}
+        served = []
+        for request_id, (reason, key, _) in self.requests.items():
+            if reason == 'rerun' and key in done_keys and key not in open_keys:
+                served.append(request_id)
+            elif reason == 'dashboard_view' and key in done_dates and key not in open_dates:
+                served.append(request_id)
+        return served
+
+
+def fetch_demand(sb: Client, organization_id: str) -> Demand:
+    demand = Demand()
+    try:
+        rows = sb.schema('peer_progress').table('processing_requests').select('id, reason, request_key, requested_at').eq(
+            'organization_id', organization_id).execute().data or []
+    except Exception as e:
+        print(f"⚠️ Could not load processing requests: {e}")
+        return demand
+    for r in rows:
+        if r['reason'] == 'rerun':
+            demand.rerun_keys.add(r['request_key'])
+        elif r['reason'] == 'dashboard_view':
+            demand.viewed_dates.add(r['request_key'])
+        demand.requests[r['id']] = (r['reason'], r['request_key'], r.get('requested_at'))
+    return demand
+
+
+def clear_demand(sb: Client, demand: Demand, unfinished: List[Dict]) -> None:
+    """Drop requests that this run has served (see Demand.served_request_ids): unfinished files
+    failed or were never dispatched. A request asked for again since the snapshot (a newer
+    requested_at on the same row) is kept."""
+    request_ids = demand.served_request_ids(unfinished)
+    if not request_ids:
+        return
+    try:
+        for i in range(0, len(request_ids), 50):
+            filters = []
+            for request_id in request_ids[i:i + 50]:
+                requested_at = demand.requests[request_id][2]
+                seen = f'requested_at.lte."{requested_at}"' if requested_at else 'requested_at.is.null'
+                filters.append(f'and(id.eq.{request_id},{seen})')
+            sb.schema('peer_progress').table('processing_requests').delete().or_(','.join(filters)).execute()
+    except Exception as e:
+        print(f"⚠️ Could not clear processing requests: {e}")
+
+
+def _request(sb: Client, organization_id: str, reason: str, request_key: str) -> None:
+    try:
+        sb.schema('peer_progress').table('processing_requests').upsert({
+            'organization_id': organization_id,
+            'reason': reason,
+            'request_key': request_key,
+            'requested_at': datetime.now(timezone.utc).isoformat(),
+        }, on_conflict='organization_id,reason,request_key').execute()
+    except Exception as e:
+        print(f"⚠️ Could not record processing request: {e}")
+
+
+def record_dashboard_view(sb: Client, organization_id: str, session_date: str) -> None:
+    """Called by dashboard pages so the runner processes the viewed session date first."""
+    _request(sb, organization_id, 'dashboard_view', session_date)
+
+
+def request_rerun(sb: Client, organization_id: str, file_key: str) -> None:
+    """Queue an explicit re-run of a Drive file (id or filename); bypasses the processing ledger."""
+    _request(sb, organization_id, 'rerun', file_key)
+
+
+class PriorityScheduler:
+    """Max-priority queue of Drive files with re-prioritization and starvation protection."""
+
+    def __init__(self, starvation_every: int = 5):
+        self.starvation_every = starvation_every
+        self._by_priority: List[Tuple] = []
+        self._by_age: List[Tuple] = []
+        self._current: Dict[str, int] = {}   # file id -> live entry sequence number
+        self._counter = itertools.count()
+        self._dispatched = 0
+
+    def __len__(self) -> int:
+        return len(self._current)
+
+    def push(self, f: Dict, boost: int = 0) -> None:
+        """Add a file, or re-prioritize it if already queued."""
+        seq = next(self._counter)
+        ordinal = _ordinal(session_date_for(f))
+        self._current[f['id']] = seq
+        heapq.heappush(self._by_priority, (-boost, -ordinal, seq, f))
+        heapq.heappush(self._by_age, (ordinal, seq, f))
+
+    def _pop_from(self, heap: List[Tuple], seq_index: int) -> Optional[Dict]:
+        while heap:
+            entry = heapq.heappop(heap)
+            f = entry[-1]
+            if self._current.get(f['id']) == entry[seq_index]:
+                del self._current[f['id']]
+                return f
+        return None
+
+    def pop(self) -> Optional[Dict]:
+        self._dispatched += 1
+        if self.starvation_every and self._dispatched % self.starvation_every == 0:
+            f = self._pop_from(self._by_age, 1)
+            if f:
+                return f
+        return self._pop_from(self._by_priority, 2)
+
+    def reprioritize(self, demand: Demand) -> None:
+        for f in [e[-1] for e in self._by_priority if self._current.get(e[-1]['id']) == e[2]]:
+            boost = demand.boost_for(f)
+            if boost:
+                self.push(f, boost)
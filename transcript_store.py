@@ -0,0 +1,196 @@
+"""
+Compressed, content-addressed storage for transcript bodies.
+
+Transcript text used to live in transcript_sessions.raw_transcript, so every
+select('*') on that table pulled whole transcripts over the wire. Bodies are
+now gzip'd and stored once per sha256 content hash; the session row keeps only
+transcript_hash, and the text is fetched when something actually reads it.
+
+Backends (TRANSCRIPT_STORE):
+  supabase  peer_progress.transcript_blobs (default; see create_transcript_blobs.sql)
+  local     files under TRANSCRIPT_STORE_DIR (default ./transcript_store)
+  s3        any S3-compatible bucket: TRANSCRIPT_S3_BUCKET, optional
+            TRANSCRIPT_S3_PREFIX and S3_ENDPOINT_URL (needs boto3)
+
+Move existing raw_transcript values into the store:
+  python transcript_store.py --migrate
+"""
+
+import os
+import gzip
+import base64
+import hashlib
+import argparse
+import threading
+from typing import Dict, Optional
+
+from dotenv import load_dotenv
+from supabase import create_client, Client
+
+
+def content_hash(text: str) -> str:
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+
+def _compress(text: str) -> bytes:
+    return gzip.compress(text.encode('utf-8'), compresslevel=6)
+
+
+def _decompress(blob: bytes) -> str:
+    return gzip.decompress(blob).decode('utf-8')
+
+
+class SupabaseBlobStore:
+    def __init__(self, sb: Client):
+        self.sb = sb
+
+    def _table(self):
+        return self.sb.schema('peer_progress').table('transcript_blobs')
+
+    def put(self, key: str, blob: bytes, size_bytes: int) -> None:
+        # Same hash means same content, so an existing row is left alone
+        self._table().upsert({
+            'content_hash': key,
+            'body_gzip_b64': base64.b64encode(blob).decode('ascii'),
+            'size_bytes': size_bytes,
+            'compressed_bytes': len(blob),
+        }, on_conflict='content_hash', ignore_duplicates=True).execute()
+
+    def get(self, key: str) -> Optional[bytes]:
+        res = self._table().select('body_gzip_b64').eq('content_hash', key).limit(1).execute()
+        return base64.b64decode(res.data[0]['body_gzip_b64']) if res.data else None
+
+
+class LocalBlobStore:
+    def __init__(self, root: Optional[str] = None):
+        self.root = root or os.getenv('TRANSCRIPT_STORE_DIR') or os.path.join(
+            os.path.dirname(os.path.abspath(__file__)), 'transcript_store')
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.root, key[:2], f'{key}.txt.gz')
+
+    def put(self, key: str, blob: bytes, size_bytes: int) -> None:
+        path = self._path(key)
+        if os.path.exists(path):
+            return
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+        with open(tmp, 'wb') as fh:
+            fh.write(blob)
+        os.replace(tmp, path)
+
+    def get(self, key: str) -> Optional[bytes]:
+        try:
+            with open(self._path(key), 'rb') as fh:
+                return fh.read()
+        except FileNotFoundError:
+            return None
+
+
+class S3BlobStore:
+    def __init__(self, bucket: Optional[str] = None, prefix: Optional[str] = None):
+        try:
+            import boto3
+        except ImportError as e:
+            raise RuntimeError('TRANSCRIPT_STORE=s3 needs boto3: pip install boto3') from e
+        self.bucket = bucket or os.getenv('TRANSCRIPT_S3_BUCKET')
+        if not self.bucket:
+            raise RuntimeError('TRANSCRIPT_S3_BUCKET is not set')
+        self.prefix = prefix if prefix is not None else os.getenv('TRANSCRIPT_S3_PREFIX', 'transcripts/')
+        self.client = boto3.client('s3', endpoint_url=os.getenv('S3_ENDPOINT_URL') or None)
+
+    def put(self, key: str, blob: bytes, size_bytes: int) -> None:
+        self.client.put_object(Bucket=self.bucket, Key=f'{self.prefix}{key}.txt.gz', Body=blob,
+                               ContentType='text/plain', ContentEncoding='gzip',
+                               Metadata={'size-bytes': str(size_bytes)})
+
+    def get(self, key: str) -> Optional[bytes]:
+        try:
+            obj = self.client.get_object(Bucket=self.bucket, Key=f'{self.prefix}{key}.txt.gz')
+        except self.client.exceptions.NoSuchKey:
+            return None
+        return obj['Body'].read()
+
+
+class TranscriptStore:
+    def __init__(self, backend):
+        self.backend = backend
+
+    def put(self, text: str) -> str:
+        """Store a transcript body and return its content hash."""
+        key = content_hash(text)
+        self.backend.put(key, _compress(text), len(text.encode('utf-8')))
+        return key
+
+    def get(self, key: str) -> Optional[str]:
+        blob = self.backend.get(key) if key else None
+        return _decompress(blob) if blob is not None else None
+
+    def for_session(self, sb: Client, session_id: str) -> Optional[str]:
+        """Transcript text of one session: a one-column lookup, then the blob."""
+        res = sb.schema('peer_progress').table('transcript_sessions').select(
+            'transcript_hash, raw_transcript').eq('id', session_id).limit(1).execute()
+        if not res.data:
+            return None
+        row = res.data[0]
+        # Sessions saved before the store existed still carry the text inline
+        return self.get(row['transcript_hash']) if row.get('transcript_hash') else row.get('raw_transcript')
+
+
+_stores: Dict[int, TranscriptStore] = {}
+_stores_lock = threading.Lock()
+
+
+def transcript_store_for(sb: Client) -> TranscriptStore:
+    """Store selected by TRANSCRIPT_STORE, shared per Supabase client."""
+    with _stores_lock:
+        store = _stores.get(id(sb))
+        if store is None or (isinstance(store.backend, SupabaseBlobStore) and store.backend.sb is not sb):
+            kind = os.getenv('TRANSCRIPT_STORE', 'supabase')
+            if kind == 'local':
+                backend = LocalBlobStore()
+            elif kind == 's3':
+                backend = S3BlobStore()
+            else:
+                backend = SupabaseBlobStore(sb)
+            store = TranscriptStore(backend)
+            _stores[id(sb)] = store
+        return store
+
+
+def migrate_raw_transcripts(sb: Client, batch_size: int = 50) -> int:
+    """Move inline raw_transcript values into the store and clear them. Returns sessions moved."""
+    store = transcript_store_for(sb)
+
+    def table():
+        return sb.schema('peer_progress').table('transcript_sessions')
+
+    moved = 0
+    while True:
+        # Moved rows drop out of the filter, so always read the first page
+        res = table().select('id, raw_transcript').not_.is_('raw_transcript', 'null').order('id').limit(batch_size).execute()
+        rows = res.data or []
+        if not rows:
+            return moved
+        for row in rows:
+            key = store.put(row['raw_transcript'])
+            table().update({'transcript_hash': key, 'raw_transcript': None}).eq('id', row['id']).execute()
+            moved += 1
+        print(f'  moved {moved} transcripts')
+
+
+def main() -> None:
+    load_dotenv()
+    parser = argparse.ArgumentParser(description='Compressed transcript store')
+    parser.add_argument('--migrate', action='store_true', help='Move transcript_sessions.raw_transcript into the store')
+    parser.add_argument('--batch_size', type=int, default=50)
+    args = parser.parse_args()
+    if not args.migrate:
+        parser.print_help()
+        return
+    sb = create_client(os.getenv('SUPABASE_URL'), os.getenv('SUPABASE_SERVICE_KEY'))
+    print(f'✅ Moved {migrate_raw_transcripts(sb, args.batch_size)} transcripts into the store')
+
+
+if __name__ == '__main__':
+    main()
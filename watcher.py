@@ -0,0 +1,149 @@
+"""Long-running watcher that processes new transcripts shortly after upload.
+
+Instead of a cold start every hour (re-importing the Google/Supabase/Gemini
+libraries, re-authenticating and rebuilding clients), this keeps one
+TranscriptProcessor, Supabase client and processing ledger warm and polls Drive
+for files modified since the last poll. Every new file runs through the same
+per-task extractors as run_all_extractors.py, and the ledger keeps repeated
+sightings idempotent. SIGTERM/SIGINT finish the current file and exit cleanly.
+
+Usage examples:
+  python watcher.py --folder_key october_2025
+  python watcher.py --multiple_folders october_2025 folder_1 --poll_seconds 30 --tasks goals stuck
+"""
+
+import os
+import signal
+import argparse
+import threading
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional, Tuple
+
+from dotenv import load_dotenv
+from supabase import create_client
+
+from main import TranscriptProcessor
+from goal_extractor import _resolve_folders, _get_files_recursively, _list_folder_tree
+from extractor_registry import DEFAULT_TASKS, TASKS, run_task
+from processing_ledger import ProcessingLedger
+
+
+def _rfc3339(dt: datetime) -> str:
+    return dt.astimezone(timezone.utc).strftime('%Y-%m-%dT%H:%M:%S.%fZ')
+
+
+class TranscriptWatcher:
+    def __init__(self, organization_id: str, folders: List[str], tasks: Optional[List[str]] = None,
+                 poll_seconds: int = 30, lookback_hours: int = 24, overlap_seconds: int = 120,
+                 folder_refresh_seconds: int = 600, max_retries: int = 3):
+        self.organization_id = organization_id
+        self.folders = folders
+        self.tasks = tasks or DEFAULT_TASKS
+        self.poll_seconds = poll_seconds
+        # Drive's modifiedTime can trail the upload slightly; re-scan a small overlap each poll
+        self.overlap = timedelta(seconds=overlap_seconds)
+        self.watermark = datetime.now(timezone.utc) - timedelta(hours=lookback_hours)
+        self.stop_event = threading.Event()
+        # Subfolder trees are re-crawled only every folder_refresh_seconds, not on every poll
+        self.folder_refresh = timedelta(seconds=folder_refresh_seconds)
+        self._folder_trees: Dict[str, List[str]] = {}
+        self._folders_listed_at: Optional[datetime] = None
+        # Failed files hold the watermark back until they succeed or run out of retries
+        self.max_retries = max_retries
+        self._failures: Dict[Tuple[str, str], int] = {}
+
+        # Warm clients, built once for the life of the process
+        self.processor = TranscriptProcessor(organization_id=organization_id)
+        self.sb = create_client(os.getenv('SUPABASE_URL'), os.getenv('SUPABASE_SERVICE_KEY'))
+        self.ledger = ProcessingLedger(self.sb, organization_id).load(self.tasks)
+
+    def stop(self, *_args) -> None:
+        print('🛑 Stop requested, finishing current work...')
+        self.stop_event.set()
+
+    def _folder_ids(self, now: datetime) -> Dict[str, List[str]]:
+        if self._folders_listed_at is None or now - self._folders_listed_at >= self.folder_refresh:
+            self._folder_trees = {folder: _list_folder_tree(self.processor, folder) for folder in self.folders}
+            self._folders_listed_at = now
+        return self._folder_trees
+
+    def poll_once(self) -> int:
+        """Process every transcript modified since the watermark. Returns files handled."""
+        since = self.watermark - self.overlap
+        poll_started = datetime.now(timezone.utc)
+        files = []
+        for folder, folder_ids in self._folder_ids(poll_started).items():
+            files.extend(_get_files_recursively(self.processor, folder, modified_after=_rfc3339(since),
+                                                folder_ids=folder_ids))
+        seen = set()
+        files = [f for f in files if 'Main Room' not in f.get('name', '') and not (f['id'] in seen or seen.add(f['id']))]
+        # Oldest first so the watermark only moves past work that is done
+        files.sort(key=lambda f: f.get('modifiedTime') or '')
+
+        handled = 0
+        oldest_failed: Optional[str] = None
+        for f in files:
+            if self.stop_event.is_set():
+                return handled
+            print(f"Processing: {f['name']}")
+            failed = False
+            for task in self.tasks:
+                try:
+                    run_task(task, self.processor, self.sb, f, self.organization_id, self.ledger)
+                except Exception as e:
+                    print(f'  ✗ {task} error: {e}')
+                    failed = True
+            handled += 1
+            key = (f['id'], f.get('modifiedTime') or '')
+            if not failed:
+                self._failures.pop(key, None)
+                continue
+            self._failures[key] = self._failures.get(key, 0) + 1
+            if self._failures[key] >= self.max_retries:
+                print(f"  ⚠️ Giving up on {f['name']} after {self._failures[key]} attempts; the next full run retries it")
+                del self._failures[key]
+            elif oldest_failed is None and f.get('modifiedTime'):
+                oldest_failed = f['modifiedTime']
+        # Files after a failed one are seen again next poll; the ledger skips the ones that completed
+        if oldest_failed:
+            failed_at = datetime.fromisoformat(oldest_failed.replace('Z', '+00:00'))
+            self.watermark = min(poll_started, failed_at + self.overlap - timedelta(seconds=1))
+        else:
+            self.watermark = poll_started
+        return handled
+
+    def run(self) -> None:
+        print(f'👀 Watching {len(self.folders)} folder(s) every {self.poll_seconds}s for: {", ".join(self.tasks)}')
+        while not self.stop_event.is_set():
+            try:
+                n = self.poll_once()
+                if n:
+                    print(f'✅ Processed {n} new transcript(s)')
+            except Exception as e:
+                print(f'⚠️ Poll failed: {e}')
+            self.stop_event.wait(self.poll_seconds)
+        print('👋 Watcher stopped.')
+
+
+def main() -> None:
+    load_dotenv()
+
+    parser = argparse.ArgumentParser(description='Watch Drive folders and process new transcripts continuously')
+    parser.add_argument('--folder_key', type=str)
+    parser.add_argument('--folder_url', type=str)
+    parser.add_argument('--multiple_folders', nargs='*')
+    parser.add_argument('--tasks', nargs='*', choices=list(TASKS.keys()), default=None)
+    parser.add_argument('--poll_seconds', type=int, default=int(os.getenv('WATCHER_POLL_SECONDS', '30')))
+    parser.add_argument('--lookback_hours', type=int, default=24, help='How far back to look on startup')
+    parser.add_argument('--organization_id', type=str, default='f58a2d22-4e96-4d4a-9348-b82c8e3f1f2e')
+    args = parser.parse_args()
+
+    folders = _resolve_folders(args.folder_url or os.getenv('GOOGLE_DRIVE_FOLDER_URL'), args.folder_key, args.multiple_folders)
+    watcher = TranscriptWatcher(args.organization_id, folders, args.tasks, args.poll_seconds, args.lookback_hours)
+    signal.signal(signal.SIGTERM, watcher.stop)
+    signal.signal(signal.SIGINT, watcher.stop)
+    watcher.run()
+
+
+if __name__ == '__main__':
+    main()
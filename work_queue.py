@@ -0,0 +1,294 @@
+"""Durable local work queue for per-transcript, per-task extraction jobs.
+
+Jobs live in SQLite (WORK_QUEUE_PATH, default work_queue.db) so a crash or CI
+timeout loses nothing: workers claim jobs under a lease, heartbeat while they
+run, and a job whose lease expires is picked up again by the next worker.
+Several worker processes can drain the same queue in parallel.
+
+Usage examples:
+  python work_queue.py enqueue --multiple_folders folder_1 folder_2 folder_3 folder_4 folder_5
+  python work_queue.py worker --threads 4          # run in as many shells/machines as you like
+  python work_queue.py status
+  python work_queue.py retry_failed
+"""
+
+import os
+import json
+import time
+import uuid
+import sqlite3
+import argparse
+import threading
+from contextlib import contextmanager
+from typing import Dict, List, Optional
+
+from dotenv import load_dotenv
+
+
+DEFAULT_PATH = os.getenv('WORK_QUEUE_PATH') or os.path.join(os.path.dirname(os.path.abspath(__file__)), 'work_queue.db')
+DEFAULT_ORG = 'f58a2d22-4e96-4d4a-9348-b82c8e3f1f2e'
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    organization_id TEXT NOT NULL,
+    task TEXT NOT NULL,
+    file_id TEXT NOT NULL,
+    modified_time TEXT NOT NULL DEFAULT '',
+    file_json TEXT NOT NULL,
+    priority REAL NOT NULL DEFAULT 0,
+    status TEXT NOT NULL DEFAULT 'queued',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    max_attempts INTEGER NOT NULL DEFAULT 3,
+    available_at REAL NOT NULL DEFAULT 0,
+    lease_owner TEXT,
+    lease_expires REAL,
+    last_error TEXT,
+    output_count INTEGER,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL,
+    UNIQUE (organization_id, task, file_id, modified_time)
+);
+CREATE INDEX IF NOT EXISTS jobs_claim_idx ON jobs (status, available_at, priority);
+"""
+
+
+class WorkQueue:
+    def __init__(self, path: str = DEFAULT_PATH):
+        self.path = path
+        with self._conn() as conn:
+            conn.executescript(SCHEMA)
+
+    @contextmanager
+    def _conn(self):
+        # One short-lived connection per operation keeps this safe across threads and processes
+        conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        try:
+            conn.execute('PRAGMA journal_mode=WAL')
+            yield conn
+        finally:
+            conn.close()
+
+    def enqueue(self, organization_id: str, task: str, files: List[Dict], max_attempts: int = 3,
+                priority_fn=None) -> int:
+        """Add one job per file; file versions already queued for the task are ignored."""
+        now = time.time()
+        rows = [
+            (organization_id, task, f['id'], f.get('modifiedTime') or '', json.dumps(f),
+             float(priority_fn(f)) if priority_fn else 0.0, max_attempts, now, now)
+            for f in files
+        ]
+        with self._conn() as conn:
+            before = conn.total_changes
+            conn.executemany(
+                'INSERT OR IGNORE INTO jobs (organization_id, task, file_id, modified_time, file_json, priority, '
+                'max_attempts, created_at, updated_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                rows,
+            )
+            return conn.total_changes - before
+
+    def claim(self, worker_id: str, lease_seconds: int = 300, tasks: Optional[List[str]] = None) -> Optional[Dict]:
+        """Atomically lease the next runnable job (queued, or running with an expired lease and attempts left)."""
+        now = time.time()
+        task_filter = ''
+        params: list = [now, now]
+        if tasks:
+            task_filter = f" AND task IN ({','.join('?' * len(tasks))})"
+            params.extend(tasks)
+        with self._conn() as conn:
+            conn.execute('BEGIN IMMEDIATE')
+            try:
+                # A job whose worker died on every attempt (OOM, kill -9) would otherwise be reclaimed forever
+                conn.execute(
+                    "UPDATE jobs SET status = 'failed', lease_owner = NULL, "
+                    "last_error = COALESCE(last_error, 'lease expired on every attempt'), updated_at = ? "
+                    "WHERE status = 'running' AND lease_expires < ? AND attempts >= max_attempts",
+                    (now, now),
+                )
+                row = conn.execute(
+                    "SELECT * FROM jobs WHERE ((status = 'queued' AND available_at <= ?) "
+                    "OR (status = 'running' AND lease_expires < ? AND attempts < max_attempts))" + task_filter +
+                    " ORDER BY priority DESC, id LIMIT 1",
+                    params,
+                ).fetchone()
+                if not row:
+                    conn.execute('COMMIT')
+                    return None
+                conn.execute(
+                    "UPDATE jobs SET status = 'running', attempts = attempts + 1, lease_owner = ?, "
+                    "lease_expires = ?, updated_at = ? WHERE id = ?",
+                    (worker_id, now + lease_seconds, now, row['id']),
+                )
+                conn.execute('COMMIT')
+            except Exception:
+                conn.execute('ROLLBACK')
+                raise
+        job = dict(row)
+        job['attempts'] += 1
+        job['file'] = json.loads(job.pop('file_json'))
+        return job
+
+    def heartbeat(self, job_id: int, worker_id: str, lease_seconds: int = 300) -> bool:
+        """Extend a lease. Returns False if the job was taken over by another worker."""
+        now = time.time()
+        with self._conn() as conn:
+            cur = conn.execute(
+                "UPDATE jobs SET lease_expires = ?, updated_at = ? WHERE id = ? AND lease_owner = ? AND status = 'running'",
+                (now + lease_seconds, now, job_id, worker_id),
+            )
+            return cur.rowcount == 1
+
+    def complete(self, job_id: int, worker_id: str, output_count: Optional[int] = None) -> None:
+        with self._conn() as conn:
+            conn.execute(
+                "UPDATE jobs SET status = 'done', output_count = ?, lease_owner = NULL, lease_expires = NULL, "
+                "last_error = NULL, updated_at = ? WHERE id = ? AND lease_owner = ?",
+                (output_count, time.time(), job_id, worker_id),
+            )
+
+    def fail(self, job_id: int, worker_id: str, error: str, backoff_seconds: int = 60) -> None:
+        """Requeue with exponential backoff, or mark failed once attempts are exhausted."""
+        now = time.time()
+        with self._conn() as conn:
+            conn.execute(
+                "UPDATE jobs SET status = CASE WHEN attempts >= max_attempts THEN 'failed' ELSE 'queued' END, "
+                "available_at = ? + ? * (1 << (attempts - 1)), lease_owner = NULL, lease_expires = NULL, "
+                "last_error = ?, updated_at = ? WHERE id = ? AND lease_owner = ?",
+                (now, backoff_seconds, error[:2000], now, job_id, worker_id),
+            )
+
+    def retry_failed(self) -> int:
+        with self._conn() as conn:
+            cur = conn.execute(
+                "UPDATE jobs SET status = 'queued', attempts = 0, available_at = 0, updated_at = ? WHERE status = 'failed'",
+                (time.time(),),
+            )
+            return cur.rowcount
+
+    def stats(self) -> Dict[str, int]:
+        with self._conn() as conn:
+            rows = conn.execute('SELECT status, COUNT(*) AS n FROM jobs GROUP BY status').fetchall()
+        return {r['status']: r['n'] for r in rows}
+
+
+class _Heartbeat(threading.Thread):
+    """Keeps a job's lease alive while the worker is busy with it."""
+
+    def __init__(self, queue: WorkQueue, job_id: int, worker_id: str, lease_seconds: int):
+        super().__init__(daemon=True)
+        self.queue, self.job_id, self.worker_id, self.lease_seconds = queue, job_id, worker_id, lease_seconds
+        self.stopped = threading.Event()
+
+    def run(self):
+        while not self.stopped.wait(self.lease_seconds / 3):
+            if not self.queue.heartbeat(self.job_id, self.worker_id, self.lease_seconds):
+                print(f"  ⚠️ Lost lease on job {self.job_id}")
+                return
+
+
+def run_worker(queue: WorkQueue, worker_id: Optional[str] = None, lease_seconds: int = 300,
+               tasks: Optional[List[str]] = None, wait: bool = False, poll_seconds: int = 10,
+               force: bool = False, stop_event: Optional[threading.Event] = None) -> int:
+    """Claim and run jobs until the queue is drained (or forever with wait=True). Returns jobs run."""
+    from supabase import create_client
+    from main import TranscriptProcessor
+    from extractor_registry import run_task
+    from processing_ledger import ProcessingLedger
+
+    worker_id = worker_id or f'{os.uname().nodename}-{os.getpid()}-{uuid.uuid4().hex[:6]}'
+    sb = create_client(os.getenv('SUPABASE_URL'), os.getenv('SUPABASE_SERVICE_KEY'))
+    processors: Dict[str, TranscriptProcessor] = {}
+    ledgers: Dict[str, ProcessingLedger] = {}
+    ran = 0
+
+    while not (stop_event and stop_event.is_set()):
+        job = queue.claim(worker_id, lease_seconds, tasks)
+        if not job:
+            if not wait:
+                break
+            time.sleep(poll_seconds)
+            continue
+
+        org_id = job['organization_id']
+        if org_id not in processors:
+            processors[org_id] = TranscriptProcessor(organization_id=org_id)
+            ledgers[org_id] = ProcessingLedger(sb, org_id).load()
+        f = job['file']
+        print(f"[{worker_id}] job {job['id']} {job['task']}: {f['name']} (attempt {job['attempts']})")
+
+        hb = _Heartbeat(queue, job['id'], worker_id, lease_seconds)
+        hb.start()
+        try:
+            count = run_task(job['task'], processors[org_id], sb, f, org_id, ledgers[org_id], force=force)
+            queue.complete(job['id'], worker_id, count)
+        except Exception as e:
+            print(f"  ✗ Error: {e}")
+            queue.fail(job['id'], worker_id, str(e))
+        finally:
+            hb.stopped.set()
+        ran += 1
+    return ran
+
+
+def main() -> None:
+    load_dotenv()
+
+    parser = argparse.ArgumentParser(description='Durable work queue for extraction jobs')
+    parser.add_argument('--db', type=str, default=DEFAULT_PATH, help='SQLite queue path')
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    enq = sub.add_parser('enqueue', help='Crawl folders and enqueue one job per transcript and task')
+    enq.add_argument('--folder_key', type=str)
+    enq.add_argument('--folder_url', type=str)
+    enq.add_argument('--multiple_folders', nargs='*')
+    enq.add_argument('--days_back', type=int, default=None)
+    enq.add_argument('--since', type=str, default=None)
+    enq.add_argument('--recursive', action='store_true')
+    enq.add_argument('--tasks', nargs='*', default=None)
+    enq.add_argument('--organization_id', type=str, default=DEFAULT_ORG)
+    enq.add_argument('--max_attempts', type=int, default=3)
+
+    wrk = sub.add_parser('worker', help='Claim and run jobs')
+    wrk.add_argument('--threads', type=int, default=1, help='Worker threads in this process')
+    wrk.add_argument('--lease_seconds', type=int, default=300)
+    wrk.add_argument('--tasks', nargs='*', default=None)
+    wrk.add_argument('--wait', action='store_true', help='Keep polling when the queue is empty')
+    wrk.add_argument('--force', action='store_true', help='Ignore the processing ledger')
+
+    sub.add_parser('status', help='Show job counts by status')
+    sub.add_parser('retry_failed', help='Requeue jobs that exhausted their attempts')
+
+    args = parser.parse_args()
+    queue = WorkQueue(args.db)
+
+    if args.command == 'enqueue':
+        from main import TranscriptProcessor
+        from goal_extractor import _resolve_folders, _collect_transcript_files
+        from extractor_registry import DEFAULT_TASKS
+
+        processor = TranscriptProcessor(organization_id=args.organization_id)
+        folders = _resolve_folders(args.folder_url, args.folder_key, args.multiple_folders)
+        files = _collect_transcript_files(processor, folders, args.days_back, args.recursive, args.since)
+        for task in args.tasks or DEFAULT_TASKS:
+            added = queue.enqueue(args.organization_id, task, files, args.max_attempts)
+            print(f'  {task}: enqueued {added} new jobs ({len(files)} files)')
+    elif args.command == 'worker':
+        threads = [
+            threading.Thread(target=run_worker, args=(queue,), kwargs={
+                'lease_seconds': args.lease_seconds, 'tasks': args.tasks, 'wait': args.wait, 'force': args.force,
+            })
+            for _ in range(max(1, args.threads))
+        ]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+    elif args.command == 'retry_failed':
+        print(f'Requeued {queue.retry_failed()} failed jobs')
+
+    print(json.dumps(queue.stats(), indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,243 @@
+"""
+Coalescing write-behind buffer for append-only Supabase tables.
+
+Row-at-a-time inserts (goal_events, attendance, activity_events,
+group_health_flags, support_connections, community_posts) are queued per table
+and written in bulk when a buffer reaches max_rows or its oldest row is
+flush_seconds old, so rows from every in-flight transcript share one insert.
+
+A failed batch is retried with backoff, then split in half until the rows that
+keep failing are isolated; those are appended to a dead-letter JSONL file
+(<WRITE_BUFFER_DEAD_LETTER_DIR>/<table>.jsonl) instead of blocking the rest.
+Everything still queued is flushed at interpreter exit.
+
+Rows go through PostgREST by default; use_writer('copy') switches the process
+to the direct-Postgres COPY writer (pg_copy_writer.py) for large backfills.
+
+Rows added inside `with tagged(tag):` carry the tag, so a caller can ask after
+flushing whether any of its own rows were dead-lettered.
+
+Usage:
+    write_buffer_for(sb, 'goal_events').add({...})
+    flush_all()   # e.g. before recording work as done
+"""
+
+import os
+import json
+import time
+import atexit
+import threading
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from supabase import Client
+
+
+DEAD_LETTER_DIR = os.getenv('WRITE_BUFFER_DEAD_LETTER_DIR') or os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), 'dead_letters')
+MAX_ROWS = int(os.getenv('WRITE_BUFFER_MAX_ROWS', '500'))
+FLUSH_SECONDS = float(os.getenv('WRITE_BUFFER_FLUSH_SECONDS', '2'))
+
+_local = threading.local()
+_dead_by_tag: Dict[object, int] = {}
+_dead_by_tag_lock = threading.Lock()
+
+
+@contextmanager
+def tagged(tag: object) -> Iterator[None]:
+    """Tag rows added by this thread inside the block (see take_dead_lettered)."""
+    previous = getattr(_local, 'tag', None)
+    _local.tag = tag
+    try:
+        yield
+    finally:
+        _local.tag = previous
+
+
+def take_dead_lettered(tag: object) -> int:
+    """How many rows added under tag were dead-lettered so far; clears the count."""
+    with _dead_by_tag_lock:
+        return _dead_by_tag.pop(tag, 0)
+
+
+class WriteBuffer:
+    def __init__(self, sb: Client, table: str, schema: str = 'peer_progress', max_rows: int = MAX_ROWS,
+                 flush_seconds: float = FLUSH_SECONDS, max_retries: int = 3, retry_delay: float = 0.5,
+                 dead_letter_dir: Optional[str] = None):
+        self.sb = sb
+        self.table = table
+        self.schema = schema
+        self.max_rows = max_rows
+        self.flush_seconds = flush_seconds
+        self.max_retries = max_retries
+        self.retry_delay = retry_delay
+        self.dead_letter_dir = dead_letter_dir or DEAD_LETTER_DIR
+        self.written = 0
+        self.dead_lettered = 0
+        self.round_trips = 0
+        self._pending: List[Tuple[object, Dict]] = []
+        self._oldest: Optional[float] = None
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+
+    def add(self, row: Dict) -> None:
+        self.add_many([row])
+
+    def add_many(self, rows: List[Dict]) -> None:
+        if not rows:
+            return
+        tag = getattr(_local, 'tag', None)
+        with self._lock:
+            if not self._pending:
+                self._oldest = time.monotonic()
+            self._pending.extend((tag, row) for row in rows)
+            full = len(self._pending) >= self.max_rows
+        if full:
+            self.flush()
+
+    def due(self) -> bool:
+        oldest = self._oldest
+        return bool(self._pending) and oldest is not None and time.monotonic() - oldest >= self.flush_seconds
+
+    def flush(self) -> int:
+        """Write everything queued so far. Returns rows written."""
+        with self._flush_lock:
+            with self._lock:
+                rows, self._pending, self._oldest = self._pending, [], None
+            if not rows:
+                return 0
+            # A bulk insert needs uniform keys, so rows with different column sets go in separate requests
+            by_columns: Dict[Tuple, List[Tuple[object, Dict]]] = {}
+            for entry in rows:
+                by_columns.setdefault(tuple(sorted(entry[1].keys())), []).append(entry)
+            written = 0
+            for group in by_columns.values():
+                for i in range(0, len(group), self.max_rows):
+                    written += self._write(group[i:i + self.max_rows], self.max_retries)
+            self.written += written
+            return written
+
+    def _insert(self, rows: List[Dict]) -> None:
+        self.round_trips += 1
+        if _writer_name == 'copy':
+            from pg_copy_writer import copy_writer
+            copy_writer().write(self.schema, self.table, rows)
+        else:
+            self.sb.schema(self.schema).table(self.table).insert(rows).execute()
+
+    def _write(self, rows: List[Tuple[object, Dict]], retries: int) -> int:
+        error: Optional[Exception] = None
+        for attempt in range(retries + 1):
+            try:
+                self._insert([row for _, row in rows])
+                return len(rows)
+            except Exception as e:
+                error = e
+                if attempt < retries:
+                    time.sleep(self.retry_delay * (2 ** attempt))
+        if len(rows) == 1:
+            self._dead_letter(rows[0], error)
+            return 0
+        # Bisect to isolate the poison rows; the batch was already retried, so halves get one attempt each
+        mid = len(rows) // 2
+        return self._write(rows[:mid], 0) + self._write(rows[mid:], 0)
+
+    def _dead_letter(self, entry: Tuple[object, Dict], error: Optional[Exception]) -> None:
+        tag, row = entry
+        self.dead_lettered += 1
+        if tag is not None:
+            with _dead_by_tag_lock:
+                _dead_by_tag[tag] = _dead_by_tag.get(tag, 0) + 1
+        record = {
+            'table': f'{self.schema}.{self.table}',
+            'failed_at': datetime.now(timezone.utc).isoformat(),
+            'error': str(error),
+            'row': row,
+        }
+        try:
+            os.makedirs(self.dead_letter_dir, exist_ok=True)
+            with open(os.path.join(self.dead_letter_dir, f'{self.table}.jsonl'), 'a', encoding='utf-8') as fh:
+                fh.write(json.dumps(record, default=str) + '\n')
+        except Exception as e:
+            print(f"  ⚠️ Could not dead-letter {self.table} row: {e}")
+        print(f"  ✗ {self.table}: row dead-lettered after retries ({error})")
+
+
+WRITERS = ['postgrest', 'copy']
+_writer_name = 'postgrest'
+
+
+def use_writer(name: str) -> None:
+    """Select how buffered and bulk rows reach the database for this process: 'postgrest' or 'copy'."""
+    global _writer_name
+    if name not in WRITERS:
+        raise ValueError(f'Unknown writer {name!r}; expected one of {WRITERS}')
+    if name == 'copy':
+        from pg_copy_writer import copy_writer
+        copy_writer()  # fail fast on a missing DATABASE_URL or psycopg
+    _writer_name = name
+
+
+def write_rows(sb: Client, table: str, rows: List[Dict], schema: str = 'peer_progress',
+               chunk_size: int = MAX_ROWS) -> int:
+    """Insert rows now (no buffering) through the selected writer, in chunks. Returns rows sent.
+    Rows in one call should share the same keys."""
+    if _writer_name == 'copy':
+        from pg_copy_writer import copy_writer
+        # COPY streams any number of rows in one statement, so no chunking
+        copy_writer().write(schema, table, rows)
+        return len(rows)
+    for i in range(0, len(rows), chunk_size):
+        sb.schema(schema).table(table).insert(rows[i:i + chunk_size]).execute()
+    return len(rows)
+
+
+_buffers: Dict[Tuple[int, str, str], Tuple[Client, WriteBuffer]] = {}
+_buffers_lock = threading.Lock()
+_flusher: Optional[threading.Thread] = None
+
+
+def _flush_due() -> None:
+    while True:
+        time.sleep(max(0.1, FLUSH_SECONDS / 4))
+        for buf in buffers():
+            if buf.due():
+                try:
+                    buf.flush()
+                except Exception as e:
+                    print(f"  ⚠️ Background flush of {buf.table} failed: {e}")
+
+
+def write_buffer_for(sb: Client, table: str, schema: str = 'peer_progress') -> WriteBuffer:
+    """Shared buffer per (client, table), so rows from every caller in the process coalesce."""
+    global _flusher
+    with _buffers_lock:
+        key = (id(sb), schema, table)
+        entry = _buffers.get(key)
+        if entry is None or entry[0] is not sb:
+            entry = (sb, WriteBuffer(sb, table, schema))
+            _buffers[key] = entry
+        if _flusher is None:
+            _flusher = threading.Thread(target=_flush_due, name='write-buffer-flusher', daemon=True)
+            _flusher.start()
+        return entry[1]
+
+
+def buffers() -> List[WriteBuffer]:
+    with _buffers_lock:
+        return [buf for _, buf in _buffers.values()]
+
+
+def flush_all() -> int:
+    """Flush every buffer. Returns rows written."""
+    return sum(buf.flush() for buf in buffers())
+
+
+def stats() -> Dict[str, Dict[str, int]]:
+    return {f'{b.schema}.{b.table}': {'written': b.written, 'round_trips': b.round_trips,
+                                      'dead_lettered': b.dead_lettered, 'pending': len(b._pending)}
+            for b in buffers()}
+
+
+atexit.register(flush_all)